@@ -0,0 +1,128 @@
+"""Пропускная способность БД при параллельной работе: запись журнала и поиск/обновление пользователей.
+
+Сравнивает SQLite с настройками по умолчанию (журнал DELETE, synchronous=FULL) и режим WAL
+с synchronous=NORMAL из data.db_session; при установленном aiosqlite — ещё и асинхронный движок.
+Каждый поток делает то же, что бот при промахе кэша: одну транзакцию на запрос.
+Запуск из корня репозитория:
+    python -m benchmarks.bench_db --threads 8 --ops 2000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from types import SimpleNamespace
+
+import sqlalchemy as sa
+import sqlalchemy.orm as orm
+
+from data import __all_models  # noqa: F401 — регистрирует таблицы в метаданных
+from data.db_session import SqlAlchemyBase, _set_pragmas, make_engine
+from services.log_writer import _write_rows
+from services.user_registry import _upsert_statement
+
+
+def log_rows(i):
+    return [{'applying_user': i % 100 + 1, 'request': 'help', 'request_date': datetime.now()}]
+
+
+def tg_user(i, users):
+    return SimpleNamespace(id=i % users + 1, username=f'user{i % users}', last_name=None, first_name='Тест')
+
+
+def rates(started, results):
+    """Операций в секунду для журнала и пользователей по результатам (вид, число операций, момент окончания)"""
+    totals = {}
+    for kind, count, finished in results:
+        done, last = totals.get(kind, (0, started))
+        totals[kind] = done + count, max(last, finished)
+    return tuple(done / (last - started) for done, last in (totals['log'], totals['user']))
+
+
+def run_threads(factory, threads, ops, users):
+    """Половина потоков пишет журнал, половина ищет/обновляет пользователей"""
+
+    def log_worker(offset):
+        for i in range(offset, ops, threads):
+            with factory() as db_sess:
+                _write_rows(db_sess, log_rows(i))
+                db_sess.commit()
+        return 'log', len(range(offset, ops, threads)), time.perf_counter()
+
+    def user_worker(offset):
+        for i in range(offset, ops, threads):
+            with factory() as db_sess:
+                db_sess.execute(_upsert_statement(tg_user(i, users))).scalar_one()
+                db_sess.commit()
+        return 'user', len(range(offset, ops, threads)), time.perf_counter()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        futures = [pool.submit(log_worker if n % 2 == 0 else user_worker, n) for n in range(threads)]
+        results = [future.result() for future in futures]
+    return (*rates(started, results), time.perf_counter() - started)
+
+
+async def run_async(path, threads, ops, users):
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    engine = create_async_engine(f'sqlite+aiosqlite:///{path}')
+    sa.event.listen(engine.sync_engine, 'connect', _set_pragmas)
+    factory = async_sessionmaker(engine)
+
+    async def log_worker(offset):
+        for i in range(offset, ops, threads):
+            async with factory() as db_sess:
+                await db_sess.run_sync(_write_rows, log_rows(i))
+                await db_sess.commit()
+        return 'log', len(range(offset, ops, threads)), time.perf_counter()
+
+    async def user_worker(offset):
+        for i in range(offset, ops, threads):
+            async with factory() as db_sess:
+                (await db_sess.execute(_upsert_statement(tg_user(i, users)))).scalar_one()
+                await db_sess.commit()
+        return 'user', len(range(offset, ops, threads)), time.perf_counter()
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(log_worker(n) if n % 2 == 0 else user_worker(n) for n in range(threads)))
+    elapsed = time.perf_counter() - started
+    await engine.dispose()
+    return (*rates(started, results), elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--ops', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=500)
+    args = parser.parse_args()
+
+    print(f'{"режим":<28}{"журнал, оп/с":>14}{"пользователи, оп/с":>20}{"всего, с":>10}')
+    with tempfile.TemporaryDirectory() as directory:
+        for name, tuned in (('по умолчанию', False), ('WAL + synchronous=NORMAL', True)):
+            path = os.path.join(directory, f'{tuned}.db')
+            engine = make_engine(path, tuned=tuned)
+            SqlAlchemyBase.metadata.create_all(engine)
+            log_rate, user_rate, elapsed = run_threads(orm.sessionmaker(bind=engine), args.threads, args.ops,
+                                                       args.users)
+            engine.dispose()
+            print(f'{name:<28}{log_rate:>14.0f}{user_rate:>20.0f}{elapsed:>10.2f}')
+
+        try:
+            import aiosqlite  # noqa: F401
+        except ImportError:
+            print('aiosqlite не установлен — асинхронный движок пропущен')
+            return
+        path = os.path.join(directory, 'async.db')
+        engine = make_engine(path)
+        SqlAlchemyBase.metadata.create_all(engine)
+        engine.dispose()
+        log_rate, user_rate, elapsed = asyncio.run(run_async(path, args.threads, args.ops, args.users))
+        print(f'{"WAL + aiosqlite":<28}{log_rate:>14.0f}{user_rate:>20.0f}{elapsed:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
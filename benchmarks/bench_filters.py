@@ -0,0 +1,72 @@
+"""Замер задержки фильтров на мегапиксель.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_filters --megapixels 12 --repeat 3
+"""
+import argparse
+import io
+import os
+import time
+
+from PIL import Image
+
+from services.image_filters import FILTERS, SEPIA_MATRIX, render_filter
+
+
+def make_image(megapixels: float) -> Image.Image:
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    return Image.frombytes('RGB', (width, height), os.urandom(width * height * 3))
+
+
+def legacy_vintage(img):
+    """Старая попиксельная реализация «Винтажа» — для сравнения"""
+    sepia = img.convert('RGB')
+    pixels = sepia.load()
+    width, height = img.size
+    for py in range(height):
+        for px in range(width):
+            r, g, b = sepia.getpixel((px, py))
+            pixels[px, py] = tuple(min(255, int(sum(k * c for k, c in zip(SEPIA_MATRIX[i:i + 3], (r, g, b)))))
+                                   for i in (0, 4, 8))
+    return sepia
+
+
+def measure(func, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--megapixels', type=float, default=12)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--legacy', action='store_true',
+                        help='дополнительно замерить старый попиксельный «Винтаж» на 0.5 МП')
+    args = parser.parse_args()
+
+    img = make_image(args.megapixels)
+    megapixels = img.width * img.height / 1_000_000
+    buffer = io.BytesIO()
+    img.save(buffer, format='JPEG')
+    photo_bytes = buffer.getvalue()
+
+    print(f'Изображение {img.width}x{img.height} ({megapixels:.1f} МП), лучший из {args.repeat} запусков')
+    print(f'{"фильтр":<22}{"фильтр, мс/МП":>16}{"декод+фильтр+JPEG, мс/МП":>28}')
+    for name, spec in FILTERS.items():
+        apply_time = measure(lambda: spec.apply(img), args.repeat)
+        render_time = measure(lambda: render_filter(photo_bytes, name, 'jpg'), args.repeat)
+        print(f'{name:<22}{apply_time * 1000 / megapixels:>16.1f}{render_time * 1000 / megapixels:>28.1f}')
+
+    if args.legacy:
+        small = make_image(0.5)
+        legacy_time = measure(lambda: legacy_vintage(small), 1)
+        print(f'{"Винтаж (попиксельно)":<22}{legacy_time * 1000 / 0.5:>16.1f}')
+
+
+if __name__ == '__main__':
+    main()
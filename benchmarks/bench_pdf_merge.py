@@ -0,0 +1,55 @@
+"""Задержка завершения сессии объединения PDF: всё в конце против инкрементального объединения.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_pdf_merge --inputs 1 10 50 --pages 5
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import fitz
+
+from services.pdf_tools import append_pdf, finalize_pdf, merge_pdf_files
+
+
+def make_pdf(path: str, pages: int, index: int):
+    with fitz.open() as doc:
+        for page_num in range(pages):
+            page = doc.new_page()
+            page.insert_text((72, 72), f"Документ {index}, страница {page_num + 1}\n" * 20)
+        doc.save(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--inputs', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--pages', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f'{"файлов":>7}{"всё в конце, с":>18}{"инкрементально: фон, с":>26}{"«Готово!», с":>16}')
+    for count in args.inputs:
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [os.path.join(directory, f'{i:04d}.pdf') for i in range(count)]
+            for i, path in enumerate(paths):
+                make_pdf(path, args.pages, i)
+
+            started = time.perf_counter()
+            merge_pdf_files(paths, os.path.join(directory, 'batch.pdf'))
+            batch_time = time.perf_counter() - started
+
+            work_path = os.path.join(directory, 'work.pdf')
+            started = time.perf_counter()
+            for path in paths:
+                append_pdf(work_path, path)
+            background_time = time.perf_counter() - started
+
+            started = time.perf_counter()
+            finalize_pdf(work_path, os.path.join(directory, 'incremental.pdf'))
+            finish_time = time.perf_counter() - started
+
+        print(f'{count:>7}{batch_time:>18.3f}{background_time:>26.3f}{finish_time:>16.3f}')
+
+
+if __name__ == '__main__':
+    main()
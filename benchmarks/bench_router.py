@@ -0,0 +1,112 @@
+"""Замер накладных расходов маршрутизации текстовых сообщений.
+
+Сравнивает таблицу маршрутов с прежней цепочкой if/elif на пустых обработчиках.
+Запуск из корня репозитория:
+    python -m benchmarks.bench_router --messages 200000
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+from handlers import create_files, csv_manipulation, format_converter, image_filter, pdf_images, pdf_merger  # noqa
+from handlers.common import exit_mode  # noqa
+from handlers.router import Router, router
+from services.image_filters import FILTERS
+
+# (режим, текст) — типичная смесь: кнопки, выбор формата/фильтра, произвольный текст и промахи
+SAMPLES = [
+    ('pdf_merger', 'Готово!'),
+    ('pdf_images_waiting', 'Готово'),
+    ('pdf_images_waiting', 'Архив ZIP'),
+    ('format_converter_waiting', 'PNG'),
+    ('image_filter_waiting', 'Холодный свет'),
+    ('csv_manipulation', 'where price > 10'),
+    ('csv_manipulation', 'Выведи последние 30 строк'),
+    ('create_txt', 'какой-то текст'),
+    ('menu', 'привет'),
+    (None, 'Выйти'),
+]
+
+
+async def noop(update, context):
+    pass
+
+
+def make_router():
+    """Копия боевой таблицы маршрутов с пустыми обработчиками"""
+    bench_router = Router()
+    for key in router.routes:
+        bench_router.routes[key] = noop
+    for state in router.fallbacks:
+        bench_router.fallbacks[state] = noop
+    return bench_router
+
+
+async def legacy_dispatch(update, context):
+    """Прежняя цепочка сравнений из handle_message"""
+    text = update.message.text
+    state = context.user_data.get('state')
+    if text == 'Выйти':
+        return await noop(update, context)
+    if text == 'Готово':
+        return await noop(update, context)
+    if text == 'Архив ZIP' and state == 'pdf_images_waiting':
+        return await noop(update, context)
+    if state == 'format_selection':
+        if text.upper() in ['PNG', 'JPEG', 'WEBP', 'TIFF', 'SVG']:
+            return await noop(update, context)
+    if text.upper() in ['PNG', 'JPEG', 'WEBP', 'TIFF', 'SVG']:
+        return await noop(update, context)
+    if state == 'create_csv':
+        await noop(update, context)
+    elif state == 'create_json':
+        await noop(update, context)
+    elif state == 'create_txt':
+        await noop(update, context)
+    elif state == 'pdf_merger' and text == "Готово!":
+        await noop(update, context)
+    elif state == 'csv_manipulation':
+        await noop(update, context)
+    elif state == 'image_filter_waiting' and text in FILTERS:
+        await noop(update, context)
+
+
+async def measure(dispatch, messages):
+    samples = [(SimpleNamespace(message=SimpleNamespace(text=text)), SimpleNamespace(user_data={'state': state}))
+               for state, text in SAMPLES]
+    started = time.perf_counter()
+    for i in range(messages):
+        update, context = samples[i % len(samples)]
+        await dispatch(update, context)
+    return (time.perf_counter() - started) / messages
+
+
+async def run(messages):
+    bench_router = make_router()
+    print(f'Маршрутов: {len(router.routes)}, режимов с обработчиком по умолчанию: {len(router.fallbacks)}')
+    legacy = await measure(legacy_dispatch, messages)
+    routed = await measure(bench_router.dispatch, messages)
+
+    async def lookup_only(update, context):
+        handler = bench_router.resolve(context.user_data.get('state'), update.message.text)
+        if handler is not None:
+            await handler(update, context)
+
+    lookup = await measure(lookup_only, messages)
+    print(f'{"способ":<28}{"мкс/сообщение":>16}')
+    print(f'{"if/elif (прежний)":<28}{legacy * 1e6:>16.2f}')
+    print(f'{"таблица, только поиск":<28}{lookup * 1e6:>16.2f}')
+    print(f'{"таблица + учёт времени":<28}{routed * 1e6:>16.2f}')
+    print(f'Промахов маршрутизации: {bench_router.unmatched}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=200000)
+    args = parser.parse_args()
+    asyncio.run(run(args.messages))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Время холодного старта: сколько занимает импорт main.py (или worker.py) по данным -X importtime.
+
+Каждый замер — отдельный процесс `python -X importtime -c "import <модуль>"`. Выводится медиана
+полного времени процесса и импорта модуля, самые медленные прямые импорты и то, какие тяжёлые
+зависимости подгрузились при запуске (после ленивых импортов pandas, pyarrow, fitz и PIL там быть не должно).
+Запуск из корня репозитория:
+    python -m benchmarks.bench_startup --runs 5 --module main
+"""
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ('pandas', 'pyarrow', 'numpy', 'fitz', 'PIL', 'convertapi')
+LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)$')
+
+
+def parse(stderr):
+    """Строки -X importtime как (глубина, модуль, собственное время, суммарное время) в микросекундах"""
+    entries = []
+    for line in stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            entries.append(((len(indent) - 1) // 2, name, int(own), int(cumulative)))
+    return entries
+
+
+def direct_imports(entries, module):
+    """Импорты, сделанные непосредственно модулем: importtime печатает их перед строкой самого модуля"""
+    children = []
+    for depth, name, _, cumulative in entries:
+        if depth == 0:
+            if name == module:
+                return children
+            children = []
+        elif depth == 1:
+            children.append((name, cumulative))
+    return []
+
+
+def measure(module):
+    started = time.perf_counter()
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                             capture_output=True, text=True, check=True)
+    elapsed = time.perf_counter() - started
+    entries = parse(process.stderr)
+    total = next(cumulative for depth, name, _, cumulative in entries if depth == 0 and name == module)
+    return elapsed, total / 1e6, entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='main', help="что импортировать: main или worker")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help="сколько самых медленных импортов показать")
+    args = parser.parse_args()
+
+    # Первый запуск прогревает кэш байт-кода и файловый кэш ОС, в медиану он не входит
+    measure(args.module)
+    results = [measure(args.module) for _ in range(args.runs)]
+    print(f'Процесс целиком: медиана {statistics.median(r[0] for r in results):.3f} с, '
+          f'импорт {args.module}: медиана {statistics.median(r[1] for r in results):.3f} с ({args.runs} запусков)')
+
+    entries = results[-1][2]
+    print(f'\nСамые медленные прямые импорты {args.module}:')
+    for name, cumulative in sorted(direct_imports(entries, args.module), key=lambda item: -item[1])[:args.top]:
+        print(f'  {name:<40}{cumulative / 1000:>10.1f} мс')
+
+    loaded = {name.split('.')[0] for _, name, _, _ in entries}
+    print('\nТяжёлые зависимости при старте:',
+          ', '.join(f'{name} {"загружен" if name in loaded else "нет"}' for name in HEAVY_MODULES))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+"""Локальный стенд без Telegram: поддельный Bot API и синтетические пользователи для режима вебхука.
+
+Поднимает поддельный Bot API, запускает бота через services.webhook, от имени нескольких
+пользователей шлёт сценарии сообщений на вебхук и замеряет время до ответа бота.
+Запуск из корня репозитория:
+    python -m benchmarks.fake_telegram --users 50 --rounds 5
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import socket
+import statistics
+import tempfile
+import time
+
+from aiohttp import ClientSession, web
+
+import main as bot
+from services import webhook
+
+FAKE_TOKEN = '123456:FAKE'
+BOT_USER = {'id': 123456, 'is_bot': True, 'first_name': 'Fake', 'username': 'fake_file_bot'}
+
+# Каждый шаг сценария даёт ровно один ответ бота
+SCRIPT = ['/start', '/create_txt', 'Привет из нагрузочного теста', '/file_creator', 'Выйти']
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class FakeBotApi:
+    """Отвечает на методы Bot API правдоподобными объектами и складывает исходящие сообщения по чатам"""
+
+    def __init__(self):
+        self.message_ids = itertools.count(1)
+        self.replies = {}  # chat_id -> asyncio.Queue с именами методов, которыми бот ответил
+        self.files = {}  # file_id -> содержимое, которое бот может скачать
+        self.calls = {}
+        self.app = web.Application(client_max_size=64 * 1024 * 1024)
+        self.app.router.add_post('/bot{token}/{method}', self.handle_method)
+        self.app.router.add_get('/file/bot{token}/{file_path:.+}', self.handle_file)
+
+    def reply_queue(self, chat_id) -> asyncio.Queue:
+        return self.replies.setdefault(int(chat_id), asyncio.Queue())
+
+    def add_file(self, file_id, content: bytes):
+        self.files[file_id] = content
+
+    def message(self, chat_id, **fields):
+        return dict({'message_id': next(self.message_ids), 'date': int(time.time()),
+                     'chat': {'id': int(chat_id), 'type': 'private'}, 'from': BOT_USER}, **fields)
+
+    def document(self):
+        file_id = f'sent-{next(self.message_ids)}'
+        return {'file_id': file_id, 'file_unique_id': file_id}
+
+    def attachment(self, kind):
+        if kind == 'photo':
+            return {'photo': [dict(self.document(), width=1, height=1)]}
+        return {'document': self.document()}
+
+    async def handle_method(self, request):
+        method = request.match_info['method']
+        if request.content_type == 'application/json':
+            params = await request.json()
+        else:
+            params = {key: value for key, value in (await request.post()).items() if isinstance(value, str)}
+        self.calls[method] = self.calls.get(method, 0) + 1
+
+        chat_id = params.get('chat_id')
+        if method == 'getMe':
+            result = BOT_USER
+        elif method in ('setWebhook', 'deleteWebhook', 'answerCallbackQuery'):
+            result = True
+        elif method == 'getFile':
+            file_id = params['file_id']
+            result = {'file_id': file_id, 'file_unique_id': file_id,
+                      'file_size': len(self.files.get(file_id, b'')), 'file_path': file_id}
+        elif method == 'sendMessage' or method == 'editMessageText':
+            result = self.message(chat_id or 0, text=params.get('text', ''))
+        elif method == 'sendDocument':
+            result = self.message(chat_id, document=self.document())
+        elif method == 'sendPhoto':
+            result = self.message(chat_id, **self.attachment('photo'))
+        elif method == 'sendMediaGroup':
+            media = params.get('media', [])
+            media = json.loads(media) if isinstance(media, str) else media
+            result = [self.message(chat_id, **self.attachment(item.get('type'))) for item in media]
+        else:
+            result = True
+
+        if chat_id is not None and method.startswith('send'):
+            self.reply_queue(chat_id).put_nowait(method)
+        return web.json_response({'ok': True, 'result': result})
+
+    async def handle_file(self, request):
+        content = self.files.get(request.match_info['file_path'])
+        if content is None:
+            return web.Response(status=404)
+        return web.Response(body=content)
+
+
+def make_update(update_id, user_id, text=None, **content):
+    """Обновление с текстом или с другим содержимым сообщения (document=..., photo=...)"""
+    message = {
+        'message_id': update_id,
+        'date': int(time.time()),
+        'chat': {'id': user_id, 'type': 'private'},
+        'from': {'id': user_id, 'is_bot': False, 'first_name': f'User {user_id}'},
+        **content,
+    }
+    if text is not None:
+        message['text'] = text
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+    return {'update_id': update_id, 'message': message}
+
+
+class SyntheticUsers:
+    """Пользователи, которые по очереди шлют шаги сценария и ждут ответ на каждый"""
+
+    def __init__(self, api: FakeBotApi, webhook_url, secret_token=None, timeout=30.0):
+        self.api = api
+        self.webhook_url = webhook_url
+        self.headers = {'X-Telegram-Bot-Api-Secret-Token': secret_token} if secret_token else {}
+        self.timeout = timeout
+        self.update_ids = itertools.count(1)
+        self.latencies = []
+        self.timeouts = 0
+
+    async def send(self, session: ClientSession, user_id, text):
+        replies = self.api.reply_queue(user_id)
+        started = time.perf_counter()
+        async with session.post(self.webhook_url, json=make_update(next(self.update_ids), user_id, text),
+                                headers=self.headers) as response:
+            response.raise_for_status()
+        try:
+            await asyncio.wait_for(replies.get(), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return
+        self.latencies.append(time.perf_counter() - started)
+
+    async def run_user(self, session, user_id, script, rounds):
+        for _ in range(rounds):
+            for text in script:
+                await self.send(session, user_id, text)
+
+    async def run(self, users, script, rounds, first_user_id=1000):
+        async with ClientSession() as session:
+            await asyncio.gather(*(self.run_user(session, first_user_id + i, script, rounds) for i in range(users)))
+
+
+def percentile(values, q):
+    return statistics.quantiles(values, n=100, method='inclusive')[q - 1] if len(values) > 1 else values[0]
+
+
+async def wait_ready(url, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    async with ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(url) as response:
+                    if response.status == 200:
+                        return
+            except OSError:
+                pass
+            await asyncio.sleep(0.1)
+    raise TimeoutError(f"{url} так и не стал готов")
+
+
+async def run(args):
+    api = FakeBotApi()
+    api_runner = web.AppRunner(api.app, access_log=None)
+    await api_runner.setup()
+    api_port, webhook_port = free_port(), free_port()
+    await web.TCPSite(api_runner, '127.0.0.1', api_port).start()
+
+    application = bot.build_application(FAKE_TOKEN, base_url=f'http://127.0.0.1:{api_port}', persistence=False)
+    stop_event = asyncio.Event()
+    bot_task = asyncio.create_task(webhook.serve(application, '127.0.0.1', webhook_port, '/telegram',
+                                                 drain_timeout=10.0, stop_event=stop_event))
+    try:
+        await wait_ready(f'http://127.0.0.1:{webhook_port}/readyz')
+        users = SyntheticUsers(api, f'http://127.0.0.1:{webhook_port}/telegram')
+        started = time.perf_counter()
+        await users.run(args.users, SCRIPT, args.rounds)
+        elapsed = time.perf_counter() - started
+    finally:
+        stop_event.set()
+        await bot_task
+        await api_runner.cleanup()
+
+    latencies = sorted(users.latencies)
+    print(f'Пользователей: {args.users}, шагов на пользователя: {len(SCRIPT) * args.rounds}, '
+          f'одновременных обновлений: {application.update_processor.max_concurrent_updates}')
+    print(f'Ответов: {len(latencies)}, без ответа: {users.timeouts}, за {elapsed:.2f} с '
+          f'({len(latencies) / elapsed:.0f} обновлений/с)')
+    if latencies:
+        print('Задержка до ответа, мс: ' + ', '.join(
+            f'p{q} {percentile(latencies, q) * 1000:.1f}' for q in (50, 95, 99)) + f', макс {latencies[-1] * 1000:.1f}')
+    print('Вызовы Bot API:', dict(sorted(api.calls.items())))
+    print('Маршруты:', {name: route['count'] for name, route in bot.router.stats()['routes'].items()})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    # Кэш, CSV-сессии и журнал стенда не смешиваются с данными настоящего бота
+    with tempfile.TemporaryDirectory(prefix='fake_telegram_') as directory:
+        db_file = os.path.join(directory, 'bot.db')
+        os.chdir(directory)
+        bot.init_services(db_file)
+        asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
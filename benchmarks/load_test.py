@@ -0,0 +1,249 @@
+"""Нагрузочный тест: настоящий Application из main.py против поддельного Bot API с файлами.
+
+Поддельный Bot API (benchmarks.fake_telegram) отдаёт заготовленные фотографию, PDF и CSV через getFile
+и принимает все send*. Несколько пользователей одновременно проходят сценарии — объединение PDF,
+извлечение изображений, фильтры, конвертацию и запросы к CSV. По каждому сценарию выводятся
+p50/p95/p99 времени до последнего ответа на шаг, пропускная способность и пиковая память
+(бот вместе с процессами пула). Каждый пользователь присылает файлы с новыми file_id, поэтому
+кэш результатов не подменяет работу; ограничение частоты запросов по умолчанию отключено.
+Запуск из корня репозитория:
+    python -m benchmarks.load_test --users 20 --rounds 2 --scenarios merge filter csv
+"""
+import argparse
+import asyncio
+import csv
+import glob
+import io
+import itertools
+import os
+import random
+import tempfile
+import time
+from collections import namedtuple
+
+import fitz
+from aiohttp import ClientSession, web
+from PIL import Image
+
+import main as bot
+from benchmarks.fake_telegram import FAKE_TOKEN, FakeBotApi, free_port, make_update, percentile, wait_ready
+from services import rate_limit, webhook
+
+# upload — какой заготовленный файл прислать вместо текста; replies — сколько ответов бота ждать
+Step = namedtuple('Step', 'text upload replies', defaults=(None, None, 1))
+
+SCENARIOS = {
+    'merge': [Step('/pdf_merger'), Step(upload='pdf'), Step(upload='pdf'), Step('Готово!', replies=2),
+              Step('Выйти')],
+    # Извлекаю…, альбом, «завершено» и снова приглашение прислать файлы
+    'extract': [Step('/pdf_images'), Step(upload='pdf'), Step('Готово', replies=4), Step('Выйти')],
+    'filter': [Step('/image_filter'), Step(upload='photo'), Step(upload='photo'), Step('Предпросмотр'),
+               Step('Винтаж', replies=3), Step('Выйти')],
+    'convert': [Step('/format_converter'), Step(upload='photo'), Step('PNG', replies=3), Step('Выйти')],
+    'csv': [Step('/csv_manipulation'), Step(upload='csv', replies=2), Step('Выведи первые 10 строк'),
+            Step('where amount > 500 sort by amount desc limit 20'), Step('group by city sum amount'),
+            Step('Выйти')],
+}
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def canned_photo(size=(1280, 960)) -> bytes:
+    # Шум сжимается плохо — размер JPEG близок к настоящей фотографии
+    channels = [Image.linear_gradient('L').resize(size), Image.radial_gradient('L').resize(size),
+                Image.effect_noise(size, 48)]
+    output = io.BytesIO()
+    Image.merge('RGB', channels).save(output, format='JPEG', quality=90)
+    return output.getvalue()
+
+
+def canned_pdf(pages=5) -> bytes:
+    document = fitz.open()
+    for number in range(pages):
+        page = document.new_page()
+        page.insert_text((72, 72), f'Страница {number + 1}', fontsize=24)
+        # Разные картинки на страницах, иначе извлечение отправит одну
+        page.insert_image(fitz.Rect(72, 120, 520, 456), stream=canned_photo((640 + number * 16, 480)))
+    content = document.tobytes()
+    document.close()
+    return content
+
+
+def canned_csv(rows=20000) -> bytes:
+    generator = random.Random(0)
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['id', 'city', 'amount', 'price', 'date'])
+    for i in range(rows):
+        writer.writerow([i, generator.choice(['Москва', 'Казань', 'Пермь', 'Омск', 'Тула']),
+                         generator.randint(1, 1000), round(generator.uniform(1, 100), 2),
+                         f'2024-{generator.randint(1, 12):02d}-{generator.randint(1, 28):02d}'])
+    return output.getvalue().encode('utf-8')
+
+
+def rss_bytes() -> int:
+    """Резидентная память процесса и его дочерних процессов (пула); вне Linux — пик самого процесса"""
+    try:
+        pids = [os.getpid()]
+        for children in glob.glob('/proc/self/task/*/children'):
+            with open(children) as file:
+                pids.extend(int(pid) for pid in file.read().split())
+        total = 0
+        for pid in pids:
+            try:
+                with open(f'/proc/{pid}/statm') as file:
+                    total += int(file.read().split()[1]) * PAGE_SIZE
+            except FileNotFoundError:
+                pass  # Процесс пула успел завершиться
+        return total
+    except OSError:
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class PeakRss:
+    """Опрашивает память в фоне и запоминает максимум"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = 0
+        self._task = None
+
+    async def _sample(self):
+        while True:
+            self.peak = max(self.peak, rss_bytes())
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self.peak = rss_bytes()
+        self._task = asyncio.create_task(self._sample())
+
+    async def stop(self) -> int:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        return max(self.peak, rss_bytes())
+
+
+class ScenarioUsers:
+    """Пользователи, которые проходят шаги сценария и ждут все ответы бота на каждый шаг"""
+
+    def __init__(self, api: FakeBotApi, webhook_url, files, timeout=60.0):
+        self.api = api
+        self.webhook_url = webhook_url
+        self.files = files  # вид загрузки -> (содержимое, описание документа или None для фотографии)
+        self.timeout = timeout
+        self.update_ids = itertools.count(1)
+        self.file_ids = itertools.count(1)
+
+    def content(self, user_id, step):
+        if step.upload is None:
+            return {'text': step.text}
+        content, document = self.files[step.upload]
+        file_id = f'{step.upload}-{user_id}-{next(self.file_ids)}'
+        self.api.add_file(file_id, content)
+        attachment = {'file_id': file_id, 'file_unique_id': file_id, 'file_size': len(content)}
+        if document is None:
+            return {'photo': [dict(attachment, width=1280, height=960)]}
+        return {'document': dict(attachment, **document)}
+
+    async def send(self, session: ClientSession, user_id, step, result):
+        replies = self.api.reply_queue(user_id)
+        started = time.perf_counter()
+        async with session.post(self.webhook_url,
+                                json=make_update(next(self.update_ids), user_id, **self.content(user_id, step))
+                                ) as response:
+            response.raise_for_status()
+        try:
+            for _ in range(step.replies):
+                await asyncio.wait_for(replies.get(), self.timeout)
+        except asyncio.TimeoutError:
+            result['timeouts'] += 1
+            return
+        result['latencies'].append(time.perf_counter() - started)
+
+    async def run_user(self, session, user_id, steps, rounds, result):
+        for _ in range(rounds):
+            for step in steps:
+                await self.send(session, user_id, step, result)
+
+    async def run(self, steps, users, rounds, first_user_id) -> dict:
+        result = {'latencies': [], 'timeouts': 0}
+        async with ClientSession() as session:
+            await asyncio.gather(*(self.run_user(session, first_user_id + i, steps, rounds, result)
+                                   for i in range(users)))
+        return result
+
+
+async def run(args):
+    api = FakeBotApi()
+    api_runner = web.AppRunner(api.app, access_log=None)
+    await api_runner.setup()
+    api_port, webhook_port = free_port(), free_port()
+    await web.TCPSite(api_runner, '127.0.0.1', api_port).start()
+
+    files = {
+        'photo': (canned_photo(), None),
+        'pdf': (canned_pdf(), {'file_name': 'document.pdf', 'mime_type': 'application/pdf'}),
+        'csv': (canned_csv(args.csv_rows), {'file_name': 'data.csv', 'mime_type': 'text/csv'}),
+    }
+    application = bot.build_application(FAKE_TOKEN, base_url=f'http://127.0.0.1:{api_port}', persistence=False)
+    stop_event = asyncio.Event()
+    bot_task = asyncio.create_task(webhook.serve(application, '127.0.0.1', webhook_port, '/telegram',
+                                                 drain_timeout=30.0, stop_event=stop_event))
+    results = []
+    try:
+        await wait_ready(f'http://127.0.0.1:{webhook_port}/readyz')
+        users = ScenarioUsers(api, f'http://127.0.0.1:{webhook_port}/telegram', files, args.timeout)
+        for index, name in enumerate(args.scenarios):
+            peak_rss = PeakRss()
+            peak_rss.start()
+            started = time.perf_counter()
+            # У каждого сценария свои пользователи: состояние диалогов не пересекается
+            result = await users.run(SCENARIOS[name], args.users, args.rounds, first_user_id=(index + 1) * 100000)
+            result['elapsed'] = time.perf_counter() - started
+            result['peak_rss'] = await peak_rss.stop()
+            results.append((name, result))
+    finally:
+        stop_event.set()
+        await bot_task
+        await api_runner.cleanup()
+
+    print(f'Пользователей: {args.users}, повторов сценария: {args.rounds}, '
+          f'одновременных обновлений: {application.update_processor.max_concurrent_updates}')
+    print(f'{"сценарий":<10}{"шагов":>8}{"без ответа":>12}{"шагов/с":>10}'
+          f'{"p50, мс":>10}{"p95, мс":>10}{"p99, мс":>10}{"пик RSS, МБ":>13}')
+    for name, result in results:
+        latencies = sorted(result['latencies'])
+        quantiles = [percentile(latencies, q) * 1000 if latencies else float('nan') for q in (50, 95, 99)]
+        print(f'{name:<10}{len(latencies):>8}{result["timeouts"]:>12}{len(latencies) / result["elapsed"]:>10.1f}'
+              + ''.join(f'{value:>10.1f}' for value in quantiles) + f'{result["peak_rss"] / 2 ** 20:>13.0f}')
+    print('Вызовы Bot API:', dict(sorted(api.calls.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=10, help="одновременных пользователей в сценарии")
+    parser.add_argument('--rounds', type=int, default=2, help="сколько раз каждый пользователь проходит сценарий")
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--csv-rows', type=int, default=20000)
+    parser.add_argument('--timeout', type=float, default=60.0, help="сколько секунд ждать ответ бота")
+    parser.add_argument('--keep-rate-limits', action='store_true',
+                        help="не отключать ограничение частоты запросов (RATE_LIMITS)")
+    args = parser.parse_args()
+
+    # Кэш, CSV-сессии и журнал стенда не смешиваются с данными настоящего бота
+    with tempfile.TemporaryDirectory(prefix='load_test_') as directory:
+        db_file = os.path.join(directory, 'bot.db')
+        os.chdir(directory)
+        bot.init_services(db_file)
+        if not args.keep_rate_limits:
+            rate_limit.configure({})
+        asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
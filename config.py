@@ -1,2 +1,78 @@
 BOT_TOKEN = 'Вставьте свой код'
 CONVERTAPI_SECRET = 'Вставьте свой ключ'
+WORKER_POOL_SIZE = 2  # Количество процессов для тяжёлой обработки изображений и PDF
+WORKER_QUEUE_LIMIT = 8  # Сколько задач может одновременно ждать или выполняться в пуле
+LOG_BATCH_SIZE = 100  # Сколько записей журнала копить перед записью в БД
+LOG_FLUSH_INTERVAL = 5.0  # Максимальная задержка записи журнала, в секундах
+USER_CACHE_SIZE = 10000  # Сколько пользователей держать в кэше Telegram id -> User.id
+USER_CACHE_TTL = 3600  # Время жизни записи кэша пользователей, в секундах
+SPOOL_DIR = None  # Каталог для временных файлов пользователей (None — системный временный каталог)
+EXTRACT_SEND_CONCURRENCY = 3  # Сколько альбомов с извлечёнными изображениями отправлять одновременно
+CONVERTAPI_STUB = False  # True — использовать локальную заглушку ConvertAPI вместо сетевых запросов
+RESULT_CACHE_MAX_ENTRIES = 100000  # Предел кэша результатов в записях (file_id в БД, сами файлы не хранятся)
+TEXT_DOCUMENTS_PER_CHAT = 3  # Сколько последних TXT/JSON-файлов чата можно листать постранично
+TEXT_SPOOL_DIR = 'text_pages'  # Каталог копий TXT/JSON-файлов для постраничного чтения
+TEXT_DOCUMENT_TTL = 86400  # Через сколько секунд без листания удалять копию файла
+CSV_SESSION_DIR = 'csv_sessions'  # Каталог Parquet-файлов с данными CSV-сессий чатов
+CSV_SESSION_IDLE_TTL = 600  # Через сколько секунд простоя выгружать данные CSV-сессии из памяти
+CSV_SESSION_FILE_TTL = 86400  # Через сколько секунд простоя удалять CSV-сессию полностью
+CSV_MEMORY_BUDGET_MB = 256  # Общий лимит памяти под загруженные CSV-сессии всех чатов
+PERSISTENCE_SPOOL_DIR = 'db/state_spool'  # Каталог для двоичных данных сохранённого состояния диалогов
+PERSISTENCE_UPDATE_INTERVAL = 10  # Как часто (в секундах) бот передаёт изменённое состояние на сохранение
+PERSISTENCE_WRITE_DELAY = 2.0  # Сколько секунд копить изменения состояния перед одной записью в БД
+CONCURRENT_UPDATES = 8  # Сколько обновлений обрабатывать одновременно (сообщения одного чата — всегда по очереди)
+BOT_API_URL = None  # Адрес Bot API без /bot<токен> (None — api.telegram.org; для локального сервера или тестов)
+WEBHOOK_URL = None  # Публичный адрес бота для режима --mode webhook (None — вебхук уже настроен снаружи)
+WEBHOOK_LISTEN = '0.0.0.0'  # На каком адресе слушать вебхук
+WEBHOOK_PORT = 8080  # На каком порту слушать вебхук
+WEBHOOK_PATH = '/telegram'  # Путь, на который Telegram присылает обновления
+WEBHOOK_SECRET = None  # Секрет из заголовка X-Telegram-Bot-Api-Secret-Token (None — не проверять)
+WEBHOOK_DRAIN_TIMEOUT = 30.0  # Сколько секунд при остановке ждать обработки уже принятых обновлений
+JOB_QUEUE = None  # None — тяжёлые задачи выполняет сам бот; 'sqlite' или 'redis' — ставить их в очередь для worker.py
+JOB_QUEUE_REDIS_URL = 'redis://localhost:6379/0'  # Адрес Redis для JOB_QUEUE = 'redis' (нужен пакет redis)
+JOB_SPOOL_DIR = 'jobs'  # Общий для бота и worker.py каталог входных файлов задач (как и SPOOL_DIR)
+JOB_VISIBILITY_TIMEOUT = 300  # Через сколько секунд без продления задачу упавшего worker можно отдать другому
+JOB_MAX_ATTEMPTS = 3  # Сколько раз пытаться выполнить задачу
+JOB_MAX_RUNNING_PER_USER = 1  # Сколько задач одного пользователя может выполняться одновременно
+JOB_WORKER_CONCURRENCY = 2  # Сколько задач одновременно выполняет один процесс worker.py
+JOB_POLL_INTERVAL = 1.0  # Как часто (в секундах) worker.py проверяет пустую очередь
+# Лимиты запросов одного пользователя: операция -> (сколько подряд, за сколько секунд восстанавливается).
+# Команда режима и его тяжёлое действие («Готово!», фильтр, формат) тратят жетоны одной операции
+RATE_LIMITS = {
+    'pdf_merger': (6, 60),
+    'pdf_images': (6, 60),
+    'image_filter': (10, 60),
+    'format_converter': (10, 60),
+    'text_converter': (10, 60),
+    'csv_manipulation': (10, 60),
+    'file_creator': (20, 60),
+    'upload': (30, 60),  # Любой присланный файл или фотография — проверяется до скачивания
+}
+# Стоимость задач пула процессов: пользователь с дорогими задачами реже получает место в пуле
+POOL_TASK_COSTS = {
+    'merge_pdf_files': 4,
+    'build_images_zip': 4,
+    'extract_pdf_images': 2,
+    'append_pdf': 1,
+    'finalize_pdf': 1,
+    'render_filter': 1,
+    'pillow_convert': 1,
+    'verify_image': 0.25,
+}
+DOWNLOAD_CONCURRENCY = 8  # Сколько файлов пользователей скачивать одновременно
+DOWNLOAD_PER_USER_CONCURRENCY = 2  # Сколько файлов одного пользователя скачивать одновременно
+# Максимальный размер присланного файла по типу (Bot API отдаёт файлы не больше 20 MB; CSV — см. CSV_MAX_SIZE_MB)
+DOWNLOAD_MAX_MB = {
+    'photo': 10,
+    'pdf': 20,
+    'text': 20,
+}
+DECODED_IMAGE_CACHE_MB = 64  # Память каждого процесса пула под фотографии, раскодированные при предпросмотре фильтров
+ADMIN_IDS = set()  # Telegram id пользователей, которым доступна команда /stats
+LOG_RETENTION_DAYS = 90  # Сколько дней хранить записи журнала в БД; более старые переносятся в архив
+LOG_ARCHIVE_DIR = 'db/archive'  # Каталог архива журнала (gzip JSON Lines)
+DB_ASYNC = False  # True — писать журнал и пользователей через асинхронный движок (нужен пакет aiosqlite)
+METRICS_HOST = '127.0.0.1'  # Адрес HTTP-сервера метрик Prometheus (/metrics)
+METRICS_PORT = 9100  # Порт сервера метрик; None — не запускать сервер
+METRICS_TRACE = False  # True — писать в журнал каждый вызов обработчика JSON-строкой (trace_id, длительность, ошибка)
+WARMUP = False  # True — после запуска в фоне загрузить pandas/pyarrow и поднять процессы пула с PyMuPDF и Pillow
@@ -1,2 +1,6 @@
 from . import users
 from . import logging
+from . import states
+from . import jobs
+from . import usage
+from . import results
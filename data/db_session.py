@@ -1,3 +1,5 @@
+from contextlib import asynccontextmanager, contextmanager
+
 import sqlalchemy as sa
 import sqlalchemy.orm as orm
 from sqlalchemy.orm import Session
@@ -5,10 +7,30 @@ from sqlalchemy.orm import Session
 SqlAlchemyBase = orm.declarative_base()
 
 __factory = None
+__async_factory = None
 
 
-def global_init(db_file):
-    global __factory
+def _set_pragmas(dbapi_connection, connection_record):
+    # WAL: чтение не ждёт записи, а бот и worker.py пишут в одну БД из разных процессов.
+    # synchronous=NORMAL в режиме WAL не теряет целостность и не ждёт fsync на каждый commit
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA busy_timeout=5000')
+    cursor.close()
+
+
+def make_engine(db_file, tuned=True):
+    """Движок SQLite с пулом соединений; tuned=False — настройки SQLite по умолчанию (для сравнения)"""
+    engine = sa.create_engine(f'sqlite:///{db_file}?check_same_thread=False', echo=False,
+                              pool_size=8, max_overflow=8)
+    if tuned:
+        sa.event.listen(engine, 'connect', _set_pragmas)
+    return engine
+
+
+def global_init(db_file, use_async=False):
+    global __factory, __async_factory
 
     if __factory:
         return
@@ -16,17 +38,59 @@ def global_init(db_file):
     if not db_file or not db_file.strip():
         raise Exception("Необходимо указать файл базы данных.")
 
-    conn_str = f'sqlite:///{db_file.strip()}?check_same_thread=False'
-    print(f"Подключение к базе данных по адресу {conn_str}")
+    db_file = db_file.strip()
+    print(f"Подключение к базе данных по адресу sqlite:///{db_file}")
 
-    engine = sa.create_engine(conn_str, echo=False)
+    engine = make_engine(db_file)
     __factory = orm.sessionmaker(bind=engine)
 
+    if use_async:
+        # Необязательная зависимость: aiosqlite нужен только для асинхронного движка
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        async_engine = create_async_engine(f'sqlite+aiosqlite:///{db_file}', echo=False)
+        sa.event.listen(async_engine.sync_engine, 'connect', _set_pragmas)
+        __async_factory = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
     from . import __all_models
 
     SqlAlchemyBase.metadata.create_all(engine)
+    # create_all не добавляет индексы в уже существующие таблицы
+    for table in SqlAlchemyBase.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
 
 
 def create_session() -> Session:
     global __factory
     return __factory()
+
+
+@contextmanager
+def session_scope():
+    """Сессия, которая фиксирует изменения при успехе, откатывает их при ошибке и всегда закрывается"""
+    db_sess = __factory()
+    try:
+        yield db_sess
+        db_sess.commit()
+    except Exception:
+        db_sess.rollback()
+        raise
+    finally:
+        db_sess.close()
+
+
+def async_enabled() -> bool:
+    return __async_factory is not None
+
+
+@asynccontextmanager
+async def async_session_scope():
+    """То же, что session_scope, но на асинхронном движке: запросы не блокируют цикл событий"""
+    async with __async_factory() as db_sess:
+        try:
+            yield db_sess
+            await db_sess.commit()
+        except Exception:
+            await db_sess.rollback()
+            raise
@@ -0,0 +1,29 @@
+from datetime import datetime
+
+import sqlalchemy
+
+from .db_session import SqlAlchemyBase
+
+
+class QueuedJob(SqlAlchemyBase):
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        sqlalchemy.Index('ix_jobs_status_available', 'status', 'available_at'),
+        sqlalchemy.Index('ix_jobs_user_claimed', 'user_id', 'claimed_at'),
+    )
+    id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True, autoincrement=True)
+    kind = sqlalchemy.Column(sqlalchemy.String, nullable=False)  # merge, extract, filter, convert
+    user_id = sqlalchemy.Column(sqlalchemy.Integer, nullable=False)  # Telegram ID пользователя — для очерёдности
+    payload = sqlalchemy.Column(sqlalchemy.String)  # Параметры задачи в JSON
+    status = sqlalchemy.Column(sqlalchemy.String, default='queued')  # queued, running, done, failed
+    attempts = sqlalchemy.Column(sqlalchemy.Integer, default=0)
+    max_attempts = sqlalchemy.Column(sqlalchemy.Integer, default=3)
+    available_at = sqlalchemy.Column(sqlalchemy.Float)  # Не раньше какого момента (time.time()) можно брать
+    claimed_at = sqlalchemy.Column(sqlalchemy.Float)
+    locked_until = sqlalchemy.Column(sqlalchemy.Float)  # Пока не истекло, задача принадлежит worker
+    worker = sqlalchemy.Column(sqlalchemy.String)
+    error = sqlalchemy.Column(sqlalchemy.String)
+    created_date = sqlalchemy.Column(sqlalchemy.DateTime, default=datetime.now)
+
+    def __repr__(self):
+        return f'{self.kind}#{self.id} ({self.status})'
@@ -8,6 +8,9 @@ from .db_session import SqlAlchemyBase
 
 class Logging(SqlAlchemyBase):
     __tablename__ = 'logging'
+    __table_args__ = (
+        sqlalchemy.Index('ix_logging_request_date', 'request', 'request_date'),
+    )
     id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True, autoincrement=True)
     applying_user = sqlalchemy.Column(sqlalchemy.Integer, sqlalchemy.ForeignKey("users.id"))
     request = sqlalchemy.Column(sqlalchemy.String, nullable=True)
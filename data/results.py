@@ -0,0 +1,14 @@
+import sqlalchemy
+
+from .db_session import SqlAlchemyBase
+
+
+class CachedResult(SqlAlchemyBase):
+    """Результат обработки, уже отправленный в Telegram: по file_id его можно переслать без повторной работы"""
+    __tablename__ = 'cached_results'
+    key = sqlalchemy.Column(sqlalchemy.String, primary_key=True)  # SHA-256 от входного файла, операции и параметров
+    meta = sqlalchemy.Column(sqlalchemy.String, nullable=False)  # file_id и прочие метаданные в JSON
+    used_at = sqlalchemy.Column(sqlalchemy.Float, nullable=False, index=True)  # Последнее обращение (time.time())
+
+    def __repr__(self):
+        return f'{self.key[:12]}…'
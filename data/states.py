@@ -0,0 +1,14 @@
+import sqlalchemy
+
+from .db_session import SqlAlchemyBase
+
+
+class ConversationState(SqlAlchemyBase):
+    __tablename__ = 'conversation_states'
+    kind = sqlalchemy.Column(sqlalchemy.String, primary_key=True)  # user_data или chat_data
+    key = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)  # ID пользователя или чата
+    data = sqlalchemy.Column(sqlalchemy.LargeBinary)  # Состояние без крупных двоичных данных
+    spool_refs = sqlalchemy.Column(sqlalchemy.String, default='')  # Файлы в спул-каталоге, через пробел
+
+    def __repr__(self):
+        return f'{self.kind}:{self.key}'
@@ -0,0 +1,25 @@
+import sqlalchemy
+
+from .db_session import SqlAlchemyBase
+
+
+class HourlyRequests(SqlAlchemyBase):
+    """Сколько раз за час выполнялся каждый запрос — пополняется при записи журнала"""
+    __tablename__ = 'usage_hourly_requests'
+    hour = sqlalchemy.Column(sqlalchemy.DateTime, primary_key=True)  # Начало часа
+    request = sqlalchemy.Column(sqlalchemy.String, primary_key=True)
+    count = sqlalchemy.Column(sqlalchemy.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'{self.hour} {self.request}: {self.count}'
+
+
+class HourlyUsers(SqlAlchemyBase):
+    """Сколько запросов сделал пользователь за час — по этой таблице считаются активные пользователи"""
+    __tablename__ = 'usage_hourly_users'
+    hour = sqlalchemy.Column(sqlalchemy.DateTime, primary_key=True)
+    applying_user = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
+    count = sqlalchemy.Column(sqlalchemy.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'{self.hour} {self.applying_user}: {self.count}'
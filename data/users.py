@@ -9,7 +9,7 @@ from .db_session import SqlAlchemyBase
 class User(SqlAlchemyBase):
     __tablename__ = 'users'
     id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True, autoincrement=True)
-    account_id = sqlalchemy.Column(sqlalchemy.Integer)
+    account_id = sqlalchemy.Column(sqlalchemy.Integer, unique=True, index=True)
 
     nickname = sqlalchemy.Column(sqlalchemy.String)
 
@@ -0,0 +1,51 @@
+import asyncio
+
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
+from telegram.ext import ContextTypes
+
+from config import ADMIN_IDS
+from services import usage_stats
+
+# Окна отчёта /stats: подпись кнопки и аргумента команды -> число часов
+STATS_WINDOWS = {'24h': 24, '7d': 24 * 7, '30d': 24 * 30}
+
+
+def stats_markup(selected: str):
+    return InlineKeyboardMarkup([[
+        InlineKeyboardButton(f'• {window} •' if window == selected else window, callback_data=f'stats:{window}')
+        for window in STATS_WINDOWS
+    ]])
+
+
+async def stats_text(window: str) -> str:
+    return usage_stats.format_report(await asyncio.to_thread(usage_stats.report, STATS_WINDOWS[window]))
+
+
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/stats [24h|7d|30d] — статистика использования бота, только для администраторов"""
+    if update.effective_user.id not in ADMIN_IDS:
+        await context.bot.send_message(chat_id=update.effective_chat.id,
+                                       text="Команда доступна только администраторам.")
+        return
+    window = context.args[0] if context.args and context.args[0] in STATS_WINDOWS else '24h'
+    await context.bot.send_message(chat_id=update.effective_chat.id, text=await stats_text(window),
+                                   reply_markup=stats_markup(window))
+
+
+async def stats_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    if update.effective_user.id not in ADMIN_IDS:
+        await query.answer("Команда доступна только администраторам.")
+        return
+    window = query.data.split(':', 1)[1]
+    if window not in STATS_WINDOWS:
+        await query.answer()
+        return
+    await query.answer()
+    try:
+        await query.edit_message_text(text=await stats_text(window), reply_markup=stats_markup(window))
+    except BadRequest as e:
+        # Повторное нажатие выбранного окна без новых запросов: отчёт и кнопки не изменились
+        if 'message is not modified' not in str(e).lower():
+            raise
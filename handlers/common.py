@@ -0,0 +1,74 @@
+import functools
+
+from telegram import Update, ReplyKeyboardRemove
+from telegram.ext import ContextTypes
+
+from handlers.router import ANY, router
+from services import job_queue, log_writer, rate_limit, user_registry
+
+
+async def logging_request(user, request):
+    # Запись не блокирует обработчик: она попадёт в БД пачкой из фоновой задачи
+    log_writer.enqueue(
+        applying_user=await user_registry.get_user_id(user),  # ID пользователя в таблице users
+        request=request  # Имя запроса
+    )
+
+
+def rate_limited(op):
+    """Декоратор: пропускает обработчик, если пользователь исчерпал лимит операции op (см. RATE_LIMITS).
+
+    Проверка идёт до любых скачиваний; о первом отказе подряд пользователю сообщают и пишут в журнал.
+    """
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            user = update.effective_user
+            decision = rate_limit.acquire(user.id, op)
+            if decision.allowed:
+                return await handler(update, context)
+            if decision.first:
+                await logging_request(user, f'rate_limited:{op}')
+                await context.bot.send_message(chat_id=update.effective_chat.id,
+                                               text=f"Слишком много запросов. Попробуйте снова через "
+                                                    f"{decision.retry_after} с. ⏳")
+
+        return wrapper
+
+    return decorator
+
+
+async def submit_job(update: Update, context: ContextTypes.DEFAULT_TYPE, kind, **payload):
+    """Передаёт тяжёлую задачу в очередь worker.py; результат worker отправит в этот же чат"""
+    user = update.effective_user
+    payload.update(chat_id=update.effective_chat.id, applying_user=await user_registry.get_user_id(user))
+    job_id = await job_queue.enqueue(kind, user.id, payload)
+    await context.bot.send_message(chat_id=update.effective_chat.id,
+                                   text=f"Задача №{job_id} поставлена в очередь. Результат придёт сюда же. ⏳")
+
+
+async def help(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data['state'] = 'menu'
+    user = update.effective_user
+    await user_registry.get_user_id(user)
+    text = """
+    Здравствуйте 👋! Я — телеграм-бот, предназначенный для работы с файлами.
+    Вот перечень моих функций:
+    \t* Запись нескольких PDF-файлов в один
+    \t* Отправка содержимого ваших TXT и CSV файлов
+    \t* Отправка всех фотографий из PDF-файлов
+    \t* Создание быстрых CSV, JSON и TXT файлов
+    \t* Преобразование картинки в черно-белый режим
+    \t* Конвертация изображений между форматами.
+    """
+    await context.bot.send_message(chat_id=update.effective_chat.id,
+                                   text=text, reply_markup=ReplyKeyboardRemove())
+    await logging_request(user, 'help')
+
+
+@router.route(ANY, 'Выйти')
+async def exit_mode(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data['state'] = None
+    context.user_data['photos_to_filter'] = []
+    await update.message.reply_text("Вы вышли из режима.", reply_markup=ReplyKeyboardRemove())
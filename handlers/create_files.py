@@ -0,0 +1,89 @@
+import csv
+import io
+import json
+
+from telegram import Update, InputFile, ReplyKeyboardMarkup
+from telegram.ext import ContextTypes
+
+from handlers.common import logging_request, rate_limited
+from handlers.router import router
+
+
+@rate_limited('file_creator')
+async def create_files(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data['state'] = 'create_files'
+    keyboard = [
+        ["/create_csv"],
+        ["/create_json"],
+        ["/create_txt"]
+    ]
+    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
+    await context.bot.send_message(chat_id=update.effective_chat.id, text="Выберите действие:",
+                                   reply_markup=reply_markup)
+
+
+@rate_limited('file_creator')
+async def create_csv(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = update.effective_user
+    await context.bot.send_message(chat_id=update.effective_chat.id,
+                                   text="Введите данные для CSV файла (каждая строка должна быть разделена запятыми):")
+    await logging_request(user, 'create_csv')
+    context.user_data['state'] = 'create_csv'
+
+
+@rate_limited('file_creator')
+async def create_json(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = update.effective_user
+    await context.bot.send_message(chat_id=update.effective_chat.id,
+                                   text="Введите данные для JSON файла (в формате JSON):")
+    await logging_request(user, 'create_json')
+    context.user_data['state'] = 'create_json'
+
+
+@rate_limited('file_creator')
+async def create_txt(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = update.effective_user
+    await context.bot.send_message(chat_id=update.effective_chat.id,
+                                   text="Введите данные для TXT файла:")
+    await logging_request(user, 'create_txt')
+    context.user_data['state'] = 'create_txt'
+
+
+@router.route('create_csv')
+async def write_csv(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    text = update.message.text
+    await logging_request(update.effective_user, 'create_csv')
+    try:
+        data = [row.split(',') for row in text.split('\n')]
+        # Файл собирается в памяти: общий output.csv на диске путался бы между параллельными чатами
+        file = io.StringIO(newline='')
+        writer = csv.writer(file)
+        writer.writerows(data)
+        await context.bot.send_document(chat_id=update.effective_chat.id,
+                                        document=InputFile(file.getvalue().encode(), filename='output.csv'))
+        context.user_data['state'] = 'menu'
+    except Exception as e:
+        await context.bot.send_message(chat_id=update.effective_chat.id, text="Неправильный формат данных.")
+
+
+@router.route('create_json')
+async def write_json(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    text = update.message.text
+    await logging_request(update.effective_user, 'create_json')
+    try:
+        json_data = json.loads(text)
+        await context.bot.send_document(chat_id=update.effective_chat.id,
+                                        document=InputFile(json.dumps(json_data, indent=4).encode(),
+                                                           filename='output.json'))
+        context.user_data['state'] = 'menu'
+    except json.JSONDecodeError:
+        await context.bot.send_message(chat_id=update.effective_chat.id, text="Неправильный формат данных.")
+
+
+@router.route('create_txt')
+async def write_txt(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    text = update.message.text
+    await logging_request(update.effective_user, 'create_txt')
+    await context.bot.send_document(chat_id=update.effective_chat.id,
+                                    document=InputFile(text.encode(), filename='output.txt'))
+    context.user_data['state'] = 'menu'
@@ -0,0 +1,117 @@
+import io
+import os
+import tempfile
+
+from telegram import Update, InputFile, ReplyKeyboardMarkup, ReplyKeyboardRemove
+from telegram.ext import ContextTypes
+
+from config import SPOOL_DIR
+from handlers.common import logging_request, rate_limited
+from handlers.router import router
+from services import csv_query, csv_sessions, downloads
+
+CSV_MAX_SIZE_MB = 20  # Ограничение размера файла в мегабайтах (лимит скачивания Bot API)
+
+CSV_SAMPLE_BUTTONS = {}
+for rows_count in (10, 20, 30):
+    CSV_SAMPLE_BUTTONS[f"Выведи первые {rows_count} строк"] = ('head', rows_count)
+    CSV_SAMPLE_BUTTONS[f"Выведи последние {rows_count} строк"] = ('tail', rows_count)
+
+CSV_QUERY_HELP = """Можно нажать кнопку или написать запрос, например:
+where price > 10 sort by date desc limit 50
+where city = "Москва" and amount >= 100
+group by city sum amount
+sort by amount desc csv — прислать результат файлом"""
+
+EXPIRED_TEXT = "Данные CSV больше недоступны. Отправьте файл заново: /csv_manipulation"
+
+
+@rate_limited('csv_manipulation')
+async def csv_waiting(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data['csv_waiting'] = True
+    await context.bot.send_message(chat_id=update.effective_chat.id,
+                                   text="Отправь мне csv файл, и я дам тебе его преобразить!",
+                                   reply_markup=ReplyKeyboardRemove())
+
+
+@rate_limited('upload')
+async def reading_csv(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if context.user_data.get('csv_waiting'):
+        context.user_data['csv_waiting'], context.user_data['state'] = False, 'csv_manipulation'
+        document = update.message.document
+        chat_id = update.effective_chat.id
+
+        if not document:
+            await context.bot.send_message(chat_id=chat_id, text="Файл не обнаружен.")
+            return
+
+        fd, temp_file_path = tempfile.mkstemp(prefix=f"{chat_id}_input_", suffix=".csv", dir=SPOOL_DIR)
+        os.close(fd)
+        try:
+            await downloads.fetch_to_drive(context.bot, document, temp_file_path, update.effective_user.id, 'csv',
+                                           CSV_MAX_SIZE_MB * 1024 * 1024)
+        except downloads.FileTooLargeError as e:
+            os.remove(temp_file_path)
+            await context.bot.send_message(chat_id=chat_id, text=str(e))
+            return
+
+        try:
+            # Данные сохраняются в сессию этого чата, другие чаты их не перезапишут
+            session = await csv_sessions.ingest(chat_id, temp_file_path)
+            await context.bot.send_message(chat_id=chat_id,
+                                           text=f"Файл успешно прочитан.\n{session.summary.describe()}")
+            await csv_manipulation(update, context)
+        except csv_sessions.EmptyCsvError:
+            await context.bot.send_message(chat_id=chat_id, text="Файл пуст или поврежден.")
+        except csv_sessions.CsvParseError:
+            await context.bot.send_message(chat_id=chat_id,
+                                           text="Проблемы с парсингом файла. Возможно, неверный формат CSV.")
+        finally:
+            os.remove(temp_file_path)
+            user = update.effective_user
+            await logging_request(user, 'csv_manipulation')
+    else:
+        await context.bot.send_message(chat_id=update.effective_chat.id, text="Сначала нужно выбрать режим!")
+
+
+async def csv_manipulation(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data['state'] = 'csv_manipulation'
+    keyboard = [[button] for button in CSV_SAMPLE_BUTTONS]
+    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
+    await context.bot.send_message(chat_id=update.effective_chat.id, text=f"Выберите действие:\n{CSV_QUERY_HELP}",
+                                   reply_markup=reply_markup)
+
+
+@router.route('csv_manipulation', *CSV_SAMPLE_BUTTONS)
+async def csv_sample(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Первые и последние строки уже собраны при чтении файла, данные целиком не загружаются
+    chat_id = update.effective_chat.id
+    csv_summary = csv_sessions.summary(chat_id)
+    if csv_summary is None:
+        await context.bot.send_message(chat_id=chat_id, text=EXPIRED_TEXT)
+        return
+    which, rows_count = CSV_SAMPLE_BUTTONS[update.message.text]
+    rows = csv_summary.head.head(rows_count) if which == 'head' else csv_summary.tail.tail(rows_count)
+    await context.bot.send_message(chat_id=chat_id, text=csv_query.render_table(rows), parse_mode='HTML')
+
+
+@router.route('csv_manipulation')
+async def csv_query_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    chat_id = update.effective_chat.id
+    session = await csv_sessions.get(chat_id)
+    if session is None:
+        await context.bot.send_message(chat_id=chat_id, text=EXPIRED_TEXT)
+        return
+    try:
+        query = csv_query.parse(update.message.text)
+        result = await csv_sessions.run_query(session, query)
+    except csv_query.QueryError as e:
+        await context.bot.send_message(chat_id=chat_id, text=f"{e}\n\n{CSV_QUERY_HELP}")
+        return
+    await logging_request(update.effective_user, 'csv_query')
+    if query.as_csv:
+        await context.bot.send_document(chat_id=chat_id,
+                                        document=InputFile(io.BytesIO(result.to_csv(index=False).encode('utf-8')),
+                                                           filename="query_result.csv"))
+    else:
+        await context.bot.send_message(chat_id=chat_id, text=csv_query.render_table(result), parse_mode='HTML')
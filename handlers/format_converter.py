@@ -0,0 +1,85 @@
+import io
+
+from telegram import Update, InputFile, ReplyKeyboardMarkup
+from telegram.ext import ContextTypes
+
+from handlers.common import rate_limited, submit_job
+from handlers.router import router
+from handlers.spool import spool_photos
+from services import converters, job_queue, result_cache, workers
+
+FORMATS = ['PNG', 'JPEG', 'WEBP', 'TIFF', 'SVG']
+FORMAT_KEYBOARD = [FORMATS, ['Выйти']]
+
+
+@rate_limited('format_converter')
+async def format_converter_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    keyboard = [['Выйти']]
+    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    await update.message.reply_text('Отправьте мне фотографии, и я сконвертирую их в нужный формат. 📸',
+                                    reply_markup=reply_markup)
+    context.user_data['state'] = 'format_converter_waiting'
+    context.user_data['photos_to_convert'] = []
+
+
+async def convert_photos(bot, chat_id, photos, format, on_progress=None, raise_errors=False) -> bool:
+    """Конвертирует фотографии и отправляет результаты в чат; True, если все удались.
+
+    После каждой отправленной фотографии вызывается on_progress(число обработанных фото), если он задан.
+    С raise_errors=True ошибка не сообщается в чат, а пробрасывается (worker.py повторит задачу).
+    """
+    success_count = 0
+    failure_messages = []
+
+    for i, (photo_bytes, file_format, file_unique_id) in enumerate(photos):
+        try:
+            filename = f"converted_image_{i + 1}.{format}"
+            cache_key = result_cache.make_key(result_cache.source_id(file_unique_id, photo_bytes), 'convert', format)
+            cached = await result_cache.get(cache_key, 'convert')
+            if cached:
+                # Такое преобразование уже делали — пересылаем готовый файл по file_id
+                await bot.send_document(chat_id=chat_id, document=cached['file_id'], filename=filename)
+            else:
+                converted = await converters.convert(photo_bytes, file_format, format)
+                message = await bot.send_document(chat_id=chat_id,
+                                                  document=InputFile(io.BytesIO(converted), filename=filename))
+                await result_cache.put(cache_key, file_id=message.document.file_id)
+            success_count += 1
+            if on_progress:
+                await on_progress(i + 1)
+        except workers.PoolSaturatedError:
+            if raise_errors:
+                raise
+            failure_messages.append(workers.BUSY_MESSAGE)
+            break
+        except Exception as e:
+            if raise_errors:
+                raise
+            failure_messages.append(f'Не удалось преобразовать фотографию {i + 1}: {e}')
+
+    if success_count > 0:
+        await bot.send_message(chat_id=chat_id, text=f'Успешно преобразовано {success_count} фото.')
+    for msg in failure_messages:
+        await bot.send_message(chat_id=chat_id, text=msg)
+    return not failure_messages
+
+
+# Формат можно набрать и строчными буквами
+@router.route('format_converter_waiting', *FORMATS, *(name.lower() for name in FORMATS))
+@rate_limited('format_converter')
+async def convert_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    format = update.message.text.lower()
+    photos_to_convert = context.user_data.get('photos_to_convert', [])
+    if not photos_to_convert:
+        await update.message.reply_text('Не найдено изображение для конвертации.')
+        return
+
+    if job_queue.enabled():
+        await submit_job(update, context, 'convert', photos=await spool_photos(photos_to_convert), format=format)
+        context.user_data['photos_to_convert'] = []
+    elif await convert_photos(context.bot, update.effective_chat.id, photos_to_convert, format):
+        context.user_data['photos_to_convert'] = []
+    context.user_data['state'] = 'format_converter_waiting'
+
+    await update.message.reply_text('Отправьте мне фотографии, и я сконвертирую их в нужный формат. 📸',
+                                    reply_markup=ReplyKeyboardMarkup(FORMAT_KEYBOARD, resize_keyboard=True))
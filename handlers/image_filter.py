@@ -0,0 +1,122 @@
+import io
+
+from telegram import Update, InputMediaPhoto, ReplyKeyboardMarkup
+from telegram.ext import ContextTypes
+
+from handlers.common import logging_request, rate_limited, submit_job
+from handlers.router import router
+from handlers.spool import spool_photos
+from services import job_queue, log_writer, result_cache, user_registry, workers
+from services.image_filters import FILTERS, render_filter, render_previews
+
+PREVIEW_BUTTON = 'Предпросмотр'
+MAX_FILTERED_PHOTOS = 5
+
+
+@rate_limited('image_filter')
+async def start_image_filter(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    keyboard = [['Выйти']]
+    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    await update.message.reply_text('Отправьте мне фотографии, и я изменю их с помощью нужного фильтра. 📸',
+                                    reply_markup=reply_markup)
+    context.user_data['state'] = 'image_filter_waiting'
+    context.user_data['photos_to_filter'] = []
+
+
+async def apply_filter(bot, chat_id, applying_user, photos, name, on_progress=None, raise_errors=False,
+                       limit=MAX_FILTERED_PHOTOS):
+    """Применяет фильтр к фотографиям и отправляет результаты в чат.
+
+    После каждой отправленной фотографии вызывается on_progress(число обработанных фото), если он задан.
+    С raise_errors=True ошибка не сообщается в чат, а пробрасывается (worker.py повторит задачу).
+    """
+    success_count = 0
+    failure_messages = []
+    for i, (photo_bytes, file_format, file_unique_id) in enumerate(photos):
+        try:
+            if success_count >= limit:
+                await bot.send_message(chat_id=chat_id,
+                                       text=f"⚠️ Вы уже отправили максимальное количество изображений "
+                                            f"({MAX_FILTERED_PHOTOS})!")
+                break
+            cache_key = result_cache.make_key(result_cache.source_id(file_unique_id, photo_bytes),
+                                              'filter', name, file_format)
+            cached = await result_cache.get(cache_key, 'filter')
+            if cached:
+                await bot.send_photo(chat_id=chat_id, photo=cached['file_id'])
+            else:
+                # После предпросмотра фотография может быть уже раскодирована в процессе пула
+                output = await workers.run(render_filter, bytes(photo_bytes), name, file_format, file_unique_id)
+
+                # Отправляем обработанное изображение
+                message = await bot.send_photo(chat_id=chat_id, photo=io.BytesIO(output))
+                await result_cache.put(cache_key, file_id=message.photo[-1].file_id)
+            log_writer.enqueue(applying_user=applying_user, request=FILTERS[name].request)
+            success_count += 1
+            if on_progress:
+                await on_progress(i + 1)
+
+        except workers.PoolSaturatedError:
+            if raise_errors:
+                raise
+            failure_messages.append(workers.BUSY_MESSAGE)
+            break
+        except Exception as e:
+            if raise_errors:
+                raise
+            failure_messages.append(f"Ошибка при обработке фото {i + 1}: {str(e)}")
+
+    if success_count > 0:
+        await bot.send_message(chat_id=chat_id, text=f'Успешно преобразовано {success_count} фото.')
+    for msg in failure_messages:
+        await bot.send_message(chat_id=chat_id, text=msg)
+
+
+@router.route('image_filter_waiting', *FILTERS)
+@rate_limited('image_filter')
+async def image_filter(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    name = update.message.text
+    photos_to_use_filter = context.user_data.get('photos_to_filter', [])
+    if not photos_to_use_filter:
+        await update.message.reply_text('Не найдено изображение для конвертации.')
+        return
+
+    if job_queue.enabled():
+        await submit_job(update, context, 'filter', photos=await spool_photos(photos_to_use_filter), filter=name)
+    else:
+        await apply_filter(context.bot, update.effective_chat.id,
+                           await user_registry.get_user_id(update.effective_user), photos_to_use_filter, name)
+    context.user_data['state'] = 'image_filter_waiting'
+
+
+@router.route('image_filter_waiting', PREVIEW_BUTTON)
+@rate_limited('image_filter')
+async def preview_filters(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Присылает альбом с уменьшенной копией первой фотографии под каждым фильтром"""
+    photos_to_use_filter = context.user_data.get('photos_to_filter', [])
+    if not photos_to_use_filter:
+        await update.message.reply_text('Не найдено изображение для конвертации.')
+        return
+    photo_bytes, _, file_unique_id = photos_to_use_filter[0]
+    chat_id = update.effective_chat.id
+
+    cache_key = result_cache.make_key(result_cache.source_id(file_unique_id, photo_bytes), 'filter_preview',
+                                      list(FILTERS))
+    cached = await result_cache.get(cache_key, 'filter_preview')
+    if cached:
+        await context.bot.send_media_group(chat_id=chat_id, media=[
+            InputMediaPhoto(file_id, caption=name) for name, file_id in cached['previews']
+        ])
+        return
+
+    try:
+        previews = await workers.run(render_previews, bytes(photo_bytes), file_unique_id)
+    except workers.PoolSaturatedError:
+        await update.message.reply_text(workers.BUSY_MESSAGE)
+        return
+    messages = await context.bot.send_media_group(chat_id=chat_id, media=[
+        InputMediaPhoto(io.BytesIO(preview), caption=name) for name, preview in previews
+    ])
+    await result_cache.put(cache_key, previews=[[name, message.photo[-1].file_id]
+                                                for (name, _), message in zip(previews, messages)])
+    await logging_request(update.effective_user, 'filter_preview')
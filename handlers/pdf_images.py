@@ -0,0 +1,171 @@
+import asyncio
+import hashlib
+import io
+
+from telegram import Update, InputFile, InputMediaDocument, ReplyKeyboardMarkup, ReplyKeyboardRemove
+from telegram.ext import ContextTypes
+
+from config import DOWNLOAD_MAX_MB, EXTRACT_SEND_CONCURRENCY
+from handlers.common import logging_request, rate_limited, submit_job
+from handlers.router import router
+from handlers.spool import spool_pdfs
+from services import downloads, job_queue, result_cache, workers
+from services.pdf_tools import build_images_zip, extract_pdf_images
+
+
+@rate_limited('pdf_images')
+async def pdf_images_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    keyboard = [['Готово', 'Архив ZIP'], ['Выйти']]
+    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    await update.message.reply_text('Отправьте мне PDF-файл(ы), и я извлеку из них изображения.',
+                                    reply_markup=reply_markup)
+    context.user_data['state'] = 'pdf_images_waiting'
+    context.user_data['pdf_files'] = []
+
+
+async def pdf_images_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if context.user_data.get('state') != 'pdf_images_waiting':
+        await context.bot.send_message(chat_id=update.effective_chat.id, text="Сначала нужно выбрать режим!")
+        return
+    document = update.message.document
+    if document.mime_type == 'application/pdf':
+        try:
+            file_bytes = await downloads.fetch(context.bot, document, update.effective_user.id, 'pdf',
+                                               DOWNLOAD_MAX_MB['pdf'] * 1024 * 1024)
+        except downloads.FileTooLargeError as e:
+            await context.bot.send_message(chat_id=update.effective_chat.id, text=str(e))
+            return
+        context.user_data['pdf_files'].append((file_bytes, document.file_unique_id))
+        await context.bot.send_message(chat_id=update.effective_chat.id, text="Файл получен. ✅")
+    else:
+        await context.bot.send_message(chat_id=update.effective_chat.id,
+                                       text="Это не PDF-файл. Пожалуйста, отправьте PDF-файл. 📄")
+
+
+async def send_image_albums(bot, chat_id, images: list[tuple[str, bytes | str]]) -> list[str]:
+    """Отправляет изображения альбомами по 10 штук, не более нескольких альбомов сразу.
+
+    Содержимое — байты из памяти или file_id уже загруженного файла. Возвращает file_id в том же порядке.
+    """
+    semaphore = asyncio.Semaphore(EXTRACT_SEND_CONCURRENCY)
+
+    def media(image_filename, content):
+        return content if isinstance(content, str) else InputFile(io.BytesIO(content), filename=image_filename)
+
+    async def send_album(album):
+        async with semaphore:
+            if len(album) == 1:
+                message = await bot.send_document(chat_id=chat_id, document=media(*album[0]))
+                return [message.document.file_id]
+            messages = await bot.send_media_group(chat_id=chat_id, media=[
+                InputMediaDocument(media(image_filename, content), filename=image_filename)
+                for image_filename, content in album
+            ])
+            return [message.document.file_id for message in messages]
+
+    albums = [images[i:i + 10] for i in range(0, len(images), 10)]
+    results = await asyncio.gather(*(send_album(album) for album in albums))
+    return [file_id for album_file_ids in results for file_id in album_file_ids]
+
+
+async def send_extracted(bot, chat_id, pdf_files, as_zip=False, on_progress=None) -> list:
+    """Извлекает изображения из PDF и отправляет их в чат.
+
+    После каждого обработанного файла вызывается on_progress(число обработанных файлов), если он задан.
+    Возвращает файлы, до которых не дошла очередь из-за перегрузки пула (пустой список — всё отправлено).
+    """
+    if as_zip:
+        sources = [result_cache.source_id(file_unique_id, pdf_file) for pdf_file, file_unique_id in pdf_files]
+        cache_key = result_cache.make_key(sources, 'pdf_images_zip')
+        try:
+            cached = await result_cache.get(cache_key, 'pdf_images_zip')
+            if cached:
+                await bot.send_document(chat_id=chat_id, document=cached['file_id'])
+            else:
+                archive = await workers.run(build_images_zip, [bytes(pdf_file) for pdf_file, _ in pdf_files])
+                message = await bot.send_document(chat_id=chat_id,
+                                                  document=InputFile(io.BytesIO(archive), filename="images.zip"))
+                await result_cache.put(cache_key, file_id=message.document.file_id)
+        except workers.PoolSaturatedError:
+            await bot.send_message(chat_id=chat_id, text=workers.BUSY_MESSAGE)
+            return pdf_files
+        except Exception as e:
+            await bot.send_message(chat_id=chat_id, text=f"Произошла ошибка при обработке файла: {e} 😢")
+        if on_progress:
+            await on_progress(len(pdf_files))
+        pdf_files = []
+
+    sent_digests = set()
+    for index, (pdf_file, file_unique_id) in enumerate(pdf_files):
+        try:
+            cache_key = result_cache.make_key(result_cache.source_id(file_unique_id, pdf_file), 'pdf_images')
+            cached = await result_cache.get(cache_key, 'pdf_images')
+            if cached:
+                # [имя, sha1 содержимого, file_id] для каждого уникального изображения файла
+                file_images = cached['images']
+            else:
+                file_images = [[image_filename, hashlib.sha1(image_bytes).hexdigest(), image_bytes]
+                               for image_filename, image_bytes in
+                               await workers.run(extract_pdf_images, bytes(pdf_file))]
+
+            # Одинаковые картинки из разных файлов тоже отправляем один раз
+            to_send = [image for image in file_images if image[1] not in sent_digests]
+            sent_digests.update(digest for _, digest, _ in to_send)
+            file_ids = await send_image_albums(bot, chat_id,
+                                               [(image_filename, content) for image_filename, _, content in to_send])
+
+            if not cached and len(to_send) == len(file_images):
+                await result_cache.put(cache_key, images=[[image_filename, digest, file_id] for
+                                                          (image_filename, digest, _), file_id in zip(to_send, file_ids)])
+        except workers.PoolSaturatedError:
+            # Необработанные файлы остаются в очереди — «Готово» можно нажать ещё раз
+            await bot.send_message(chat_id=chat_id, text=workers.BUSY_MESSAGE)
+            return pdf_files[index:]
+        except Exception as e:
+            await bot.send_message(chat_id=chat_id, text=f"Произошла ошибка при обработке файла: {e} 😢")
+        if on_progress:
+            await on_progress(index + 1)
+
+    await bot.send_message(chat_id=chat_id, text="Извлечение изображений завершено! 📸")
+    return []
+
+
+async def extract_images(update: Update, context: ContextTypes.DEFAULT_TYPE, as_zip: bool = False):
+    pdf_files = context.user_data.get('pdf_files', [])
+    if not pdf_files:
+        await context.bot.send_message(chat_id=update.effective_chat.id,
+                                       text="Нет файлов для обработки. 😔 Отправьте PDF-файлы.",
+                                       reply_markup=ReplyKeyboardRemove())
+        return
+
+    user = update.effective_user
+    await logging_request(user, 'pdf_images_zip' if as_zip else 'pdf_images')
+    if job_queue.enabled():
+        await submit_job(update, context, 'extract', pdfs=await spool_pdfs(pdf_files), as_zip=as_zip)
+    else:
+        await context.bot.send_message(chat_id=update.effective_chat.id, text="Извлекаю изображения... ⏳",
+                                       reply_markup=ReplyKeyboardRemove())
+        remaining = await send_extracted(context.bot, update.effective_chat.id, pdf_files, as_zip)
+        if remaining:
+            context.user_data['pdf_files'] = remaining
+            return
+
+    # context.user_data['state'] = None
+    keyboard = [['Готово', 'Архив ZIP'], ['Выйти']]
+    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    await update.message.reply_text('Отправьте мне PDF-файл(ы), и я извлеку из них изображения.',
+                                    reply_markup=reply_markup)
+    context.user_data['state'] = 'pdf_images_waiting'
+    context.user_data['pdf_files'] = []
+
+
+@router.route('pdf_images_waiting', 'Готово')
+@rate_limited('pdf_images')
+async def extract_images_albums(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await extract_images(update, context)
+
+
+@router.route('pdf_images_waiting', 'Архив ZIP')
+@rate_limited('pdf_images')
+async def extract_images_zip(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await extract_images(update, context, as_zip=True)
@@ -0,0 +1,112 @@
+import logging
+
+from telegram import Update, InputFile, ReplyKeyboardMarkup, ReplyKeyboardRemove
+from telegram.ext import ContextTypes
+
+from config import DOWNLOAD_MAX_MB, SPOOL_DIR
+from handlers.common import logging_request, rate_limited, submit_job
+from handlers.pdf_images import pdf_images_handler
+from handlers.router import router
+from services import downloads, job_queue, workers
+from services.pdf_merge import MergeSession
+
+logger = logging.getLogger(__name__)
+
+
+@rate_limited('pdf_merger')
+async def pdf_merger(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    keyboard = [["Готово!"]]
+    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    await context.bot.send_message(chat_id=update.effective_chat.id,
+                                   text=
+                                   "Отправьте мне несколько PDF-файлов, и я объединю их в один."
+                                   " Когда закончите, нажмите 'Готово!'",
+                                   reply_markup=reply_markup)
+    # Каждому чату — своя сессия с файлами во временном каталоге
+    old_session = context.chat_data.pop('merge_session', None)
+    if old_session:
+        old_session.close()
+    context.chat_data['merge_session'] = MergeSession(SPOOL_DIR)
+    context.user_data['state'] = 'pdf_merger'
+
+
+async def send_merged(bot, chat_id, output_path, page_count):
+    """Отправляет объединённый PDF или сообщение об ошибке"""
+    try:
+        if page_count:
+            with open(output_path, 'rb') as merged_pdf:
+                await bot.send_document(
+                    chat_id=chat_id,
+                    document=InputFile(merged_pdf, filename="merged_document.pdf"),
+                    caption="Ваш объединенный PDF-файл! 📁"
+                )
+        else:
+            await bot.send_message(chat_id=chat_id, text="Произошла ошибка при объединении файлов. ❌",
+                                   reply_markup=ReplyKeyboardRemove())
+    except Exception as e:
+        await bot.send_message(chat_id=chat_id, text=f"Произошла ошибка: {e} 😢", reply_markup=ReplyKeyboardRemove())
+
+
+@router.route('pdf_merger', 'Готово!')
+@rate_limited('pdf_merger')
+async def merge(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    session = context.chat_data.get('merge_session')
+    if not session:
+        await context.bot.send_message(chat_id=update.effective_chat.id,
+                                       text="Нет файлов для объединения. 😔 Отправьте сначала PDF-файлы.",
+                                       reply_markup=ReplyKeyboardRemove())
+        return
+
+    if job_queue.enabled():
+        # Файлы уже на диске: worker объединит их сам и удалит каталог
+        directory, paths = session.detach()
+        context.chat_data.pop('merge_session', None)
+        await submit_job(update, context, 'merge', directory=directory, paths=paths)
+        await logging_request(update.effective_user, 'pdf_merger')
+        return
+
+    await context.bot.send_message(chat_id=update.effective_chat.id, text="Объединяю файлы... ⏳",
+                                   reply_markup=ReplyKeyboardRemove())
+    try:
+        # Почти всё объединение уже сделано по мере получения файлов
+        page_count = await session.finish()
+    except workers.PoolSaturatedError:
+        # Файлы не сбрасываем, чтобы пользователь мог повторить «Готово!» позже
+        await context.bot.send_message(chat_id=update.effective_chat.id, text=workers.BUSY_MESSAGE,
+                                       reply_markup=ReplyKeyboardMarkup([["Готово!"]], resize_keyboard=True))
+        return
+    except Exception:
+        page_count = 0
+        logger.exception("Ошибка при объединении PDF")
+
+    try:
+        await send_merged(context.bot, update.effective_chat.id, session.output_path, page_count)
+    finally:
+        context.chat_data.pop('merge_session', None)
+        session.close()
+        user = update.effective_user
+        await logging_request(user, 'pdf_merger')
+
+
+@rate_limited('upload')
+async def pdf_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    current_state = context.user_data.get('state')
+    if current_state == 'pdf_merger':
+        session = context.chat_data.get('merge_session')
+        if session is None:
+            session = context.chat_data['merge_session'] = MergeSession(SPOOL_DIR)
+        # Файл пишется сразу на диск, в памяти бота он целиком не хранится
+        path = session.next_path()
+        try:
+            await downloads.fetch_to_drive(context.bot, update.message.document, path, update.effective_user.id,
+                                           'pdf', DOWNLOAD_MAX_MB['pdf'] * 1024 * 1024)
+        except downloads.FileTooLargeError as e:
+            await context.bot.send_message(chat_id=update.effective_chat.id, text=str(e))
+            return
+        # С очередью задач объединять будет worker, поэтому пул бота не занимаем
+        session.add(path, merge=not job_queue.enabled())
+        await context.bot.send_message(chat_id=update.effective_chat.id, text="Файл получен. ✅")
+    elif current_state == 'pdf_images_waiting':
+        await pdf_images_handler(update, context)
+    else:
+        await context.bot.send_message(chat_id=update.effective_chat.id, text="Сначала нужно выбрать режим!")
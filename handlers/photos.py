@@ -0,0 +1,68 @@
+from telegram import Update, ReplyKeyboardMarkup
+from telegram.ext import ContextTypes
+
+from config import DOWNLOAD_MAX_MB
+from handlers.common import rate_limited
+from handlers.format_converter import FORMAT_KEYBOARD
+from handlers.image_filter import PREVIEW_BUTTON
+from services import downloads, workers
+from services.image_filters import FILTERS, verify_image
+
+# Приём фотографий общий для конвертера форматов и фильтров: очередь выбирается по режиму
+PHOTO_QUEUES = {
+    'format_converter_waiting': 'photos_to_convert',
+    'image_filter_waiting': 'photos_to_filter',
+}
+MAX_PHOTOS = 5
+
+
+@rate_limited('upload')
+async def image_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    state = context.user_data.get('state')
+    if state not in PHOTO_QUEUES:
+        await context.bot.send_message(chat_id=update.effective_chat.id, text="Сначала нужно выбрать режим!")
+        return
+    # Лимит считается только по очереди текущего режима
+    queue = context.user_data.setdefault(PHOTO_QUEUES[state], [])
+    if len(queue) >= MAX_PHOTOS:
+        await update.message.reply_text(f"⚠️ Вы уже отправили максимальное количество изображений ({MAX_PHOTOS})!")
+        return
+
+    photos = update.message.photo
+    if photos:
+        source, file_format = photos[-1], 'jpg'
+    elif update.message.document and update.message.document.mime_type.startswith('image'):
+        source = update.message.document
+        file_format = source.file_name.split('.')[-1].lower()
+    else:
+        await update.message.reply_text('Это не изображение. Пожалуйста, отправьте фотографию. 🖼️')
+        return
+
+    try:
+        photo_bytes = await downloads.fetch(context.bot, source, update.effective_user.id, 'photo',
+                                            DOWNLOAD_MAX_MB['photo'] * 1024 * 1024)
+    except downloads.FileTooLargeError as e:
+        await update.message.reply_text(str(e))
+        return
+    try:
+        is_valid = await workers.run(verify_image, bytes(photo_bytes))
+    except workers.PoolSaturatedError:
+        await update.message.reply_text(workers.BUSY_MESSAGE)
+        return
+    if not is_valid:
+        await update.message.reply_text('Не удалось обработать изображение. Пожалуйста, попробуйте другой файл. 😥')
+        return
+
+    queue.append((photo_bytes, file_format, source.file_unique_id))
+    remaining = MAX_PHOTOS - len(queue)
+    if state == 'format_converter_waiting':
+        reply_markup = ReplyKeyboardMarkup(FORMAT_KEYBOARD, resize_keyboard=True)
+        await update.message.reply_text(
+            f'Фотографии добавлены в очередь! ✅ Отправьте еще фотографии (осталось {remaining}) или выберите формат для конвертации:',
+            reply_markup=reply_markup)
+    else:
+        keyboard = [list(FILTERS), [PREVIEW_BUTTON, 'Выйти']]
+        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+        await update.message.reply_text(
+            f'Фотографии добавлены в очередь! ✅ Отправьте еще фотографии (осталось {remaining}) или выберите фильтр:',
+            reply_markup=reply_markup)
@@ -0,0 +1,98 @@
+import time
+
+from services import metrics
+
+# Маршрутизация текстовых сообщений: таблица (состояние, текст) -> обработчик.
+# Вместо цепочки сравнений — один-два поиска в словаре на каждое сообщение.
+
+ANY = '*'  # Маршрут действует в любом состоянии
+
+
+class RouteStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, elapsed):
+        self.count += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'latency_avg': self.total / (self.count or 1),
+            'latency_max': self.max,
+        }
+
+
+class Router:
+    """Сопоставляет текст сообщения и текущий режим пользователя с обработчиком.
+
+    Порядок поиска: точный маршрут режима, затем маршрут для любого режима (ANY),
+    затем обработчик режима «по умолчанию» для произвольного текста.
+    """
+
+    def __init__(self):
+        self.routes = {}  # (состояние, текст) -> обработчик
+        self.fallbacks = {}  # состояние -> обработчик любого другого текста
+        self.route_stats = {}
+        self.unmatched = 0
+
+    def add(self, state, texts, handler):
+        for text in texts:
+            if (state, text) in self.routes:
+                raise Exception(f"Маршрут ({state!r}, {text!r}) уже зарегистрирован.")
+            self.routes[(state, text)] = handler
+
+    def route(self, state, *texts):
+        """Декоратор: регистрирует обработчик для текстов в режиме state; без текстов — для любого текста"""
+
+        def decorator(handler):
+            if texts:
+                self.add(state, texts, handler)
+            else:
+                self.fallbacks[state] = handler
+            return handler
+
+        return decorator
+
+    def resolve(self, state, text):
+        handler = self.routes.get((state, text))
+        if handler is None:
+            handler = self.routes.get((ANY, text)) or self.fallbacks.get(state)
+        return handler
+
+    async def dispatch(self, update, context):
+        handler = self.resolve(context.user_data.get('state'), update.message.text)
+        if handler is None:
+            self.unmatched += 1
+            return
+        route_stats = self.route_stats.get(handler.__name__)
+        if route_stats is None:
+            route_stats = self.route_stats[handler.__name__] = RouteStats()
+        started = time.perf_counter()
+        # Трафик к Bot API учитывается по конкретному маршруту, а не по общему handle_message
+        token = metrics.current_handler.set(handler.__name__)
+        try:
+            with metrics.span(handler.__name__):
+                await handler(update, context)
+        except Exception:
+            route_stats.errors += 1
+            raise
+        finally:
+            route_stats.record(time.perf_counter() - started)
+            metrics.current_handler.reset(token)
+
+    def stats(self):
+        """Число вызовов, ошибки и время обработки по маршрутам"""
+        return {
+            'routes': {name: route_stats.as_dict() for name, route_stats in self.route_stats.items()},
+            'unmatched': self.unmatched,
+        }
+
+
+router = Router()
@@ -0,0 +1,40 @@
+import asyncio
+
+from services import job_queue
+
+# Входные данные задач для worker.py: байты из user_data сохраняются в общий каталог очереди,
+# а в задачу попадают только пути к файлам.
+
+
+def _read(path) -> bytes:
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+async def spool_photos(photos) -> list[dict]:
+    def save():
+        return [{'path': job_queue.save_input(bytes(photo_bytes), f'.{file_format}'), 'format': file_format,
+                 'file_unique_id': file_unique_id} for photo_bytes, file_format, file_unique_id in photos]
+
+    return await asyncio.to_thread(save)
+
+
+def load_photos(entries) -> list[tuple]:
+    return [(_read(entry['path']), entry['format'], entry['file_unique_id']) for entry in entries]
+
+
+async def spool_pdfs(pdf_files) -> list[dict]:
+    def save():
+        return [{'path': job_queue.save_input(bytes(pdf_file), '.pdf'), 'file_unique_id': file_unique_id}
+                for pdf_file, file_unique_id in pdf_files]
+
+    return await asyncio.to_thread(save)
+
+
+def load_pdfs(entries) -> list[tuple]:
+    return [(_read(entry['path']), entry['file_unique_id']) for entry in entries]
+
+
+def job_paths(payload) -> list[str]:
+    """Файлы задачи, которые нужно удалить после её завершения"""
+    return [entry['path'] for entry in payload.get('photos', []) + payload.get('pdfs', [])]
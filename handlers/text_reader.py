@@ -0,0 +1,119 @@
+import asyncio
+import json
+import os
+import tempfile
+
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardRemove
+from telegram.ext import ContextTypes
+
+from config import DOWNLOAD_MAX_MB, SPOOL_DIR, TEXT_DOCUMENTS_PER_CHAT
+from handlers.common import logging_request, rate_limited
+from services import downloads, text_pages
+
+
+@rate_limited('text_converter')
+async def reading_files(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data['state'] = 'reading_files'
+    await context.bot.send_message(chat_id=update.effective_chat.id,
+                                   text="Отправьте файл (.txt, .json), а я пришлю его вам сообщением!",
+                                   reply_markup=ReplyKeyboardRemove())
+
+
+def page_markup(doc_id: int, number: int, page_count: int):
+    """Кнопки листания; страницы подгружаются с диска только по нажатию"""
+    if page_count <= 1:
+        return None
+    buttons = []
+    if number > 0:
+        buttons.append(InlineKeyboardButton('◀️', callback_data=f'page:{doc_id}:{number - 1}'))
+    buttons.append(InlineKeyboardButton(f'{number + 1}/{page_count}', callback_data='page:noop'))
+    if number < page_count - 1:
+        buttons.append(InlineKeyboardButton('▶️', callback_data=f'page:{doc_id}:{number + 1}'))
+    return InlineKeyboardMarkup([buttons])
+
+
+async def send_paginated(update: Update, context: ContextTypes.DEFAULT_TYPE, document, opener):
+    """Скачивает файл на диск, строит индекс страниц и сразу отправляет первую страницу"""
+    with tempfile.TemporaryDirectory(dir=SPOOL_DIR) as directory:
+        raw_path = os.path.join(directory, 'input')
+        await downloads.fetch_to_drive(context.bot, document, raw_path, update.effective_user.id, 'text',
+                                       DOWNLOAD_MAX_MB['text'] * 1024 * 1024)
+        text_document = await asyncio.to_thread(opener, raw_path)
+
+    documents = context.chat_data.setdefault('text_documents', {})
+    doc_id = context.chat_data.get('text_documents_next_id', 0)
+    context.chat_data['text_documents_next_id'] = doc_id + 1
+    documents[doc_id] = text_document
+    # Держим на диске только несколько последних файлов чата
+    while len(documents) > TEXT_DOCUMENTS_PER_CHAT:
+        documents.pop(min(documents)).close()
+
+    first_page = text_document.read_page(0)
+    if not first_page.strip():
+        await context.bot.send_message(chat_id=update.effective_chat.id, text="Файл пуст.")
+        return
+    await context.bot.send_message(chat_id=update.effective_chat.id, text=first_page,
+                                   reply_markup=page_markup(doc_id, 0, text_document.page_count))
+
+
+async def text_page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    if query.data == 'page:noop':
+        await query.answer()
+        return
+    _, doc_id, number = query.data.split(':')
+    documents = context.chat_data.get('text_documents', {})
+    text_document = documents.get(int(doc_id))
+    number = int(number)
+    try:
+        page = text_document.read_page(number) if text_document else None
+    except FileNotFoundError:
+        # Копию файла удалили по сроку хранения
+        documents.pop(int(doc_id))
+        page = None
+    if page is None:
+        await query.answer("Файл больше недоступен, отправьте его заново.")
+        return
+    await query.answer()
+    await query.edit_message_text(text=page if page.strip() else "…",
+                                  reply_markup=page_markup(int(doc_id), number, text_document.page_count))
+
+
+@rate_limited('upload')
+async def reading_txt(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if context.user_data.get('state') == 'reading_files':
+        try:
+            document = update.message.document
+            if document.mime_type == 'text/plain':
+                user = update.effective_user
+                await logging_request(user, 'reading_txt')
+                await send_paginated(update, context, document, text_pages.open_text)
+        except downloads.FileTooLargeError as e:
+            await context.bot.send_message(chat_id=update.effective_chat.id, text=str(e))
+        except Exception:
+            await context.bot.send_message(chat_id=update.effective_chat.id,
+                                           text="Ошибка при выводе файла!")
+
+    else:
+        await context.bot.send_message(chat_id=update.effective_chat.id, text="Сначала нужно выбрать режим!")
+
+
+@rate_limited('upload')
+async def reading_json(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if context.user_data.get('state') == 'reading_files':
+        try:
+            document = update.message.document
+            if document.mime_type == 'application/json':
+                user = update.effective_user
+                await logging_request(user, 'reading_json')
+                await send_paginated(update, context, document, text_pages.open_json)
+        except downloads.FileTooLargeError as e:
+            await context.bot.send_message(chat_id=update.effective_chat.id, text=str(e))
+        except json.JSONDecodeError:
+            await context.bot.send_message(chat_id=update.effective_chat.id,
+                                           text="Ошибка при выводе файла! (Некорректный JSON)")
+        except Exception:
+            await context.bot.send_message(chat_id=update.effective_chat.id,
+                                           text="Ошибка при выводе файла!")
+    else:
+        await context.bot.send_message(chat_id=update.effective_chat.id, text="Сначала нужно выбрать режим!")
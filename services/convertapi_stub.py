@@ -0,0 +1,52 @@
+"""Локальная заглушка ConvertAPI с тем же интерфейсом, что использует ConvertApiConverter.
+
+Позволяет проверять запасной путь конвертации без сети и ключа API:
+в config.py достаточно выставить CONVERTAPI_STUB = True.
+"""
+import base64
+import io
+
+from PIL import Image
+
+SUPPORTED_FORMATS = {'svg'}
+
+
+class ApiError(Exception):
+    pass
+
+
+class UploadIO:
+    def __init__(self, io, filename=None):
+        self.io = io
+        self.filename = filename
+
+
+class _ResultFile:
+    def __init__(self, data: bytes, filename: str):
+        self.filename = filename
+        self.size = len(data)
+        self.io = io.BytesIO(data)
+
+
+class _Result:
+    def __init__(self, data: bytes, filename: str):
+        self.file = _ResultFile(data, filename)
+        self.files = [self.file]
+
+
+def _to_svg(data: bytes) -> bytes:
+    """SVG-обёртка над PNG-версией изображения"""
+    with Image.open(io.BytesIO(data)) as img:
+        width, height = img.size
+        png = io.BytesIO()
+        img.save(png, format='PNG')
+    encoded = base64.b64encode(png.getvalue()).decode('ascii')
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}">'
+            f'<image width="{width}" height="{height}" href="data:image/png;base64,{encoded}"/></svg>').encode()
+
+
+def convert(to_format, params, from_format=None, timeout=None):
+    if to_format not in SUPPORTED_FORMATS:
+        raise ApiError(f'Conversion {from_format} to {to_format} is not supported')
+    upload = params['File']
+    return _Result(_to_svg(upload.io.read()), f'converted.{to_format}')
@@ -0,0 +1,97 @@
+import asyncio
+import io
+
+from services import workers
+
+# Имена форматов Pillow для кнопок клавиатуры
+PILLOW_FORMATS = {'png': 'PNG', 'jpeg': 'JPEG', 'jpg': 'JPEG', 'webp': 'WEBP', 'tiff': 'TIFF'}
+
+
+class ConversionError(Exception):
+    """Конвертер не смог преобразовать изображение"""
+
+
+def pillow_convert(photo_bytes: bytes, target_format: str) -> bytes:
+    """Конвертирует изображение локально средствами Pillow (выполняется в пуле процессов)"""
+    from PIL import Image
+
+    pil_format = PILLOW_FORMATS[target_format]
+    with Image.open(io.BytesIO(photo_bytes)) as img:
+        if pil_format == 'JPEG' and img.mode not in ('RGB', 'L'):
+            # У JPEG нет прозрачности: кладём изображение на белый фон
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            rgba = img.convert('RGBA')
+            background.paste(rgba, mask=rgba.getchannel('A'))
+            img = background
+        output = io.BytesIO()
+        img.save(output, format=pil_format)
+    return output.getvalue()
+
+
+class PillowConverter:
+    """Конвертация в памяти, без сети и временных файлов"""
+    name = 'pillow'
+
+    async def convert(self, photo_bytes: bytes, source_format: str, target_format: str) -> bytes:
+        try:
+            return await workers.run(pillow_convert, bytes(photo_bytes), target_format)
+        except (workers.PoolSaturatedError, ConversionError):
+            raise
+        except Exception as e:
+            raise ConversionError(f'Pillow не смог преобразовать {source_format.upper()} '
+                                  f'в {target_format.upper()}: {e}')
+
+
+class ConvertApiConverter:
+    """Конвертация через ConvertAPI для форматов, которых нет в Pillow (например, SVG).
+
+    client — модуль convertapi или его локальная заглушка services.convertapi_stub.
+    """
+    name = 'convertapi'
+
+    def __init__(self, client):
+        self.client = client
+
+    def _convert_sync(self, photo_bytes, source_format, target_format):
+        upload = self.client.UploadIO(io.BytesIO(photo_bytes), f'photo.{source_format}')
+        try:
+            result = self.client.convert(target_format, {'File': upload}, from_format=source_format)
+        except self.client.ApiError:
+            raise ConversionError(f'ConvertAPI не поддерживает конвертацию из {source_format.upper()} '
+                                  f'в {target_format.upper()}. 😥')
+        return result.file.io.read()
+
+    async def convert(self, photo_bytes: bytes, source_format: str, target_format: str) -> bytes:
+        # Сетевой вызов блокирующий — уводим его в поток, чтобы не останавливать цикл событий
+        return await asyncio.to_thread(self._convert_sync, bytes(photo_bytes), source_format, target_format)
+
+
+CONVERTERS = {}
+
+
+def register_converter(target_format: str, converter):
+    CONVERTERS[target_format.lower()] = converter
+
+
+def global_init(convertapi_secret=None, use_stub=False):
+    """Регистрирует Pillow для всех поддерживаемых форматов, а ConvertAPI — как запасной вариант для SVG"""
+    pillow = PillowConverter()
+    for target_format in PILLOW_FORMATS:
+        register_converter(target_format, pillow)
+
+    if use_stub:
+        from services import convertapi_stub as client
+    else:
+        try:
+            import convertapi as client
+        except ImportError:
+            return
+        client.api_credentials = convertapi_secret
+    register_converter('svg', ConvertApiConverter(client))
+
+
+async def convert(photo_bytes: bytes, source_format: str, target_format: str) -> bytes:
+    converter = CONVERTERS.get(target_format.lower())
+    if converter is None:
+        raise ConversionError(f'Конвертация в {target_format.upper()} недоступна. 😥')
+    return await converter.convert(photo_bytes, source_format.lower(), target_format.lower())
@@ -0,0 +1,233 @@
+"""Небольшой язык запросов к CSV-сессии.
+
+Примеры:
+    where price > 10 sort by date desc limit 50
+    where city = "Нижний Новгород" and amount >= 100
+    group by city sum amount
+    sort by amount desc limit 20 csv
+"""
+import datetime
+import html
+import operator
+import shlex
+from collections import OrderedDict
+from typing import NamedTuple
+
+DEFAULT_LIMIT = 50
+QUERY_CACHE_SIZE = 32
+
+OPERATORS = {
+    '=': operator.eq,
+    '==': operator.eq,
+    '!=': operator.ne,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+}
+AGGREGATIONS = {'sum': 'sum', 'mean': 'mean', 'avg': 'mean', 'min': 'min', 'max': 'max', 'count': 'count'}
+
+
+class QueryError(Exception):
+    """Запрос не удалось разобрать или выполнить; текст ошибки показывается пользователю"""
+
+
+class Query(NamedTuple):
+    conditions: tuple = ()  # (столбец, оператор, значение)
+    group_by: str = None
+    aggregation: str = None
+    aggregate_column: str = None
+    sort_by: str = None
+    descending: bool = False
+    limit: int = None
+    as_csv: bool = False
+
+
+def parse(text: str) -> Query:
+    try:
+        tokens = shlex.split(text)
+    except ValueError as e:
+        raise QueryError(f"Не удалось разобрать запрос: {e}")
+    words = [token.lower() for token in tokens]
+    position = 0
+    conditions = []
+    fields = {}
+
+    def take(expected=None):
+        nonlocal position
+        if position >= len(tokens):
+            raise QueryError("Запрос оборвался на середине.")
+        token = tokens[position]
+        if expected and words[position] != expected:
+            raise QueryError(f"Ожидалось «{expected}», а получено «{token}».")
+        position += 1
+        return token
+
+    while position < len(tokens):
+        word = words[position]
+        if word in ('where', 'and'):
+            take()
+            column, op = take(), take()
+            if op.lower() not in OPERATORS and op.lower() != 'contains':
+                raise QueryError(f"Неизвестный оператор «{op}».")
+            conditions.append((column, op.lower(), take()))
+        elif word == 'group':
+            take(), take('by')
+            fields['group_by'] = take()
+            aggregation = take().lower()
+            if aggregation not in AGGREGATIONS:
+                raise QueryError(f"Неизвестная агрегация «{aggregation}». Доступны: {', '.join(AGGREGATIONS)}.")
+            fields['aggregation'] = AGGREGATIONS[aggregation]
+            if position < len(tokens) and words[position] not in ('sort', 'limit', 'csv', 'where'):
+                fields['aggregate_column'] = take()
+            elif aggregation != 'count':
+                raise QueryError(f"Укажите столбец для «{aggregation}».")
+        elif word == 'sort':
+            take(), take('by')
+            fields['sort_by'] = take()
+            if position < len(tokens) and words[position] in ('asc', 'desc'):
+                fields['descending'] = take().lower() == 'desc'
+        elif word == 'limit':
+            take()
+            limit = take()
+            if not limit.isdigit():
+                raise QueryError("После limit должно идти число.")
+            fields['limit'] = int(limit)
+        elif word == 'csv':
+            take()
+            fields['as_csv'] = True
+        else:
+            raise QueryError(f"Непонятное слово «{tokens[position]}».")
+    return Query(conditions=tuple(conditions), **fields)
+
+
+def _column(frame, name):
+    if name not in frame.columns:
+        raise QueryError(f"Столбца «{name}» нет. Есть: {', '.join(map(str, frame.columns))}.")
+    return frame[name]
+
+
+def _is_date_column(series) -> bool:
+    import pandas as pd
+
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return True
+    # Столбец date32 из pyarrow в pandas хранится как object со значениями datetime.date
+    if series.dtype == object:
+        sample = series.dropna().head(1)
+        return not sample.empty and isinstance(sample.iloc[0], datetime.date)
+    return False
+
+
+def _condition_mask(frame, column, op, value):
+    import pandas as pd
+
+    series = _column(frame, column)
+    if op == 'contains':
+        return series.astype('string').str.contains(value, case=False, regex=False).fillna(False).to_numpy()
+    literal = value
+    if pd.api.types.is_numeric_dtype(series):
+        try:
+            value = float(value)
+        except ValueError:
+            raise QueryError(f"Столбец «{column}» числовой, а «{literal}» — не число.")
+    elif _is_date_column(series):
+        try:
+            value = pd.to_datetime(value)
+        except (ValueError, TypeError):
+            raise QueryError(f"Столбец «{column}» содержит даты, а «{literal}» — не дата.")
+        series = pd.to_datetime(series, errors='coerce')
+    try:
+        return OPERATORS[op](series, value).fillna(False).to_numpy(dtype=bool)
+    except (TypeError, ValueError):
+        # Например, в столбце вперемешку числа и строки
+        raise QueryError(f"Столбец «{column}» нельзя сравнить со значением «{literal}».")
+
+
+class QueryEngine:
+    """Выполняет запросы над DataFrame одной сессии; кэширует результаты и порядки сортировки.
+
+    Кэш результатов ограничен QUERY_CACHE_SIZE записями и max_cache_bytes байтами;
+    nbytes — сколько сейчас занимают кэши (учитывается в бюджете памяти CSV-сессий).
+    """
+
+    def __init__(self, frame, max_cache_bytes=None):
+        self.frame = frame
+        self.max_cache_bytes = max_cache_bytes
+        self.results = OrderedDict()  # запрос -> (результат, его размер в байтах)
+        self.sort_indexes = {}  # (столбец, по убыванию) -> позиции строк в порядке сортировки
+        self.nbytes = 0
+
+    def sort_index(self, column, descending):
+        key = (column, descending)
+        if key not in self.sort_indexes:
+            series = _column(self.frame, column).reset_index(drop=True)
+            self.sort_indexes[key] = series.sort_values(ascending=not descending, kind='stable',
+                                                        na_position='last').index.to_numpy()
+            self.nbytes += self.sort_indexes[key].nbytes
+        return self.sort_indexes[key]
+
+    def _execute(self, query: Query):
+        import numpy as np
+
+        frame = self.frame
+        mask = np.ones(len(frame), dtype=bool)
+        for column, op, value in query.conditions:
+            mask &= _condition_mask(frame, column, op, value)
+
+        if query.group_by:
+            _column(frame, query.group_by)
+            grouped = frame[mask].groupby(query.group_by, sort=False)
+            if query.aggregation == 'count' and not query.aggregate_column:
+                result = grouped.size().reset_index(name='count')
+            else:
+                _column(frame, query.aggregate_column)
+                try:
+                    result = grouped[query.aggregate_column].agg(query.aggregation).reset_index()
+                except TypeError:
+                    raise QueryError(f"Нельзя посчитать {query.aggregation} по столбцу «{query.aggregate_column}».")
+            if query.sort_by:
+                _column(result, query.sort_by)
+                result = result.sort_values(query.sort_by, ascending=not query.descending, kind='stable')
+        elif query.sort_by:
+            # Готовый порядок сортировки переиспользуется разными фильтрами над тем же столбцом
+            order = self.sort_index(query.sort_by, query.descending)
+            result = frame.iloc[order[mask[order]]]
+        else:
+            result = frame[mask]
+
+        if query.limit is not None:
+            result = result.head(query.limit)
+        return result
+
+    def run(self, query: Query):
+        key = query._replace(as_csv=False)
+        if key in self.results:
+            self.results.move_to_end(key)
+            return self.results[key][0]
+        result = self._execute(query)
+        nbytes = int(result.memory_usage(deep=True).sum())
+        self.results[key] = (result, nbytes)
+        self.nbytes += nbytes
+        while self.results and (len(self.results) > QUERY_CACHE_SIZE or
+                                (self.max_cache_bytes is not None and self.nbytes > self.max_cache_bytes)):
+            self.nbytes -= self.results.popitem(last=False)[1][1]
+        return result
+
+
+def render_table(result, limit=DEFAULT_LIMIT, max_chars=4000) -> str:
+    """Результат запроса как HTML-блок <pre>, укороченный под лимит сообщения Telegram"""
+    shown = result.head(limit)
+    raw = shown.to_string(index=False)
+    while len(html.escape(raw)) > max_chars and len(shown) > 1:
+        shown = shown.head(len(shown) // 2)
+        raw = shown.to_string(index=False)
+    # Обрезаем исходный текст, а не экранированный, чтобы не разрезать сущность вроде &amp;
+    text = html.escape(raw)
+    while len(text) > max_chars:
+        raw = raw[:len(raw) - (len(text) - max_chars)]
+        text = html.escape(raw)
+    text = f"<pre>{text}</pre>"
+    if len(shown) < len(result):
+        text += f"\nПоказано {len(shown)} из {len(result)} строк. Добавьте в конец запроса «csv», чтобы получить всё."
+    return text
@@ -0,0 +1,267 @@
+import asyncio
+import os
+import re
+import time
+
+from services.csv_query import QueryEngine
+
+# CSV-сессии по чатам. Данные один раз потоково разбираются из CSV и сохраняются в Parquet,
+# в память DataFrame поднимается лениво и выгружается при простое или нехватке общего бюджета.
+# pandas и pyarrow импортируются при первом CSV, а не при запуске бота.
+
+SAMPLE_ROWS = 30  # Сколько первых и последних строк хранить для быстрых ответов
+
+__directory = None
+__idle_ttl = 600.0
+__file_ttl = 86400.0
+__memory_budget = 256 * 1024 * 1024
+__sessions = {}  # chat_id -> CsvSession
+
+
+class EmptyCsvError(Exception):
+    """В CSV-файле нет данных"""
+
+
+class CsvParseError(Exception):
+    """CSV-файл не удалось разобрать"""
+
+
+class CsvSummary:
+    """Сводка, собранная за один проход по файлу: число строк, статистика столбцов и образцы строк"""
+
+    def __init__(self, rows, columns, head, tail):
+        self.rows = rows
+        self.columns = columns  # имя столбца -> {'type', 'count', 'min', 'max', 'mean'}
+        self.head = head
+        self.tail = tail
+
+    def describe(self) -> str:
+        lines = [f"Строк: {self.rows}, столбцов: {len(self.columns)}"]
+        for name, column in list(self.columns.items())[:SAMPLE_ROWS]:
+            line = f"{name} ({column['type']}): заполнено {column['count']}"
+            if column.get('mean') is not None:
+                line += f", мин {column['min']}, макс {column['max']}, среднее {column['mean']:.4g}"
+            lines.append(line)
+        if len(self.columns) > SAMPLE_ROWS:
+            lines.append("…")
+        return "\n".join(lines)
+
+
+class _ColumnStats:
+    def __init__(self, data_type):
+        import pyarrow as pa
+
+        self.type = data_type
+        self.numeric = pa.types.is_integer(data_type) or pa.types.is_floating(data_type)
+        self.count = 0
+        self.min = self.max = None
+        self.sum = 0
+
+    def update(self, column):
+        import pyarrow.compute as pc
+
+        self.count += len(column) - column.null_count
+        if not self.numeric or len(column) == column.null_count:
+            return
+        min_max = pc.min_max(column).as_py()
+        self.min = min_max['min'] if self.min is None else min(self.min, min_max['min'])
+        self.max = min_max['max'] if self.max is None else max(self.max, min_max['max'])
+        self.sum += pc.sum(column).as_py()
+
+    def as_dict(self):
+        mean = self.sum / self.count if self.numeric and self.count else None
+        return {'type': str(self.type), 'count': self.count, 'min': self.min, 'max': self.max, 'mean': mean}
+
+
+class CsvSession:
+    def __init__(self, chat_id, path, summary=None):
+        self.chat_id = chat_id
+        self.path = path
+        self.summary = summary
+        self.frame = None
+        self.engine = None
+        self.frame_nbytes = 0
+        self.last_used = time.monotonic()
+
+    @property
+    def nbytes(self):
+        """Память данных сессии вместе с кэшами результатов запросов"""
+        return self.frame_nbytes + (self.engine.nbytes if self.engine else 0)
+
+    def _attach(self, frame):
+        self.frame = frame
+        self.frame_nbytes = int(frame.memory_usage(deep=True).sum())
+        # Кэш результатов занимает не больше, чем сами данные
+        self.engine = QueryEngine(frame, max_cache_bytes=self.frame_nbytes)
+
+    def load(self):
+        if self.frame is None:
+            import pandas as pd
+
+            self._attach(pd.read_parquet(self.path))
+        return self.frame
+
+    def unload(self):
+        self.frame = None
+        self.engine = None
+        self.frame_nbytes = 0
+
+    def close(self):
+        self.unload()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def global_init(directory, idle_ttl, file_ttl, memory_budget):
+    global __directory, __idle_ttl, __file_ttl, __memory_budget
+
+    if __directory:
+        return
+
+    os.makedirs(directory, exist_ok=True)
+    # Сессии живут только в памяти процесса, поэтому файлы прошлого запуска уже никому не принадлежат
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.endswith(('.parquet', '.part')):
+            os.remove(entry.path)
+    __directory, __idle_ttl, __file_ttl, __memory_budget = directory, idle_ttl, file_ttl, memory_budget
+
+
+def _stream_to_parquet(csv_path, parquet_path, convert_options=None) -> CsvSummary:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+
+    reader = pa_csv.open_csv(csv_path, convert_options=convert_options)
+    schema = reader.schema
+    columns = {name: _ColumnStats(schema.field(name).type) for name in schema.names}
+    rows = 0
+    head, tail = [], pa.Table.from_batches([], schema=schema)
+    with pq.ParquetWriter(parquet_path, schema) as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+            rows += batch.num_rows
+            for name, column in zip(schema.names, batch.columns):
+                columns[name].update(column)
+            if sum(part.num_rows for part in head) < SAMPLE_ROWS:
+                head.append(batch.slice(0, SAMPLE_ROWS))
+            # Кольцевой буфер хвоста: держим не больше SAMPLE_ROWS последних строк
+            last_rows = batch.slice(max(0, batch.num_rows - SAMPLE_ROWS))
+            tail = pa.concat_tables([tail, pa.Table.from_batches([last_rows])])
+            tail = tail.slice(max(0, tail.num_rows - SAMPLE_ROWS))
+    head = pa.Table.from_batches(head, schema=schema).slice(0, SAMPLE_ROWS)
+    return CsvSummary(rows, {name: column.as_dict() for name, column in columns.items()},
+                      head.to_pandas(), tail.to_pandas())
+
+
+def _ingest(chat_id, csv_path) -> CsvSession:
+    """Потоково переносит CSV в Parquet: в памяти одновременно только один блок файла и образцы строк"""
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    path = os.path.join(__directory, f'{chat_id}.parquet')
+    # Пишем во временный файл, чтобы ошибка разбора не испортила текущую сессию чата
+    work_path = path + '.part'
+    column_types = {}
+    try:
+        while True:
+            try:
+                summary = _stream_to_parquet(csv_path, work_path, pa_csv.ConvertOptions(column_types=column_types))
+                break
+            except pa.ArrowInvalid as e:
+                # Типы определяются по первому блоку; если дальше столбец не подошёл — читаем его как строки
+                match = re.search(r'In CSV column #(\d+)', str(e))
+                if not match:
+                    raise
+                name = pa_csv.open_csv(csv_path).schema.names[int(match.group(1))]
+                if name in column_types:
+                    raise
+                column_types[name] = pa.string()
+    except pa.ArrowInvalid as e:
+        if os.path.exists(work_path):
+            os.remove(work_path)
+        if 'Empty CSV' in str(e):
+            raise EmptyCsvError(str(e))
+        raise CsvParseError(str(e))
+    os.replace(work_path, path)
+    return CsvSession(chat_id, path, summary)
+
+
+async def ingest(chat_id, csv_path) -> CsvSession:
+    """Разбирает CSV-файл и делает его текущей сессией чата (предыдущая удаляется)"""
+    session = await asyncio.to_thread(_ingest, chat_id, csv_path)
+    # Файл прежней сессии уже заменён новым, достаточно забыть её данные
+    old_session = __sessions.pop(chat_id, None)
+    if old_session:
+        old_session.unload()
+    __sessions[chat_id] = session
+    _evict(keep=session)
+    return session
+
+
+def summary(chat_id):
+    """Сводка сессии чата без загрузки данных в память"""
+    session = __sessions.get(chat_id)
+    if session is None:
+        return None
+    session.last_used = time.monotonic()
+    return session.summary
+
+
+async def get(chat_id):
+    """Сессия чата с загруженными данными (при необходимости читаются с диска) или None, если сессии нет"""
+    _evict()
+    session = __sessions.get(chat_id)
+    if session is None:
+        return None
+    session.last_used = time.monotonic()
+    if session.frame is None:
+        await asyncio.to_thread(session.load)
+        _evict(keep=session)
+    return session
+
+
+async def run_query(session, query):
+    """Выполняет запрос к сессии в потоке; выросший кэш результатов учитывается в общем бюджете памяти"""
+    result = await asyncio.to_thread(session.engine.run, query)
+    _evict(keep=session)
+    return result
+
+
+def _evict(keep=None):
+    now = time.monotonic()
+    for chat_id, session in list(__sessions.items()):
+        if session is keep:
+            continue
+        idle = now - session.last_used
+        if idle > __file_ttl:
+            __sessions.pop(chat_id).close()
+        elif idle > __idle_ttl:
+            session.unload()
+
+    # Общий бюджет памяти: выгружаем давно не использованные сессии
+    loaded = sorted((session for session in __sessions.values() if session.frame is not None),
+                    key=lambda session: session.last_used)
+    total = sum(session.nbytes for session in loaded)
+    for session in loaded:
+        if total <= __memory_budget:
+            break
+        if session is keep:
+            continue
+        total -= session.nbytes
+        session.unload()
+
+
+def drop(chat_id):
+    session = __sessions.pop(chat_id, None)
+    if session:
+        session.close()
+
+
+def stats():
+    loaded = [session for session in __sessions.values() if session.frame is not None]
+    return {
+        'sessions': len(__sessions),
+        'loaded': len(loaded),
+        'memory_bytes': sum(session.nbytes for session in loaded),
+        'memory_budget': __memory_budget,
+    }
@@ -0,0 +1,45 @@
+from collections import OrderedDict
+
+# Раскодированные фотографии (PIL.Image) по file_unique_id, вытесняются по LRU.
+# Кэш свой в каждом процессе пула: предпросмотр фильтров раскодирует фотографию, и если окончательный
+# рендер попадёт в тот же процесс, файл не разбирается заново. Пиксели между процессами не передаются.
+
+__entries = OrderedDict()  # file_unique_id -> (изображение, размер пикселей в байтах)
+__max_bytes = 0
+__total_bytes = 0
+__stats = {'hits': 0, 'misses': 0, 'evicted': 0}
+
+
+def global_init(max_bytes):
+    global __max_bytes
+    __max_bytes = max_bytes
+
+
+def get(file_unique_id):
+    entry = __entries.get(file_unique_id)
+    if entry is None:
+        __stats['misses'] += 1
+        return None
+    __entries.move_to_end(file_unique_id)
+    __stats['hits'] += 1
+    return entry[0]
+
+
+def put(file_unique_id, img):
+    global __total_bytes
+    nbytes = img.width * img.height * len(img.getbands())
+    if not file_unique_id or nbytes > __max_bytes:
+        return
+    old = __entries.pop(file_unique_id, None)
+    if old is not None:
+        __total_bytes -= old[1]
+    __entries[file_unique_id] = (img, nbytes)
+    __total_bytes += nbytes
+    while __total_bytes > __max_bytes:
+        _, (_, evicted_bytes) = __entries.popitem(last=False)
+        __total_bytes -= evicted_bytes
+        __stats['evicted'] += 1
+
+
+def stats():
+    return {'entries': len(__entries), 'bytes': __total_bytes, 'max_bytes': __max_bytes, **__stats}
@@ -0,0 +1,158 @@
+import asyncio
+import io
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Общий путь скачивания файлов пользователей: размер проверяется до запроса к Telegram,
+# одновременных скачиваний не больше заданного — всего и на одного пользователя,
+# а один и тот же файл (file_unique_id), который уже скачивается, второй раз не запрашивается.
+
+__global_limit = None
+__per_user_limit = 2
+__user_slots = {}  # Telegram id -> [семафор, сколько скачиваний пользователя ждут или идут]
+__pending = {}  # file_unique_id -> задача скачивания в память
+__stats = {}
+
+
+class FileTooLargeError(Exception):
+    """Файл больше допустимого размера — скачивать его не нужно"""
+
+    def __init__(self, size, limit):
+        super().__init__(f"Слишком большой файл ({round(size / (1024 * 1024))} MB)! "
+                         f"Максимальный размер файла: {round(limit / (1024 * 1024))} MB.")
+        self.size = size
+        self.limit = limit
+
+
+class DownloadStats:
+    def __init__(self):
+        self.count = 0
+        self.bytes = 0
+        self.rejected = 0
+        self.deduplicated = 0
+        self.errors = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def record(self, size, latency):
+        self.count += 1
+        self.bytes += size
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'bytes': self.bytes,
+            'rejected': self.rejected,
+            'deduplicated': self.deduplicated,
+            'errors': self.errors,
+            'latency_avg': self.latency_total / (self.count or 1),
+            'latency_max': self.latency_max,
+        }
+
+
+class BoundedBuffer(io.BytesIO):
+    """Буфер в памяти, который не даёт записать больше limit байт (если Telegram не сообщил размер)"""
+
+    def __init__(self, limit):
+        super().__init__()
+        self.limit = limit
+
+    def write(self, data):
+        if self.tell() + len(data) > self.limit:
+            raise FileTooLargeError(self.tell() + len(data), self.limit)
+        return super().write(data)
+
+
+def global_init(max_concurrent, max_per_user):
+    global __global_limit, __per_user_limit
+
+    if __global_limit:
+        return
+
+    __global_limit, __per_user_limit = asyncio.Semaphore(max_concurrent), max_per_user
+
+
+def _check_size(size, max_bytes, kind_stats):
+    if size and size > max_bytes:
+        kind_stats.rejected += 1
+        raise FileTooLargeError(size, max_bytes)
+
+
+async def _download(bot, source, user_id, kind_stats, max_bytes, save):
+    entry = __user_slots.setdefault(user_id, [asyncio.Semaphore(__per_user_limit), 0])
+    entry[1] += 1
+    try:
+        async with entry[0], __global_limit:
+            started = time.perf_counter()
+            try:
+                file = await bot.get_file(source.file_id)
+                # В сообщении размер бывает не указан, тогда его сообщает getFile
+                _check_size(file.file_size, max_bytes, kind_stats)
+                result, size = await save(file)
+            except FileTooLargeError:
+                raise
+            except Exception:
+                kind_stats.errors += 1
+                raise
+            latency = time.perf_counter() - started
+            kind_stats.record(size, latency)
+            logger.info("Скачан файл %s: %d байт за %.3f с", source.file_unique_id, size, latency)
+            return result
+    finally:
+        entry[1] -= 1
+        if not entry[1]:
+            del __user_slots[user_id]
+
+
+async def fetch(bot, source, user_id, kind, max_bytes) -> bytearray:
+    """Скачивает файл (Document, PhotoSize) в память, не больше max_bytes.
+
+    Если этот же файл уже скачивается, ждёт ту загрузку вместо новой. Бросает FileTooLargeError.
+    """
+    kind_stats = __stats.setdefault(kind, DownloadStats())
+    _check_size(source.file_size, max_bytes, kind_stats)
+
+    task = __pending.get(source.file_unique_id)
+    if task is not None:
+        kind_stats.deduplicated += 1
+        return await asyncio.shield(task)
+
+    async def save(file):
+        buffer = BoundedBuffer(max_bytes)
+        try:
+            await file.download_to_memory(buffer)
+        except FileTooLargeError:
+            kind_stats.rejected += 1
+            raise
+        return bytearray(buffer.getbuffer()), buffer.tell()
+
+    task = asyncio.ensure_future(_download(bot, source, user_id, kind_stats, max_bytes, save))
+    __pending[source.file_unique_id] = task
+    task.add_done_callback(lambda _: __pending.pop(source.file_unique_id, None))
+    # Отмена одного обработчика не должна прерывать загрузку для остальных ожидающих
+    return await asyncio.shield(task)
+
+
+async def fetch_to_drive(bot, source, path, user_id, kind, max_bytes) -> str:
+    """Скачивает файл сразу на диск по пути path, не больше max_bytes. Бросает FileTooLargeError"""
+    kind_stats = __stats.setdefault(kind, DownloadStats())
+    _check_size(source.file_size, max_bytes, kind_stats)
+
+    async def save(file):
+        await file.download_to_drive(path)
+        return path, os.path.getsize(path)
+
+    return await _download(bot, source, user_id, kind_stats, max_bytes, save)
+
+
+def stats():
+    return {
+        'active_users': len(__user_slots),
+        'pending': len(__pending),
+        'kinds': {kind: kind_stats.as_dict() for kind, kind_stats in __stats.items()},
+    }
@@ -0,0 +1,161 @@
+import io
+from typing import Callable, NamedTuple
+
+from services import decoded_images
+
+# Pillow импортируется внутри функций: они выполняются в процессах пула, а боту при запуске он не нужен
+
+# Матрица сепии для Image.convert: коэффициенты для R, G, B и смещение каждого канала
+SEPIA_MATRIX = (
+    0.393, 0.769, 0.189, 0,
+    0.349, 0.686, 0.168, 0,
+    0.272, 0.534, 0.131, 0,
+)
+
+
+class FilterSpec(NamedTuple):
+    apply: Callable  # PIL.Image -> PIL.Image
+    request: str  # Имя запроса для таблицы logging
+
+
+FILTERS: dict[str, FilterSpec] = {}
+
+
+def register_filter(name: str, request: str):
+    """Регистрирует фильтр под именем кнопки клавиатуры"""
+    def decorator(func):
+        FILTERS[name] = FilterSpec(func, request)
+        return func
+
+    return decorator
+
+
+def _to_rgb(img):
+    return img if img.mode == 'RGB' else img.convert('RGB')
+
+
+def _channel_lut(r_factor: float, g_factor: float, b_factor: float) -> list[int]:
+    """Таблица для Image.point: по 256 значений на каждый канал RGB"""
+    lut = []
+    for factor in (r_factor, g_factor, b_factor):
+        lut.extend(min(255, int(i * factor)) for i in range(256))
+    return lut
+
+
+WARM_LUT = _channel_lut(1.2, 1.1, 1.0)
+COLD_LUT = _channel_lut(1.0, 1.1, 1.2)
+
+
+@register_filter('Чёрно-белый', 'filter_bw_apply')
+def apply_black_white(img):
+    """Переводит изображение в оттенки серого"""
+    return img.convert('L')
+
+
+@register_filter('Винтаж', 'filter_vintage_apply')
+def apply_vintage_effect(img):
+    """Применяет винтажный эффект (приглушённые цвета + сепия) ко всему изображению сразу"""
+    from PIL import ImageEnhance
+
+    img = ImageEnhance.Color(_to_rgb(img)).enhance(0.5)
+    return img.convert('RGB', SEPIA_MATRIX)
+
+
+@register_filter('Негатив', 'filter_negative_apply')
+def apply_negative(img):
+    """Инвертирует цвета изображения"""
+    from PIL import ImageOps
+
+    return ImageOps.invert(_to_rgb(img))
+
+
+@register_filter('Размытие', 'filter_blur_apply')
+def apply_blur(img):
+    """Размывает изображение"""
+    from PIL import ImageFilter
+
+    return img.filter(ImageFilter.BLUR)
+
+
+@register_filter('Карандашный набросок', 'filter_sketch_apply')
+def apply_pencil_sketch(img):
+    """Преобразует изображение в карандашный набросок"""
+    from PIL import ImageFilter, ImageOps
+
+    gray_img = img.convert('L')
+    inverted_img = ImageOps.invert(gray_img)
+    blurred_img = inverted_img.filter(ImageFilter.GaussianBlur(radius=3))
+    return ImageOps.invert(blurred_img)
+
+
+@register_filter('Тёплый свет', 'filter_warm_apply')
+def apply_warm_light(img):
+    """Добавляет теплый свет (желтоватый оттенок)"""
+    return _to_rgb(img).point(WARM_LUT)
+
+
+@register_filter('Холодный свет', 'filter_cold_apply')
+def apply_cold_light(img):
+    """Добавляет холодный свет (голубоватый оттенок)"""
+    return _to_rgb(img).point(COLD_LUT)
+
+
+def save_format(file_format: str) -> str:
+    """Имя формата Pillow по расширению файла"""
+    file_format = file_format.lower()
+    return 'JPEG' if file_format in ('jpg', 'jpeg') else file_format.upper()
+
+
+def _open(photo_bytes: bytes, cache_key: str = None):
+    """Раскодирует файл; с cache_key берёт готовые пиксели из кэша этого процесса пула и пополняет его"""
+    from PIL import Image
+
+    img = decoded_images.get(cache_key) if cache_key else None
+    if img is None:
+        img = Image.open(io.BytesIO(photo_bytes))
+        img.load()
+        if cache_key:
+            decoded_images.put(cache_key, img)
+    return img
+
+
+def render_filter(photo_bytes: bytes, name: str, file_format: str, cache_key: str = None) -> bytes:
+    """Применяет фильтр name к изображению и возвращает результат в исходном формате"""
+    spec = FILTERS[name]
+    processed_img = spec.apply(_open(photo_bytes, cache_key))
+    pil_format = save_format(file_format)
+    if pil_format == 'JPEG' and processed_img.mode not in ('RGB', 'L'):
+        processed_img = processed_img.convert('RGB')
+    output = io.BytesIO()
+    processed_img.save(output, format=pil_format)
+    return output.getvalue()
+
+
+def render_previews(photo_bytes: bytes, cache_key: str = None, max_side: int = 512) -> list[tuple[str, bytes]]:
+    """Применяет все фильтры к уменьшенной копии изображения и возвращает JPEG-миниатюры [(имя фильтра, байты)].
+
+    Раскодированный оригинал остаётся в кэше процесса под cache_key: если окончательный рендер
+    выбранного фильтра попадёт в тот же процесс, файл не придётся разбирать заново.
+    """
+    thumbnail = _open(photo_bytes, cache_key).copy()
+    thumbnail.thumbnail((max_side, max_side))
+    previews = []
+    for name, spec in FILTERS.items():
+        output = io.BytesIO()
+        processed_img = spec.apply(thumbnail)
+        if processed_img.mode not in ('RGB', 'L'):
+            processed_img = processed_img.convert('RGB')
+        processed_img.save(output, format='JPEG', quality=85)
+        previews.append((name, output.getvalue()))
+    return previews
+
+
+def verify_image(photo_bytes: bytes) -> bool:
+    """Проверяет, что байты — корректное изображение"""
+    from PIL import Image
+
+    try:
+        Image.open(io.BytesIO(photo_bytes)).verify()
+    except Exception:
+        return False
+    return True
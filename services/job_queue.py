@@ -0,0 +1,364 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import NamedTuple
+
+from sqlalchemy import delete, func, insert, select, text, update
+
+from data import db_session
+from data.jobs import QueuedJob
+
+# Очередь тяжёлых задач: бот только ставит задачи, а процессы worker.py забирают их, выполняют
+# и сами отправляют результат. Задача, которую worker не завершил за visibility_timeout
+# (процесс упал или завис), снова становится доступной; после max_attempts попыток — failed.
+
+__queue = None
+__spool_dir = None
+
+
+class Job(NamedTuple):
+    id: int
+    kind: str
+    user_id: int
+    payload: dict
+    attempts: int
+    max_attempts: int
+
+
+def retry_delay(attempts: int) -> float:
+    """Экспоненциальная пауза перед повтором: 5, 10, 20... секунд, не больше 5 минут"""
+    return min(300.0, 5.0 * 2 ** (attempts - 1))
+
+
+# Честная очередь: сначала пользователь, которого обслуживали давнее всех, и не больше
+# :per_user задач одного пользователя одновременно. Так 50 задач одного не задерживают остальных.
+CLAIM_SQL = text("""
+UPDATE jobs SET status = 'running', attempts = attempts + 1, worker = :worker,
+                claimed_at = :now, locked_until = :deadline
+WHERE id = (
+    SELECT j.id FROM jobs AS j
+    WHERE ((j.status = 'queued' AND j.available_at <= :now)
+           OR (j.status = 'running' AND j.locked_until < :now))
+      AND j.attempts < j.max_attempts
+      AND (SELECT count(*) FROM jobs AS r
+           WHERE r.user_id = j.user_id AND r.status = 'running' AND r.locked_until >= :now) < :per_user
+    ORDER BY (SELECT coalesce(max(c.claimed_at), 0) FROM jobs AS c WHERE c.user_id = j.user_id), j.id
+    LIMIT 1
+)
+RETURNING id, kind, user_id, payload, attempts, max_attempts
+""")
+
+
+class SqliteJobQueue:
+    """Очередь в таблице jobs общей БД SQLite — для нескольких процессов на одной машине"""
+
+    def __init__(self, max_attempts=3, max_running_per_user=1):
+        self.max_attempts = max_attempts
+        self.max_running_per_user = max_running_per_user
+
+    def enqueue(self, kind, user_id, payload) -> int:
+        with db_session.session_scope() as db_sess:
+            return db_sess.execute(insert(QueuedJob).values(
+                kind=kind, user_id=user_id, payload=json.dumps(payload, ensure_ascii=False),
+                max_attempts=self.max_attempts, available_at=time.time(),
+            ).returning(QueuedJob.id)).scalar_one()
+
+    def claim(self, worker, visibility_timeout):
+        now = time.time()
+        with db_session.session_scope() as db_sess:
+            # Задачи, исчерпавшие попытки из-за упавших worker, больше не выдаём
+            db_sess.execute(update(QueuedJob).where(
+                QueuedJob.status == 'running', QueuedJob.locked_until < now,
+                QueuedJob.attempts >= QueuedJob.max_attempts,
+            ).values(status='failed', error='Истекло время выполнения'))
+            row = db_sess.execute(CLAIM_SQL, {'worker': worker, 'now': now, 'deadline': now + visibility_timeout,
+                                              'per_user': self.max_running_per_user}).mappings().first()
+        if row is None:
+            return None
+        return Job(row['id'], row['kind'], row['user_id'], json.loads(row['payload']), row['attempts'],
+                   row['max_attempts'])
+
+    def _update_owned(self, job_id, worker, **values):
+        with db_session.session_scope() as db_sess:
+            # Если задачу уже забрал другой worker (истёк срок), прежний владелец её не трогает
+            result = db_sess.execute(update(QueuedJob).where(
+                QueuedJob.id == job_id, QueuedJob.worker == worker, QueuedJob.status == 'running',
+            ).values(**values))
+            return result.rowcount > 0
+
+    def extend(self, job_id, worker, visibility_timeout):
+        return self._update_owned(job_id, worker, locked_until=time.time() + visibility_timeout)
+
+    def save_payload(self, job_id, worker, payload) -> bool:
+        """Сохраняет ход выполнения в параметрах задачи, чтобы повтор продолжил с того же места"""
+        return self._update_owned(job_id, worker, payload=json.dumps(payload, ensure_ascii=False))
+
+    def complete(self, job_id, worker) -> bool:
+        """Отмечает выполнение; False — задача уже принадлежит другому worker"""
+        return self._update_owned(job_id, worker, status='done', locked_until=None)
+
+    def fail(self, job_id, worker, attempts, max_attempts, error):
+        """Отмечает неудачу; возвращает новый статус ('queued' — будет повтор, 'failed')
+        или None, если задача уже принадлежит другому worker"""
+        if attempts < max_attempts:
+            status, values = 'queued', {'available_at': time.time() + retry_delay(attempts)}
+        else:
+            status, values = 'failed', {}
+        if self._update_owned(job_id, worker, status=status, error=error, locked_until=None, **values):
+            return status
+        return None
+
+    def purge(self, older_than):
+        """Удаляет завершённые задачи старше older_than секунд"""
+        with db_session.session_scope() as db_sess:
+            db_sess.execute(delete(QueuedJob).where(QueuedJob.status.in_(('done', 'failed')),
+                                                    QueuedJob.claimed_at < time.time() - older_than))
+
+    def stats(self):
+        with db_session.session_scope() as db_sess:
+            rows = db_sess.execute(select(QueuedJob.status, func.count()).group_by(QueuedJob.status)).all()
+        return dict(rows)
+
+
+# Скрипты Lua для Redis: каждый выполняется атомарно, поэтому конкурирующие worker не могут
+# забрать одну задачу дважды или превысить число задач пользователя. ARGV[1] — префикс ключей.
+REDIS_PRELUDE = """
+local function key(...)
+    return ARGV[1] .. ':' .. table.concat({...}, ':')
+end
+local function push(job_id, user_id)
+    -- Пользователь попадает в круг обхода, когда у него появляется первая задача
+    if redis.call('RPUSH', key('user', user_id), job_id) == 1 then
+        redis.call('RPUSH', key('users'), user_id)
+    end
+end
+local function release(job_id, job_key)
+    redis.call('ZREM', key('running'), job_id)
+    redis.call('HINCRBY', key('active'), redis.call('HGET', job_key, 'user_id'), -1)
+end
+local function owned(job_key)
+    return redis.call('HGET', job_key, 'status') == 'running' and redis.call('HGET', job_key, 'worker') == ARGV[3]
+end
+"""
+
+# ARGV: префикс, kind, user_id, payload, max_attempts
+REDIS_ENQUEUE = """
+local job_id = redis.call('INCR', key('next_id'))
+redis.call('HSET', key('job', job_id), 'kind', ARGV[2], 'user_id', ARGV[3], 'payload', ARGV[4],
+           'attempts', 0, 'max_attempts', ARGV[5], 'status', 'queued')
+push(job_id, ARGV[3])
+return job_id
+"""
+
+# ARGV: префикс, worker, now, deadline, per_user, failed_ttl
+REDIS_CLAIM = """
+for _, job_id in ipairs(redis.call('ZRANGEBYSCORE', key('delayed'), '-inf', ARGV[3])) do
+    redis.call('ZREM', key('delayed'), job_id)
+    push(job_id, redis.call('HGET', key('job', job_id), 'user_id'))
+end
+-- Задачи упавших или зависших worker возвращаются в очередь, а исчерпавшие попытки — failed
+for _, job_id in ipairs(redis.call('ZRANGEBYSCORE', key('running'), '-inf', '(' .. ARGV[3])) do
+    local job_key = key('job', job_id)
+    release(job_id, job_key)
+    if tonumber(redis.call('HGET', job_key, 'attempts')) >= tonumber(redis.call('HGET', job_key, 'max_attempts')) then
+        redis.call('HSET', job_key, 'status', 'failed', 'worker', '', 'error', 'Истекло время выполнения')
+        redis.call('EXPIRE', job_key, ARGV[6])
+    else
+        redis.call('HSET', job_key, 'status', 'queued', 'worker', '')
+        push(job_id, redis.call('HGET', job_key, 'user_id'))
+    end
+end
+for _ = 1, redis.call('LLEN', key('users')) do
+    local user_id = redis.call('LPOP', key('users'))
+    if tonumber(redis.call('HGET', key('active'), user_id) or 0) < tonumber(ARGV[5]) then
+        local job_id = redis.call('LPOP', key('user', user_id))
+        if redis.call('LLEN', key('user', user_id)) > 0 then
+            redis.call('RPUSH', key('users'), user_id)
+        end
+        local job_key = key('job', job_id)
+        local attempts = redis.call('HINCRBY', job_key, 'attempts', 1)
+        redis.call('HSET', job_key, 'status', 'running', 'worker', ARGV[2], 'claimed_at', ARGV[3])
+        redis.call('ZADD', key('running'), ARGV[4], job_id)
+        redis.call('HINCRBY', key('active'), user_id, 1)
+        local job = redis.call('HMGET', job_key, 'kind', 'user_id', 'payload', 'max_attempts')
+        return {job_id, job[1], job[2], job[3], attempts, job[4]}
+    end
+    -- У пользователя уже выполняется максимум задач: он остаётся в круге обхода
+    redis.call('RPUSH', key('users'), user_id)
+end
+return false
+"""
+
+# ARGV: префикс, job_id, worker, deadline
+REDIS_EXTEND = """
+if not owned(key('job', ARGV[2])) then
+    return 0
+end
+redis.call('ZADD', key('running'), ARGV[4], ARGV[2])
+return 1
+"""
+
+# ARGV: префикс, job_id, worker, payload
+REDIS_SAVE_PAYLOAD = """
+local job_key = key('job', ARGV[2])
+if not owned(job_key) then
+    return 0
+end
+redis.call('HSET', job_key, 'payload', ARGV[4])
+return 1
+"""
+
+# ARGV: префикс, job_id, worker
+REDIS_COMPLETE = """
+local job_key = key('job', ARGV[2])
+if not owned(job_key) then
+    return 0
+end
+release(ARGV[2], job_key)
+redis.call('DEL', job_key)
+return 1
+"""
+
+# ARGV: префикс, job_id, worker, error, момент повтора ('' — попытки исчерпаны), failed_ttl
+REDIS_FAIL = """
+local job_key = key('job', ARGV[2])
+if not owned(job_key) then
+    return false
+end
+release(ARGV[2], job_key)
+if ARGV[5] ~= '' then
+    redis.call('HSET', job_key, 'status', 'queued', 'worker', '', 'error', ARGV[4])
+    redis.call('ZADD', key('delayed'), ARGV[5], ARGV[2])
+    return 'queued'
+end
+redis.call('HSET', job_key, 'status', 'failed', 'worker', '', 'error', ARGV[4])
+redis.call('EXPIRE', job_key, ARGV[6])
+return 'failed'
+"""
+
+
+class RedisJobQueue:
+    """Та же очередь поверх Redis, для worker на нескольких машинах.
+
+    Клиент передаётся снаружи: redis.Redis(..., decode_responses=True) или заглушка с поддержкой скриптов
+    Lua (например, fakeredis). У каждого пользователя свой список задач, а пользователи обходятся по кругу.
+    """
+
+    FAILED_TTL = 86400  # Сколько секунд хранится проваленная задача
+
+    def __init__(self, client, max_attempts=3, max_running_per_user=1, prefix='jobs'):
+        self.client = client
+        self.max_attempts = max_attempts
+        self.max_running_per_user = max_running_per_user
+        self.prefix = prefix
+        self._enqueue, self._claim, self._extend, self._save_payload, self._complete, self._fail = (
+            client.register_script(REDIS_PRELUDE + script)
+            for script in (REDIS_ENQUEUE, REDIS_CLAIM, REDIS_EXTEND, REDIS_SAVE_PAYLOAD, REDIS_COMPLETE, REDIS_FAIL))
+
+    def _key(self, *parts):
+        return ':'.join((self.prefix, *map(str, parts)))
+
+    def enqueue(self, kind, user_id, payload) -> int:
+        return self._enqueue(args=[self.prefix, kind, user_id, json.dumps(payload, ensure_ascii=False),
+                                   self.max_attempts])
+
+    def claim(self, worker, visibility_timeout):
+        now = time.time()
+        row = self._claim(args=[self.prefix, worker, now, now + visibility_timeout, self.max_running_per_user,
+                                self.FAILED_TTL])
+        if row is None:
+            return None
+        job_id, kind, user_id, payload, attempts, max_attempts = row
+        return Job(int(job_id), kind, int(user_id), json.loads(payload), attempts, int(max_attempts))
+
+    def extend(self, job_id, worker, visibility_timeout):
+        return bool(self._extend(args=[self.prefix, job_id, worker, time.time() + visibility_timeout]))
+
+    def save_payload(self, job_id, worker, payload) -> bool:
+        return bool(self._save_payload(args=[self.prefix, job_id, worker, json.dumps(payload, ensure_ascii=False)]))
+
+    def complete(self, job_id, worker) -> bool:
+        return bool(self._complete(args=[self.prefix, job_id, worker]))
+
+    def fail(self, job_id, worker, attempts, max_attempts, error):
+        retry_at = time.time() + retry_delay(attempts) if attempts < max_attempts else ''
+        return self._fail(args=[self.prefix, job_id, worker, error, retry_at, self.FAILED_TTL])
+
+    def purge(self, older_than):
+        # Выполненные задачи удаляются сразу, проваленные — по истечении срока ключа
+        pass
+
+    def stats(self):
+        return {
+            'users': self.client.llen(self._key('users')),
+            'running': self.client.zcard(self._key('running')),
+            'delayed': self.client.zcard(self._key('delayed')),
+        }
+
+
+def create_queue(backend, max_attempts=3, max_running_per_user=1, redis_url=None):
+    if backend == 'sqlite':
+        return SqliteJobQueue(max_attempts, max_running_per_user)
+    if backend == 'redis':
+        import redis  # Необязательная зависимость, нужна только для этой очереди
+
+        return RedisJobQueue(redis.Redis.from_url(redis_url, decode_responses=True), max_attempts,
+                             max_running_per_user)
+    raise Exception(f"Неизвестный тип очереди задач: {backend}")
+
+
+def global_init(queue, spool_dir):
+    global __queue, __spool_dir
+
+    if __queue:
+        return
+
+    os.makedirs(spool_dir, exist_ok=True)
+    __queue, __spool_dir = queue, spool_dir
+
+
+def enabled() -> bool:
+    """Включена ли передача тяжёлых задач в worker.py"""
+    return __queue is not None
+
+
+def save_input(data: bytes, suffix='') -> str:
+    """Сохраняет входные данные задачи в общий каталог, откуда их прочитает worker"""
+    fd, path = tempfile.mkstemp(prefix='job_', suffix=suffix, dir=__spool_dir)
+    with os.fdopen(fd, 'wb') as file:
+        file.write(data)
+    return path
+
+
+async def enqueue(kind, user_id, payload) -> int:
+    return await asyncio.to_thread(__queue.enqueue, kind, user_id, payload)
+
+
+async def claim(worker, visibility_timeout):
+    return await asyncio.to_thread(__queue.claim, worker, visibility_timeout)
+
+
+async def extend(job: Job, worker, visibility_timeout):
+    return await asyncio.to_thread(__queue.extend, job.id, worker, visibility_timeout)
+
+
+async def save_payload(job: Job, worker) -> bool:
+    return await asyncio.to_thread(__queue.save_payload, job.id, worker, job.payload)
+
+
+async def complete(job: Job, worker) -> bool:
+    return await asyncio.to_thread(__queue.complete, job.id, worker)
+
+
+async def fail(job: Job, worker, error):
+    return await asyncio.to_thread(__queue.fail, job.id, worker, job.attempts, job.max_attempts, error)
+
+
+async def purge(older_than):
+    await asyncio.to_thread(__queue.purge, older_than)
+
+
+def stats():
+    return __queue.stats() if __queue else {}
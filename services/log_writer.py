@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from data import db_session
+from data.logging import Logging
+from services import usage_stats
+
+logger = logging.getLogger(__name__)
+
+__pending = []
+__batch_size = 100
+__flush_interval = 5.0
+__max_pending = 10000
+__task = None
+__wake = None
+__lock = None
+__stats = {
+    'enqueued': 0,
+    'dropped': 0,
+    'flushed_rows': 0,
+    'flushes': 0,
+    'failed_flushes': 0,
+    'last_flush_latency': 0.0,
+    'total_flush_latency': 0.0,
+}
+
+
+def enqueue(applying_user, request):
+    """Ставит запись журнала в очередь; запись в БД произойдёт пачкой"""
+    if len(__pending) >= __max_pending:
+        # Защита от бесконечного роста, если БД недоступна
+        __pending.pop(0)
+        __stats['dropped'] += 1
+    __pending.append({
+        'applying_user': applying_user,
+        'request': request,
+        'request_date': datetime.now(),
+    })
+    __stats['enqueued'] += 1
+    if len(__pending) >= __batch_size and __wake:
+        __wake.set()
+
+
+def _write_rows(db_sess, rows):
+    db_sess.execute(insert(Logging), rows)
+    # Почасовые сводки для /stats обновляются в той же транзакции
+    usage_stats.rollup(db_sess, rows)
+
+
+def _write(rows):
+    with db_session.session_scope() as db_sess:
+        _write_rows(db_sess, rows)
+
+
+async def _write_async(rows):
+    async with db_session.async_session_scope() as db_sess:
+        await db_sess.run_sync(_write_rows, rows)
+
+
+async def flush():
+    """Записывает все накопленные записи одним INSERT в отдельном потоке (или на асинхронном движке)"""
+    global __pending
+    async with __lock:
+        if not __pending:
+            return
+        rows, __pending = __pending, []
+        started = time.perf_counter()
+        try:
+            if db_session.async_enabled():
+                await _write_async(rows)
+            else:
+                await asyncio.to_thread(_write, rows)
+        except Exception:
+            logger.exception("Не удалось записать %d записей журнала", len(rows))
+            __stats['failed_flushes'] += 1
+            # Возвращаем записи в начало очереди, следующая попытка — по таймеру
+            __pending = rows + __pending
+            return
+        latency = time.perf_counter() - started
+        __stats['flushes'] += 1
+        __stats['flushed_rows'] += len(rows)
+        __stats['last_flush_latency'] = latency
+        __stats['total_flush_latency'] += latency
+
+
+async def _flush_loop():
+    while True:
+        try:
+            await asyncio.wait_for(__wake.wait(), timeout=__flush_interval)
+        except asyncio.TimeoutError:
+            pass
+        __wake.clear()
+        await flush()
+
+
+async def start(batch_size, flush_interval, max_pending=10000):
+    global __task, __wake, __lock, __batch_size, __flush_interval, __max_pending
+
+    if __task:
+        return
+
+    __batch_size, __flush_interval, __max_pending = batch_size, flush_interval, max_pending
+    __wake, __lock = asyncio.Event(), asyncio.Lock()
+    __task = asyncio.create_task(_flush_loop())
+
+
+async def stop():
+    """Останавливает фоновую запись и сбрасывает остаток очереди в БД"""
+    global __task
+    if __task:
+        __task.cancel()
+        try:
+            await __task
+        except asyncio.CancelledError:
+            pass
+        __task = None
+    if __lock:
+        await flush()
+
+
+def stats():
+    """Счётчики журнала: глубина очереди и задержка записи пачек"""
+    flushes = __stats['flushes'] or 1
+    return dict(__stats, queue_depth=len(__pending),
+                avg_flush_latency=__stats['total_flush_latency'] / flushes)
@@ -0,0 +1,265 @@
+import asyncio
+import contextvars
+import functools
+import itertools
+import json
+import logging
+import re
+import time
+from bisect import bisect_left
+
+from telegram.request import HTTPXRequest
+
+logger = logging.getLogger(__name__)
+trace_logger = logging.getLogger('trace')
+
+# Метрики в текстовом формате Prometheus: время обработчиков, обработчики в работе, ошибки,
+# трафик к Bot API, задержка цикла событий и счётчики остальных сервисов (их stats()).
+# Отдаются по HTTP на /metrics; при trace=True каждый вызов обработчика пишется в журнал JSON-строкой.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+__handlers = {}  # имя обработчика -> HandlerMetrics
+__api = {}  # (обработчик, метод Bot API) -> {'requests', 'errors', 'bytes_out', 'bytes_in'}
+__loop_lag = None
+__stats_providers = {}  # имя сервиса -> функция stats()
+__trace = False
+__server = None
+__lag_task = None
+__span_ids = itertools.count(1)
+
+# Какой обработчик сейчас выполняется: им помечается трафик к Bot API, в том числе скачивание файлов
+current_handler = contextvars.ContextVar('current_handler', default=None)
+current_span = contextvars.ContextVar('current_span', default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # последний — больше всех границ
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels=''):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels}{"," if labels else ""}le="+Inf"}} {self.count}')
+        suffix = f'{{{labels}}}' if labels else ''
+        lines.append(f'{name}_sum{suffix} {self.sum}')
+        lines.append(f'{name}_count{suffix} {self.count}')
+        return lines
+
+
+class HandlerMetrics:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.in_flight = 0
+        self.errors = 0
+
+
+def configure(trace=False):
+    global __trace, __loop_lag
+    __trace = trace
+    __loop_lag = Histogram(LOOP_LAG_BUCKETS)
+
+
+def tracing_enabled() -> bool:
+    return __trace
+
+
+def _next_span_id() -> int:
+    return next(__span_ids)
+
+
+def _api_counters(handler, api_method) -> dict:
+    return __api.setdefault((handler, api_method), {'requests': 0, 'errors': 0, 'bytes_out': 0, 'bytes_in': 0})
+
+
+def register_stats(name, provider):
+    """Добавляет на /metrics числовые значения из provider() — обычно stats() сервиса"""
+    __stats_providers[name] = provider
+
+
+class span:
+    """Участок трассировки: при включённой трассировке пишет JSON с длительностью и родительским участком"""
+
+    def __init__(self, name, **attributes):
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self):
+        self.enabled = tracing_enabled()
+        if self.enabled:
+            parent = current_span.get()
+            self.trace_id = parent[0] if parent else _next_span_id()
+            self.span_id = _next_span_id()
+            self.parent_id = parent[1] if parent else None
+            self.token = current_span.set((self.trace_id, self.span_id))
+            self.started = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.enabled:
+            current_span.reset(self.token)
+            trace_logger.info(json.dumps({
+                'trace_id': self.trace_id, 'span_id': self.span_id, 'parent_id': self.parent_id,
+                'name': self.name, 'start': self.started, 'duration_ms': (time.time() - self.started) * 1000,
+                'status': 'error' if exc_type else 'ok', 'error': repr(exc) if exc else None, **self.attributes,
+            }, ensure_ascii=False, default=str))
+        return False
+
+
+def instrument(handler, name=None):
+    """Оборачивает обработчик PTB: время, число одновременно выполняемых, ошибки и участок трассировки"""
+    name = name or handler.__name__
+    handler_metrics = __handlers.setdefault(name, HandlerMetrics())
+
+    @functools.wraps(handler)
+    async def wrapper(update, context):
+        token = current_handler.set(name)
+        handler_metrics.in_flight += 1
+        started = time.perf_counter()
+        user = getattr(update, 'effective_user', None)
+        try:
+            with span(name, update_id=getattr(update, 'update_id', None), user_id=user.id if user else None):
+                return await handler(update, context)
+        except Exception:
+            handler_metrics.errors += 1
+            raise
+        finally:
+            handler_metrics.latency.observe(time.perf_counter() - started)
+            handler_metrics.in_flight -= 1
+            current_handler.reset(token)
+
+    return wrapper
+
+
+class MeteredRequest(HTTPXRequest):
+    """Запросы к Bot API с учётом отправленных и полученных байт по обработчикам (скачивание файлов тоже)"""
+
+    async def do_request(self, url, method, request_data=None, *args, **kwargs):
+        # В адресе есть токен, поэтому в метки идёт только имя метода
+        api_method = 'file' if '/file/bot' in url else url.rsplit('/', 1)[-1]
+        # Вне обработчика (getUpdates, задачи worker.py, фоновые отправки) метка пустая
+        api_metrics = _api_counters(current_handler.get() or '', api_method)
+        api_metrics['requests'] += 1
+        if request_data is not None:
+            if request_data.contains_files:
+                api_metrics['bytes_out'] += sum(len(part[1]) for part in request_data.multipart_data.values()
+                                                if isinstance(part, tuple))
+            else:
+                api_metrics['bytes_out'] += len(request_data.json_payload)
+        try:
+            code, payload = await super().do_request(url, method, request_data, *args, **kwargs)
+        except Exception:
+            api_metrics['errors'] += 1
+            raise
+        api_metrics['bytes_in'] += len(payload)
+        return code, payload
+
+
+async def _measure_loop_lag(interval):
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        __loop_lag.observe(max(0.0, time.perf_counter() - started - interval))
+
+
+def _metric_name(*parts):
+    return re.sub(r'[^a-zA-Z0-9_]', '_', '_'.join(str(part) for part in parts))
+
+
+def _flatten(prefix, value, lines):
+    if isinstance(value, bool):
+        lines.append(f'{_metric_name(prefix)} {int(value)}')
+    elif isinstance(value, (int, float)):
+        lines.append(f'{_metric_name(prefix)} {value}')
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(f'{prefix}_{key}', item, lines)
+
+
+def render() -> str:
+    lines = ['# TYPE bot_handler_latency_seconds histogram']
+    for name, handler_metrics in __handlers.items():
+        lines.extend(handler_metrics.latency.render('bot_handler_latency_seconds', f'handler="{name}"'))
+    lines.append('# TYPE bot_handler_in_flight gauge')
+    lines.extend(f'bot_handler_in_flight{{handler="{name}"}} {m.in_flight}' for name, m in __handlers.items())
+    lines.append('# TYPE bot_handler_errors_total counter')
+    lines.extend(f'bot_handler_errors_total{{handler="{name}"}} {m.errors}' for name, m in __handlers.items())
+    for key in ('requests', 'errors', 'bytes_out', 'bytes_in'):
+        lines.append(f'# TYPE bot_api_{key}_total counter')
+        lines.extend(f'bot_api_{key}_total{{handler="{handler}",method="{method}"}} {api_metrics[key]}'
+                     for (handler, method), api_metrics in __api.items())
+    if __loop_lag is not None:
+        lines.append('# TYPE bot_event_loop_lag_seconds histogram')
+        lines.extend(__loop_lag.render('bot_event_loop_lag_seconds'))
+    for service, provider in __stats_providers.items():
+        try:
+            _flatten(f'bot_{service}', provider(), lines)
+        except Exception:
+            logger.exception("Не удалось получить метрики сервиса %s", service)
+    return '\n'.join(lines) + '\n'
+
+
+async def _serve_http(reader, writer):
+    # Минимальный HTTP/1.0: нам нужен только GET /metrics для Prometheus или curl
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b'\r\n', b'\n', b''):
+            pass
+        parts = request_line.decode('latin-1').split()
+        if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+            status, body = '200 OK', render().encode()
+        else:
+            status, body = '404 Not Found', b'not found\n'
+        writer.write(f'HTTP/1.0 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+                     f'Content-Length: {len(body)}\r\n\r\n'.encode() + body)
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start(host, port, loop_lag_interval=0.5):
+    global __server, __lag_task
+
+    if __lag_task:
+        return
+
+    if __loop_lag is None:
+        configure()
+    __lag_task = asyncio.create_task(_measure_loop_lag(loop_lag_interval))
+    if port is not None:
+        try:
+            __server = await asyncio.start_server(_serve_http, host, port)
+        except OSError as e:
+            # Занятый порт (например, бот и нагрузочный стенд на одной машине) не должен мешать работе бота
+            logger.warning("Сервер метрик не запущен на %s:%d: %s", host, port, e)
+            return
+        logger.info("Метрики доступны на http://%s:%d/metrics", host, port)
+
+
+async def stop():
+    global __server, __lag_task
+    if __server:
+        __server.close()
+        await __server.wait_closed()
+        __server = None
+    if __lag_task:
+        __lag_task.cancel()
+        try:
+            await __lag_task
+        except asyncio.CancelledError:
+            pass
+        __lag_task = None
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+
+from services import workers
+from services.pdf_tools import append_pdf, finalize_pdf
+
+logger = logging.getLogger(__name__)
+
+
+class MergeSession:
+    """Сессия объединения PDF одного чата.
+
+    Файлы лежат во временном каталоге, а не в памяти, и дописываются в рабочий
+    документ по мере поступления, так что к «Готово!» остаётся только финальное сохранение.
+    """
+
+    def __init__(self, spool_dir=None):
+        self.directory = tempfile.mkdtemp(prefix='pdf_merge_', dir=spool_dir)
+        self.paths = []
+        self.merged_count = 0  # Сколько файлов из paths уже в рабочем документе
+        self._stale = False  # Рабочий документ на диске мог остаться от прошлого запуска
+        self._task = None
+        self._lock = asyncio.Lock()
+
+    def __getstate__(self):
+        # Задачу и блокировку не сохраняем; рабочий документ после перезапуска соберём заново
+        return {'directory': self.directory, 'paths': self.paths}
+
+    def __setstate__(self, state):
+        # Диск здесь не трогаем: PTB делает deepcopy chat_data перед каждым сохранением, и копия
+        # указывает на тот же рабочий документ, что и живая сессия. Старый документ удаляется
+        # в _catch_up, только если восстановленная сессия действительно продолжит объединение.
+        self.directory = state['directory']
+        self.paths = [path for path in state['paths'] if os.path.exists(path)]
+        self.merged_count = 0
+        self._stale = True
+        self._task = None
+        self._lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self.paths)
+
+    def next_path(self) -> str:
+        """Путь, по которому нужно сохранить следующий присланный файл"""
+        return os.path.join(self.directory, f'{len(self.paths):04d}.pdf')
+
+    @property
+    def work_path(self) -> str:
+        return os.path.join(self.directory, 'merged.part.pdf')
+
+    @property
+    def output_path(self) -> str:
+        return os.path.join(self.directory, 'merged_document.pdf')
+
+    def add(self, path: str, merge: bool = True):
+        """Регистрирует скачанный файл и запускает его объединение в фоне.
+
+        С merge=False файл только запоминается: так делает бот, когда объединение выполнит worker.py.
+        """
+        self.paths.append(path)
+        if merge and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._catch_up_in_background())
+
+    async def _catch_up(self):
+        # Файлы дописываются строго по порядку, поэтому одновременно работает одна задача
+        async with self._lock:
+            if self._stale:
+                if os.path.exists(self.work_path):
+                    os.remove(self.work_path)
+                self._stale = False
+            while self.merged_count < len(self.paths):
+                try:
+                    await workers.run(append_pdf, self.work_path, self.paths[self.merged_count])
+                except workers.PoolSaturatedError:
+                    raise
+                except Exception:
+                    # Повреждённый файл пропускаем, рабочий документ при этом не меняется
+                    logger.exception("Не удалось дописать %s в объединяемый PDF", self.paths[self.merged_count])
+                self.merged_count += 1
+
+    async def _catch_up_in_background(self):
+        try:
+            await self._catch_up()
+        except workers.PoolSaturatedError:
+            # Оставшиеся файлы будут дописаны при следующем add() или в finish()
+            pass
+
+    async def finish(self) -> int:
+        """Дописывает оставшиеся файлы, сохраняет результат в output_path и возвращает число страниц"""
+        if self._task:
+            await self._task
+        await self._catch_up()
+        return await workers.run(finalize_pdf, self.work_path, self.output_path)
+
+    def detach(self):
+        """Передаёт файлы сессии другому владельцу (worker.py): каталог не удаляется, сессия пустеет"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+        directory, paths = self.directory, self.paths
+        self.paths = []
+        self.merged_count = 0
+        return directory, paths
+
+    def close(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.paths = []
+        self.merged_count = 0
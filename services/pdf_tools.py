@@ -0,0 +1,132 @@
+import hashlib
+import io
+import logging
+import os
+import zipfile
+
+logger = logging.getLogger(__name__)
+
+# fitz (PyMuPDF) импортируется внутри функций: они выполняются в процессах пула, а боту при запуске
+# и на простых командах эта библиотека не нужна (импорт занимает заметную долю старта)
+
+
+def _checkpoint(merged_doc, work_path):
+    """Сбрасывает объединённый документ на диск и открывает заново, освобождая память"""
+    import fitz
+
+    if merged_doc.name == work_path:
+        merged_doc.saveIncr()
+    else:
+        merged_doc.save(work_path)
+    merged_doc.close()
+    return fitz.open(work_path)
+
+
+def merge_pdf_files(paths: list[str], output_path: str, checkpoint_every: int = 10) -> int:
+    """Объединяет PDF-файлы с диска в output_path и возвращает число страниц.
+
+    Каждые checkpoint_every файлов промежуточный результат сохраняется на диск,
+    поэтому в памяти одновременно находится лишь небольшая часть документов.
+    """
+    import fitz
+
+    work_path = output_path + '.part'
+    merged_doc = fitz.open()
+    try:
+        for i, path in enumerate(paths, 1):
+            try:
+                with fitz.open(path) as pdf_document:
+                    merged_doc.insert_pdf(pdf_document)
+            except Exception as e:
+                logger.warning("Пропущен PDF, который не удалось открыть: %s (%s)", path, e)
+                continue
+            if i % checkpoint_every == 0 and i < len(paths):
+                merged_doc = _checkpoint(merged_doc, work_path)
+
+        page_count = merged_doc.page_count
+        if page_count:
+            merged_doc.save(output_path, garbage=3, deflate=True)
+        return page_count
+    finally:
+        merged_doc.close()
+        if os.path.exists(work_path):
+            os.remove(work_path)
+
+
+def append_pdf(work_path: str, pdf_path: str) -> bool:
+    """Дописывает pdf_path в конец рабочего документа инкрементальным сохранением"""
+    import fitz
+
+    try:
+        pdf_document = fitz.open(pdf_path)
+    except Exception as e:
+        logger.warning("Пропущен PDF, который не удалось открыть: %s (%s)", pdf_path, e)
+        return False
+    with pdf_document:
+        if os.path.exists(work_path):
+            with fitz.open(work_path) as merged_doc:
+                merged_doc.insert_pdf(pdf_document)
+                merged_doc.saveIncr()
+        else:
+            with fitz.open() as merged_doc:
+                merged_doc.insert_pdf(pdf_document)
+                merged_doc.save(work_path)
+    return True
+
+
+def finalize_pdf(work_path: str, output_path: str) -> int:
+    """Один раз сжимает рабочий документ (garbage/deflate) в output_path, возвращает число страниц"""
+    import fitz
+
+    if not os.path.exists(work_path):
+        return 0
+    with fitz.open(work_path) as merged_doc:
+        page_count = merged_doc.page_count
+        if page_count:
+            merged_doc.save(output_path, garbage=3, deflate=True)
+    return page_count
+
+
+def iter_pdf_images(pdf_file: bytes):
+    """Перебирает изображения PDF как пары (имя файла, содержимое).
+
+    Одно и то же изображение (например, логотип на каждой странице) отдаётся один раз.
+    """
+    import fitz
+
+    seen_xrefs = set()
+    with fitz.open(stream=pdf_file, filetype="pdf") as doc:
+        for page_num in range(len(doc)):
+            page = doc.load_page(page_num)
+            for img in page.get_images(full=True):
+                xref = img[0]
+                if xref in seen_xrefs:
+                    continue
+                seen_xrefs.add(xref)
+                base_image = doc.extract_image(xref)
+
+                if not base_image:
+                    continue
+
+                yield f"image_{page_num + 1}_{xref}.{base_image['ext']}", base_image["image"]
+
+
+def extract_pdf_images(pdf_file: bytes) -> list[tuple[str, bytes]]:
+    """Возвращает все уникальные изображения PDF-файла в виде пар (имя файла, содержимое)"""
+    return list(iter_pdf_images(pdf_file))
+
+
+def build_images_zip(pdf_files: list[bytes]) -> bytes:
+    """Собирает изображения всех PDF в ZIP за один проход, без промежуточных списков"""
+    output = io.BytesIO()
+    seen_digests = set()
+    # Изображения в PDF уже сжаты, повторное сжатие только тратит время
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for file_num, pdf_file in enumerate(pdf_files, 1):
+            for image_filename, image_bytes in iter_pdf_images(pdf_file):
+                digest = hashlib.sha1(image_bytes).digest()
+                if digest in seen_digests:
+                    continue
+                seen_digests.add(digest)
+                archive.writestr(f"pdf_{file_num}/{image_filename}", image_bytes)
+    return output.getvalue()
@@ -0,0 +1,203 @@
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import pickle
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert
+from telegram.ext import BasePersistence, PersistenceInput
+
+from data import db_session
+from data.states import ConversationState
+
+logger = logging.getLogger(__name__)
+
+BLOB_MIN_SIZE = 1024  # Байтовые значения от этого размера уходят в спул-каталог, а не в таблицу
+
+
+class _SpoolingPickler(pickle.Pickler):
+    """Вместо крупных bytes/bytearray сохраняет ссылку на файл в спул-каталоге"""
+
+    def __init__(self, file, blobs):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.blobs = blobs  # имя файла -> содержимое
+
+    def persistent_id(self, obj):
+        if type(obj) not in (bytes, bytearray) or len(obj) < BLOB_MIN_SIZE:
+            return None
+        name = hashlib.blake2b(obj, digest_size=20).hexdigest()
+        self.blobs.setdefault(name, bytes(obj))
+        return name, type(obj) is bytearray
+
+
+class _SpoolingUnpickler(pickle.Unpickler):
+    def __init__(self, file, spool_dir):
+        super().__init__(file)
+        self.spool_dir = spool_dir
+
+    def persistent_load(self, pid):
+        name, is_bytearray = pid
+        with open(os.path.join(self.spool_dir, name), 'rb') as blob:
+            content = blob.read()
+        return bytearray(content) if is_bytearray else content
+
+
+class SqlitePersistence(BasePersistence):
+    """Хранит user_data и chat_data в таблице conversation_states.
+
+    Крупные двоичные данные (фотографии в очереди и т. п.) пишутся отдельными файлами в спул-каталог,
+    а в таблице остаётся только ссылка. Изменения копятся и записываются одной транзакцией
+    не чаще раза в write_delay секунд.
+    """
+
+    def __init__(self, spool_dir, write_delay=2.0, update_interval=60):
+        super().__init__(store_data=PersistenceInput(bot_data=False, callback_data=False),
+                         update_interval=update_interval)
+        os.makedirs(spool_dir, exist_ok=True)
+        self.spool_dir = spool_dir
+        self.write_delay = write_delay
+        self._dirty = {}  # (kind, key) -> данные или None для удаления
+        self._write_task = None
+        self._write_lock = asyncio.Lock()
+
+    # Чтение
+
+    def _load(self, kind):
+        with db_session.session_scope() as db_sess:
+            rows = db_sess.execute(select(ConversationState.key, ConversationState.data)
+                                   .where(ConversationState.kind == kind)).all()
+        result = {}
+        for key, data in rows:
+            try:
+                result[key] = _SpoolingUnpickler(io.BytesIO(data), self.spool_dir).load()
+            except Exception as e:
+                logger.warning("Не удалось восстановить %s для %s: %s", kind, key, e)
+        return result
+
+    async def get_user_data(self):
+        return await asyncio.to_thread(self._load, 'user_data')
+
+    async def get_chat_data(self):
+        return await asyncio.to_thread(self._load, 'chat_data')
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name):
+        return {}
+
+    # Запись
+
+    def _mark(self, kind, key, data):
+        # Запоминаем только ссылку: сериализация и хэширование крупных значений идут в потоке при записи,
+        # а не в цикле событий на каждое обновление
+        self._dirty[(kind, key)] = data
+        if self._write_task is None or self._write_task.done():
+            self._write_task = asyncio.create_task(self._write_later())
+
+    async def _write_later(self):
+        await asyncio.sleep(self.write_delay)
+        # Начатую запись не прерываем, даже если задачу отменит flush()
+        await asyncio.shield(self._write())
+
+    async def _write(self):
+        async with self._write_lock:
+            if not self._dirty:
+                return
+            dirty, self._dirty = self._dirty, {}
+            torn = await asyncio.to_thread(self._write_sync, dirty)
+        for state_key in torn:
+            if state_key not in self._dirty:
+                self._mark(*state_key, dirty[state_key])
+
+    @staticmethod
+    def _serialize(data):
+        buffer, blobs = io.BytesIO(), {}
+        _SpoolingPickler(buffer, blobs).dump(data)
+        return buffer.getvalue(), blobs
+
+    def _write_sync(self, dirty) -> list:
+        """Записывает изменения; возвращает ключи, данные которых менялись во время сериализации"""
+        changes, torn = {}, []
+        for state_key, data in dirty.items():
+            if data is None:
+                changes[state_key] = None
+                continue
+            try:
+                changes[state_key] = self._serialize(data)
+            except RuntimeError:
+                # Обработчик изменил словарь прямо во время сериализации — запишем в следующий раз
+                torn.append(state_key)
+
+        for change in changes.values():
+            if change is None:
+                continue
+            for name, content in change[1].items():
+                path = os.path.join(self.spool_dir, name)
+                if not os.path.exists(path):
+                    with open(path, 'wb') as blob:
+                        blob.write(content)
+
+        with db_session.session_scope() as db_sess:
+            for (kind, key), change in changes.items():
+                if change is None:
+                    db_sess.execute(delete(ConversationState).where(ConversationState.kind == kind,
+                                                                    ConversationState.key == key))
+                    continue
+                data, blobs = change
+                statement = insert(ConversationState).values(kind=kind, key=key, data=data,
+                                                             spool_refs=' '.join(blobs))
+                db_sess.execute(statement.on_conflict_do_update(
+                    index_elements=[ConversationState.kind, ConversationState.key],
+                    set_={'data': statement.excluded.data, 'spool_refs': statement.excluded.spool_refs},
+                ))
+            db_sess.flush()
+            referenced = set()
+            for (spool_refs,) in db_sess.execute(select(ConversationState.spool_refs)):
+                referenced.update((spool_refs or '').split())
+
+        # Файлы, на которые больше никто не ссылается, удаляем
+        for name in os.listdir(self.spool_dir):
+            if name not in referenced:
+                os.remove(os.path.join(self.spool_dir, name))
+        return torn
+
+    async def update_user_data(self, user_id, data):
+        self._mark('user_data', user_id, data)
+
+    async def update_chat_data(self, chat_id, data):
+        self._mark('chat_data', chat_id, data)
+
+    async def drop_user_data(self, user_id):
+        self._mark('user_data', user_id, None)
+
+    async def drop_chat_data(self, chat_id):
+        self._mark('chat_data', chat_id, None)
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def update_conversation(self, name, key, new_state):
+        pass
+
+    async def refresh_user_data(self, user_id, user_data):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    async def flush(self):
+        if self._write_task and not self._write_task.done():
+            self._write_task.cancel()
+        await self._write()
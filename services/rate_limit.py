@@ -0,0 +1,90 @@
+import heapq
+import math
+import time
+
+# Ограничение частоты запросов: у каждого пользователя своё «ведро жетонов» на каждый тип операции.
+# Ведро вмещает capacity жетонов и полностью наполняется за period секунд; операция тратит один жетон.
+
+__limits = {}  # операция -> (capacity, period)
+__buckets = {}  # (Telegram id, операция) -> TokenBucket
+__max_buckets = 100000
+__stats = {}
+
+
+class TokenBucket:
+    __slots__ = ('tokens', 'updated', 'notified')
+
+    def __init__(self, capacity, now):
+        self.tokens = float(capacity)
+        self.updated = now
+        self.notified = False  # Пользователю уже сказали об ограничении в этой серии отказов
+
+    def refill(self, capacity, rate, now):
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+
+class Decision:
+    __slots__ = ('allowed', 'retry_after', 'first')
+
+    def __init__(self, allowed, retry_after=0.0, first=False):
+        self.allowed = allowed
+        self.retry_after = retry_after  # Через сколько секунд появится жетон
+        self.first = first  # Первый отказ подряд — о нём стоит сообщить и записать в журнал
+
+
+def configure(limits, max_buckets=100000):
+    global __limits, __max_buckets
+    __limits, __max_buckets = dict(limits), max_buckets
+    __buckets.clear()
+
+
+def _prune(now):
+    # Полные вёдра ничем не отличаются от новых, их можно забыть
+    full = []
+    for (user_id, op), bucket in __buckets.items():
+        capacity, period = __limits[op]
+        if bucket.tokens + (now - bucket.updated) * capacity / period >= capacity:
+            full.append((user_id, op))
+    for key in full:
+        del __buckets[key]
+    # Если почти все пользователи упёрлись в лимит, забываем давно не обращавшихся, чтобы не превышать
+    # max_buckets; освобождаем сразу десятую часть, чтобы не перебирать вёдра на каждом новом пользователе
+    excess = len(__buckets) - (__max_buckets - max(1, __max_buckets // 10))
+    if excess > 0:
+        for key in heapq.nsmallest(excess, __buckets, key=lambda key: __buckets[key].updated):
+            del __buckets[key]
+
+
+def acquire(user_id, op, now=None) -> Decision:
+    """Тратит жетон операции op пользователя user_id; операции без настроенного лимита не ограничены"""
+    limit = __limits.get(op)
+    if limit is None:
+        return Decision(True)
+    capacity, period = limit
+    rate = capacity / period
+    now = time.monotonic() if now is None else now
+    op_stats = __stats.setdefault(op, {'allowed': 0, 'rejected': 0})
+
+    bucket = __buckets.get((user_id, op))
+    if bucket is None:
+        if len(__buckets) >= __max_buckets:
+            _prune(now)
+        bucket = __buckets[(user_id, op)] = TokenBucket(capacity, now)
+    else:
+        bucket.refill(capacity, rate, now)
+
+    if bucket.tokens >= 1:
+        bucket.tokens -= 1
+        bucket.notified = False
+        op_stats['allowed'] += 1
+        return Decision(True)
+
+    op_stats['rejected'] += 1
+    first, bucket.notified = not bucket.notified, True
+    # Погрешность float не должна превращать ровные 20 секунд в 21
+    return Decision(False, math.ceil(round((1 - bucket.tokens) / rate, 6)), first)
+
+
+def stats():
+    return {'buckets': len(__buckets), 'operations': {op: dict(op_stats) for op, op_stats in __stats.items()}}
@@ -0,0 +1,91 @@
+import asyncio
+import hashlib
+import json
+import time
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.sqlite import insert
+
+from data import db_session
+from data.results import CachedResult
+
+# Кэш результатов конвертаций, фильтров и извлечения изображений.
+# Хранятся только file_id уже отправленных в Telegram файлов (и прочие метаданные): при попадании
+# файл пересылается без обработки и загрузки. Записи лежат в общей БД, поэтому бот и все worker.py
+# пользуются одним кэшем с общим порядком вытеснения (LRU по времени последнего обращения).
+# Размер кэша ограничен числом записей (max_entries), а не объёмом на диске: сами файлы хранит Telegram.
+
+__max_entries = 0
+__entries = 0  # Размер кэша при последней записи из этого процесса
+__stats = {}
+
+
+def source_id(file_unique_id=None, data: bytes = None) -> str:
+    """Идентификатор входного файла: file_unique_id Telegram или SHA-256 содержимого"""
+    if file_unique_id:
+        return f'tg:{file_unique_id}'
+    return 'sha256:' + hashlib.sha256(data).hexdigest()
+
+
+def make_key(source: str, operation: str, *params) -> str:
+    raw = json.dumps([source, operation, *params], ensure_ascii=False)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def global_init(max_entries):
+    global __max_entries
+
+    if __max_entries:
+        return
+
+    __max_entries = max_entries
+
+
+def _operation_stats(operation):
+    return __stats.setdefault(operation, {'hits': 0, 'misses': 0})
+
+
+def _get(key):
+    with db_session.session_scope() as db_sess:
+        return db_sess.execute(update(CachedResult).where(CachedResult.key == key).values(
+            used_at=time.time()).returning(CachedResult.meta)).scalar_one_or_none()
+
+
+def _put(key, meta):
+    global __entries
+    with db_session.session_scope() as db_sess:
+        statement = insert(CachedResult).values(key=key, meta=meta, used_at=time.time())
+        db_sess.execute(statement.on_conflict_do_update(
+            index_elements=[CachedResult.key], set_={'meta': statement.excluded.meta,
+                                                     'used_at': statement.excluded.used_at}))
+        __entries = db_sess.execute(select(func.count()).select_from(CachedResult)).scalar_one()
+        if __entries > __max_entries:
+            # Вытесняем давно не использованные записи
+            keep = select(CachedResult.key).order_by(CachedResult.used_at.desc()).limit(__max_entries)
+            db_sess.execute(delete(CachedResult).where(CachedResult.key.not_in(keep)))
+            __entries = __max_entries
+
+
+async def get(key, operation):
+    """Метаданные записи (например, file_id или file_ids) или None при промахе"""
+    if not __max_entries:
+        return None
+    meta = await asyncio.to_thread(_get, key)
+    _operation_stats(operation)['hits' if meta else 'misses'] += 1
+    return json.loads(meta) if meta else None
+
+
+async def put(key, **meta):
+    """Запоминает метаданные отправленного результата и вытесняет старые записи"""
+    if not __max_entries:
+        return
+    await asyncio.to_thread(_put, key, json.dumps(meta, ensure_ascii=False))
+
+
+def stats():
+    """Попадания и промахи по операциям и общий размер кэша"""
+    operations = {}
+    for operation, counters in __stats.items():
+        total = counters['hits'] + counters['misses']
+        operations[operation] = dict(counters, hit_ratio=counters['hits'] / total if total else 0.0)
+    return {'entries': __entries, 'max_entries': __max_entries, 'operations': operations}
@@ -0,0 +1,185 @@
+import asyncio
+import codecs
+import json
+import logging
+import os
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 4096  # Максимальная длина сообщения Telegram в символах
+CHUNK_SIZE = 64 * 1024
+FALLBACK_ENCODING = 'cp1251'  # Чаще всего не-UTF-8 текстовые файлы пользователей — в Windows-1251
+
+# Постраничные копии файлов лежат в своём каталоге. Ссылки на них хранятся в chat_data и могут
+# пережить перезапуск, поэтому файлы удаляются не при выходе, а когда их долго не читали (ttl).
+
+__directory = None
+__ttl = 86400.0
+__task = None
+
+BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+
+def detect_encoding(path: str) -> str:
+    """Определяет кодировку по BOM или пробным инкрементальным декодированием всего файла как UTF-8"""
+    with open(path, 'rb') as file:
+        head = file.read(4)
+        for bom, encoding in BOMS:
+            if head.startswith(bom):
+                return encoding
+        file.seek(0)
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        try:
+            while chunk := file.read(CHUNK_SIZE):
+                decoder.decode(chunk)
+            decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            return FALLBACK_ENCODING
+    return 'utf-8'
+
+
+def transcode_to_utf8(source_path: str, target_path: str, encoding: str):
+    """Перекодирует файл в UTF-8 по частям, не загружая его целиком"""
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    with open(source_path, 'rb') as source, open(target_path, 'w', encoding='utf-8', newline='') as target:
+        while chunk := source.read(CHUNK_SIZE):
+            target.write(decoder.decode(chunk))
+        target.write(decoder.decode(b'', final=True))
+
+
+def build_page_index(path: str, page_size: int = PAGE_SIZE) -> list[int]:
+    """Смещения (в байтах) начала каждой страницы UTF-8 файла.
+
+    Страницы режутся по границам строк; строки длиннее страницы режутся по символам.
+    """
+    offsets = [0]
+    page_chars = 0
+    position = 0
+    with open(path, 'rb') as file:
+        for line in file:
+            text = line.decode('utf-8')
+            if page_chars and page_chars + len(text) > page_size:
+                offsets.append(position)
+                page_chars = 0
+            while len(text) > page_size:
+                piece = text[:page_size]
+                position += len(piece.encode('utf-8'))
+                offsets.append(position)
+                text = text[page_size:]
+            page_chars += len(text)
+            position += len(text.encode('utf-8'))
+    if len(offsets) > 1 and offsets[-1] >= position:
+        offsets.pop()
+    offsets.append(position)
+    return offsets
+
+
+class TextDocument:
+    """Постраничный доступ к большому текстовому файлу: в памяти хранится только индекс смещений"""
+
+    def __init__(self, path: str, offsets: list[int]):
+        self.path = path
+        self.offsets = offsets  # Последний элемент — размер файла
+
+    @property
+    def page_count(self) -> int:
+        return len(self.offsets) - 1
+
+    def read_page(self, number: int) -> str:
+        """Текст страницы; FileNotFoundError — файл уже удалён по сроку хранения"""
+        start, end = self.offsets[number], self.offsets[number + 1]
+        with open(self.path, 'rb') as file:
+            file.seek(start)
+            page = file.read(end - start).decode('utf-8')
+        # Срок хранения отсчитывается от последнего чтения
+        os.utime(self.path)
+        return page
+
+    def close(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def global_init(directory, ttl):
+    global __directory, __ttl
+
+    if __directory:
+        return
+
+    os.makedirs(directory, exist_ok=True)
+    __directory, __ttl = directory, ttl
+
+
+def sweep(now=None) -> int:
+    """Удаляет копии, которые не читали дольше ttl, и возвращает их число"""
+    now = time.time() if now is None else now
+    removed = 0
+    for entry in os.scandir(__directory):
+        if entry.is_file() and now - entry.stat().st_mtime > __ttl:
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+async def _sweep_loop(interval):
+    while True:
+        try:
+            removed = await asyncio.to_thread(sweep)
+            if removed:
+                logger.info("Удалено %d устаревших текстовых файлов", removed)
+        except Exception:
+            logger.exception("Не удалось удалить устаревшие текстовые файлы")
+        await asyncio.sleep(interval)
+
+
+async def start(interval=3600):
+    """Удаляет оставшиеся с прошлых запусков устаревшие файлы и затем проверяет каталог раз в interval секунд"""
+    global __task
+
+    if __task:
+        return
+
+    __task = asyncio.create_task(_sweep_loop(interval))
+
+
+async def stop():
+    global __task
+    if __task:
+        __task.cancel()
+        try:
+            await __task
+        except asyncio.CancelledError:
+            pass
+        __task = None
+
+
+def _spool_path():
+    fd, path = tempfile.mkstemp(prefix='text_', suffix='.txt', dir=__directory)
+    os.close(fd)
+    return path
+
+
+def open_text(raw_path: str) -> TextDocument:
+    """Готовит скачанный текстовый файл к постраничному чтению (выполнять вне цикла событий)"""
+    path = _spool_path()
+    transcode_to_utf8(raw_path, path, detect_encoding(raw_path))
+    return TextDocument(path, build_page_index(path))
+
+
+def open_json(raw_path: str) -> TextDocument:
+    """Форматирует JSON с отступами в файл и готовит его к постраничному чтению"""
+    with open(raw_path, encoding=detect_encoding(raw_path)) as file:
+        json_data = json.load(file)
+    path = _spool_path()
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(json_data, file, indent=4, ensure_ascii=False)
+    return TextDocument(path, build_page_index(path))
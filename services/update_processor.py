@@ -0,0 +1,59 @@
+import asyncio
+
+from telegram.ext import BaseUpdateProcessor
+
+from services import workers
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """Обрабатывает обновления разных чатов параллельно, а одного чата — строго по очереди.
+
+    Состояние режима, очереди фотографий и сессии объединения хранятся на чат/пользователя,
+    поэтому два сообщения одного чата не должны обрабатываться одновременно.
+    """
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        self._chat_locks = {}  # chat_id -> [блокировка, сколько обновлений чата ждут или выполняются]
+        self.pending = 0
+
+    async def process_update(self, update, coroutine):
+        self.pending += 1
+        try:
+            chat = getattr(update, 'effective_chat', None)
+            if chat is None:
+                await super().process_update(update, coroutine)
+                return
+            # Место в общем лимите занимаем только после своей очереди в чате,
+            # иначе один активный чат мог бы занять все места ожиданием
+            entry = self._chat_locks.setdefault(chat.id, [asyncio.Lock(), 0])
+            entry[1] += 1
+            try:
+                async with entry[0]:
+                    await super().process_update(update, coroutine)
+            finally:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._chat_locks[chat.id]
+        finally:
+            self.pending -= 1
+
+    async def do_process_update(self, update, coroutine):
+        # Каждое обновление обрабатывается в своей задаче, так что пользователь виден только ей
+        user = getattr(update, 'effective_user', None)
+        workers.current_user.set(user.id if user else None)
+        await coroutine
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def stats(self):
+        return {
+            'max_concurrent': self.max_concurrent_updates,
+            'running': self.current_concurrent_updates,
+            'pending': self.pending,
+            'active_chats': len(self._chat_locks),
+        }
@@ -0,0 +1,166 @@
+import asyncio
+import gzip
+import json
+import logging
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.sqlite import insert
+
+from data import db_session
+from data.logging import Logging
+from data.usage import HourlyRequests, HourlyUsers
+
+logger = logging.getLogger(__name__)
+
+# Статистика использования для /stats. Журнал (таблица logging) построчно не читается:
+# log_writer при каждой записи пачки дополняет почасовые сводки, а отчёт строится по ним.
+# Старые строки журнала выгружаются в архив (gzip JSON Lines) и удаляются из БД.
+
+ARCHIVE_BATCH = 5000
+
+__task = None
+
+
+def _hour(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _upsert(db_sess, model, key, counts):
+    items = [{'hour': hour, key: value, 'count': count} for (hour, value), count in counts.items()]
+    # По 1000 строк: у SQLite ограничено число параметров в одном запросе
+    for start in range(0, len(items), 1000):
+        statement = insert(model).values(items[start:start + 1000])
+        statement = statement.on_conflict_do_update(
+            index_elements=['hour', key], set_={'count': model.count + statement.excluded.count})
+        db_sess.execute(statement)
+
+
+def _count(rows):
+    requests, users = Counter(), Counter()
+    for request_date, request, applying_user in rows:
+        hour = _hour(request_date)
+        requests[(hour, request)] += 1
+        if applying_user is not None:
+            users[(hour, applying_user)] += 1
+    return requests, users
+
+
+def rollup(db_sess, rows):
+    """Добавляет записи журнала в почасовые сводки (в той же транзакции, что и сами записи)"""
+    requests, users = _count((row['request_date'], row['request'], row['applying_user']) for row in rows)
+    _upsert(db_sess, HourlyRequests, 'request', requests)
+    _upsert(db_sess, HourlyUsers, 'applying_user', users)
+
+
+def backfill():
+    """Один раз строит сводки по уже накопленному журналу, если их ещё нет"""
+    with db_session.session_scope() as db_sess:
+        if db_sess.execute(select(HourlyRequests.hour).limit(1)).first() is not None:
+            return 0
+        requests, users = _count(db_sess.execute(
+            select(Logging.request_date, Logging.request, Logging.applying_user)
+            .execution_options(yield_per=10000)))
+        _upsert(db_sess, HourlyRequests, 'request', requests)
+        _upsert(db_sess, HourlyUsers, 'applying_user', users)
+        return sum(requests.values())
+
+
+def report(hours: int, now: datetime = None) -> dict:
+    """Запросы по командам, активные пользователи и самые нагруженные часы за последние hours часов"""
+    since = _hour(now or datetime.now()) - timedelta(hours=hours - 1)
+    with db_session.session_scope() as db_sess:
+        requests = db_sess.execute(
+            select(HourlyRequests.request, func.sum(HourlyRequests.count))
+            .where(HourlyRequests.hour >= since).group_by(HourlyRequests.request)
+            .order_by(func.sum(HourlyRequests.count).desc())).all()
+        active_users = db_sess.execute(
+            select(func.count(func.distinct(HourlyUsers.applying_user))).where(HourlyUsers.hour >= since)
+        ).scalar_one()
+        peak_hours = db_sess.execute(
+            select(HourlyRequests.hour, func.sum(HourlyRequests.count))
+            .where(HourlyRequests.hour >= since).group_by(HourlyRequests.hour)
+            .order_by(func.sum(HourlyRequests.count).desc()).limit(3)).all()
+    return {
+        'since': since,
+        'total': sum(count for _, count in requests),
+        'requests': requests,
+        'active_users': active_users,
+        'peak_hours': peak_hours,
+    }
+
+
+def format_report(data: dict) -> str:
+    lines = [f"Статистика с {data['since']:%d.%m.%Y %H:%M}",
+             f"Всего запросов: {data['total']}",
+             f"Активных пользователей: {data['active_users']}",
+             "",
+             "По командам:"]
+    lines.extend(f"\t{request}: {count}" for request, count in data['requests'])
+    if data['peak_hours']:
+        lines.append("")
+        lines.append("Пиковые часы:")
+        lines.extend(f"\t{hour:%d.%m %H:00}: {count}" for hour, count in data['peak_hours'])
+    return '\n'.join(lines)
+
+
+def archive_old(retention_days: int, directory: str, now: datetime = None) -> int:
+    """Переносит записи журнала старше retention_days дней в архив и удаляет их из БД.
+
+    Сводки не трогаются, так что отчёты за старые периоды остаются доступны.
+    """
+    cutoff = (now or datetime.now()) - timedelta(days=retention_days)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'logging-{cutoff:%Y-%m-%d}.jsonl.gz')
+    archived = 0
+    with db_session.session_scope() as db_sess:
+        while True:
+            rows = db_sess.execute(
+                select(Logging.id, Logging.applying_user, Logging.request, Logging.request_date)
+                .where(Logging.request_date < cutoff).order_by(Logging.id).limit(ARCHIVE_BATCH)).all()
+            if not rows:
+                break
+            # Сначала запись в архив, потом удаление: при сбое строки не теряются, а только повторятся
+            with gzip.open(path, 'at', encoding='utf-8') as archive:
+                for row_id, applying_user, request, request_date in rows:
+                    archive.write(json.dumps({'id': row_id, 'applying_user': applying_user, 'request': request,
+                                              'request_date': request_date.isoformat()}, ensure_ascii=False))
+                    archive.write('\n')
+            db_sess.execute(delete(Logging).where(Logging.id.in_([row[0] for row in rows])))
+            db_sess.commit()
+            archived += len(rows)
+    return archived
+
+
+async def _retention_loop(retention_days, directory, interval):
+    while True:
+        try:
+            archived = await asyncio.to_thread(archive_old, retention_days, directory)
+            if archived:
+                logger.info("В архив перенесено %d записей журнала", archived)
+        except Exception:
+            logger.exception("Не удалось перенести старые записи журнала в архив")
+        await asyncio.sleep(interval)
+
+
+async def start(retention_days, directory, interval=3600):
+    global __task
+
+    if __task:
+        return
+
+    await asyncio.to_thread(backfill)
+    __task = asyncio.create_task(_retention_loop(retention_days, directory, interval))
+
+
+async def stop():
+    global __task
+    if __task:
+        __task.cancel()
+        try:
+            await __task
+        except asyncio.CancelledError:
+            pass
+        __task = None
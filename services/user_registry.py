@@ -0,0 +1,102 @@
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import sqlalchemy as sa
+from sqlalchemy.dialects.sqlite import insert
+
+from data import db_session
+from data.users import User
+
+# Telegram id -> (User.id, момент добавления в кэш)
+__cache = OrderedDict()
+__capacity = 10000
+__ttl = 3600.0
+__stats = {'hits': 0, 'misses': 0, 'upserts': 0}
+
+
+def configure(capacity, ttl):
+    global __capacity, __ttl
+    __capacity, __ttl = capacity, ttl
+
+
+def _remember(account_id, user_id):
+    __cache[account_id] = (user_id, time.monotonic())
+    __cache.move_to_end(account_id)
+    while len(__cache) > __capacity:
+        __cache.popitem(last=False)
+
+
+def _lookup(account_id):
+    entry = __cache.get(account_id)
+    if entry is None:
+        return None
+    user_id, cached_at = entry
+    if time.monotonic() - cached_at > __ttl:
+        del __cache[account_id]
+        return None
+    __cache.move_to_end(account_id)
+    return user_id
+
+
+def warm():
+    """Заполняет кэш недавно активными пользователями (вызывается при старте)"""
+    with db_session.session_scope() as db_sess:
+        rows = db_sess.execute(
+            sa.select(User.account_id, User.id).order_by(User.modified_date.desc()).limit(__capacity)
+        ).all()
+    # Самые свежие добавляем последними, чтобы они дольше жили в LRU
+    for account_id, user_id in reversed(rows):
+        _remember(account_id, user_id)
+    return len(rows)
+
+
+def _upsert_statement(tg_user):
+    values = {
+        'account_id': tg_user.id,  # ID пользователя
+        'nickname': tg_user.username,  # username пользователя (@никнейм)
+        'surname': tg_user.last_name,  # фамилия пользователя (если есть)
+        'name': tg_user.first_name,  # имя пользователя
+        'modified_date': datetime.now(),
+    }
+    statement = insert(User).values(**values)
+    statement = statement.on_conflict_do_update(
+        index_elements=[User.account_id],
+        set_={key: statement.excluded[key] for key in ('nickname', 'surname', 'name', 'modified_date')},
+    ).returning(User.id)
+    return statement
+
+
+def upsert(tg_user) -> int:
+    """Создаёт или обновляет пользователя по Telegram id и возвращает User.id"""
+    with db_session.session_scope() as db_sess:
+        user_id = db_sess.execute(_upsert_statement(tg_user)).scalar_one()
+    __stats['upserts'] += 1
+    _remember(tg_user.id, user_id)
+    return user_id
+
+
+async def upsert_async(tg_user) -> int:
+    """upsert на асинхронном движке — без отдельного потока"""
+    async with db_session.async_session_scope() as db_sess:
+        user_id = (await db_sess.execute(_upsert_statement(tg_user))).scalar_one()
+    __stats['upserts'] += 1
+    _remember(tg_user.id, user_id)
+    return user_id
+
+
+async def get_user_id(tg_user) -> int:
+    """User.id для пользователя Telegram; в БД обращаемся только при промахе кэша"""
+    user_id = _lookup(tg_user.id)
+    if user_id is not None:
+        __stats['hits'] += 1
+        return user_id
+    __stats['misses'] += 1
+    if db_session.async_enabled():
+        return await upsert_async(tg_user)
+    return await asyncio.to_thread(upsert, tg_user)
+
+
+def stats():
+    return dict(__stats, size=len(__cache), capacity=__capacity)
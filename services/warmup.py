@@ -0,0 +1,60 @@
+import asyncio
+import importlib
+import logging
+import time
+
+from services import decoded_images, workers
+
+logger = logging.getLogger(__name__)
+
+# Тяжёлые зависимости подсистем импортируются при первом использовании: pandas и pyarrow — при первом
+# CSV, PyMuPDF и Pillow — при первой задаче с PDF или фотографией в пуле. Необязательный прогрев (config.WARMUP) загружает
+# их в фоне сразу после запуска и заранее поднимает процессы пула, чтобы первый запрос не ждал импорта.
+
+BOT_MODULES = ('pyarrow', 'pyarrow.compute', 'pyarrow.csv', 'pyarrow.parquet', 'pandas')
+POOL_MODULES = ('fitz', 'PIL.Image')
+
+__task = None
+
+
+def import_modules(names) -> float:
+    started = time.perf_counter()
+    for name in names:
+        importlib.import_module(name)
+    return time.perf_counter() - started
+
+
+def pool_initializer(import_heavy=False, decoded_image_cache=0):
+    """Выполняется в каждом процессе пула при его запуске: кэш раскодированных фотографий и прогрев"""
+    decoded_images.global_init(decoded_image_cache)
+    if import_heavy:
+        import_modules(POOL_MODULES)
+
+
+async def _warm_up(modules):
+    try:
+        workers.prestart()
+        elapsed = await asyncio.to_thread(import_modules, modules)
+        logger.info("Прогрев завершён: процессы пула запущены, модули загружены за %.2f с", elapsed)
+    except Exception:
+        logger.exception("Не удалось выполнить прогрев")
+
+
+def start(modules=BOT_MODULES):
+    global __task
+
+    if __task:
+        return
+
+    __task = asyncio.create_task(_warm_up(modules))
+
+
+async def stop():
+    global __task
+    if __task:
+        __task.cancel()
+        try:
+            await __task
+        except asyncio.CancelledError:
+            pass
+        __task = None
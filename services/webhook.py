@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import signal
+import time
+
+from aiohttp import web
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+# Приём обновлений через вебхук: aiohttp-сервер кладёт обновления в application.update_queue,
+# а обрабатывает их уже само приложение (с заданным concurrent_updates).
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+class WebhookServer:
+    def __init__(self, application, listen, port, path, secret_token=None):
+        self.application = application
+        self.listen = listen
+        self.port = port
+        self.path = path
+        self.secret_token = secret_token
+        self.ready = False
+        self.draining = False
+        self.received = 0
+        self.rejected = 0
+        self._runner = None
+
+        self.app = web.Application()
+        self.app.router.add_post(path, self.handle_update)
+        self.app.router.add_get('/healthz', self.healthz)
+        self.app.router.add_get('/readyz', self.readyz)
+
+    async def handle_update(self, request):
+        if self.secret_token and request.headers.get(SECRET_HEADER) != self.secret_token:
+            return web.Response(status=403)
+        if not self.ready:
+            # Telegram повторит доставку позже — обновление достанется следующему экземпляру
+            self.rejected += 1
+            return web.Response(status=503)
+        try:
+            update = Update.de_json(await request.json(), self.application.bot)
+        except Exception as e:
+            logger.warning("Некорректное обновление: %s", e)
+            return web.Response(status=400)
+        self.received += 1
+        await self.application.update_queue.put(update)
+        return web.Response()
+
+    async def healthz(self, request):
+        return web.json_response({'status': 'ok'})
+
+    async def readyz(self, request):
+        body = self.stats()
+        return web.json_response(body, status=200 if self.ready else 503)
+
+    def in_flight(self):
+        processor = self.application.update_processor
+        pending = getattr(processor, 'pending', processor.current_concurrent_updates)
+        return self.application.update_queue.qsize() + pending
+
+    def stats(self):
+        return {
+            'ready': self.ready,
+            'draining': self.draining,
+            'received': self.received,
+            'rejected': self.rejected,
+            'queue_depth': self.application.update_queue.qsize(),
+            'in_flight': self.in_flight(),
+        }
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.listen, self.port).start()
+        self.ready = True
+
+    async def drain(self, timeout):
+        """Перестаёт принимать обновления и ждёт, пока принятые будут обработаны"""
+        self.ready = False
+        self.draining = True
+        deadline = time.monotonic() + timeout
+        while self.in_flight() and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        if self.in_flight():
+            logger.warning("Не дождались обработки %s обновлений за %s с", self.in_flight(), timeout)
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def serve(application, listen, port, path, webhook_url=None, secret_token=None, drain_timeout=30.0,
+                stop_event=None):
+    """Запускает приложение в режиме вебхука до SIGINT/SIGTERM (или stop_event), затем корректно завершает работу"""
+    stop_event = stop_event or asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            # Windows: остаётся KeyboardInterrupt, завершение выполнит finally
+            pass
+
+    server = WebhookServer(application, listen, port, path, secret_token)
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        if webhook_url:
+            await application.bot.set_webhook(url=webhook_url.rstrip('/') + path, secret_token=secret_token,
+                                              allowed_updates=Update.ALL_TYPES)
+        await application.start()
+        await server.start()
+        logger.info("Вебхук слушает %s:%s%s", listen, port, path)
+        try:
+            await stop_event.wait()
+        finally:
+            await server.drain(drain_timeout)
+            await server.stop()
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+    finally:
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
@@ -0,0 +1,198 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+BUSY_MESSAGE = "Сервер сейчас перегружен, очередь заполнена. Попробуйте чуть позже. ⏳"
+
+__pool = None
+__max_workers = 0
+__queue_limit = 0
+__in_flight = 0
+__running = 0
+__stats = {}
+
+# Справедливая очередь к пулу: задача получает метку finish = start + стоимость, где start —
+# не раньше окончания предыдущей задачи того же пользователя. Первой в пул идёт задача с меньшей
+# меткой, поэтому пользователь с десятком тяжёлых задач не задерживает чужие лёгкие.
+__task_costs = {}
+__waiting = []  # куча (finish, порядковый номер, start, future)
+__virtual_time = 0.0
+__last_finish = {}  # пользователь -> метка finish его последней задачи
+__sequence = itertools.count()
+
+# Чья задача выполняется: задаётся при обработке обновления (Telegram id) или задачи worker.py
+current_user = contextvars.ContextVar('current_user', default=None)
+
+
+class PoolSaturatedError(Exception):
+    """Все места в очереди пула заняты — задачу нужно отклонить"""
+
+
+class TaskStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.run_total = 0.0
+        self.run_max = 0.0
+
+    def record(self, wait, run):
+        self.count += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self.run_total += run
+        self.run_max = max(self.run_max, run)
+
+    def as_dict(self):
+        count = self.count or 1
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'rejected': self.rejected,
+            'wait_avg': self.wait_total / count,
+            'wait_max': self.wait_max,
+            'run_avg': self.run_total / count,
+            'run_max': self.run_max,
+        }
+
+
+def global_init(max_workers, queue_limit, task_costs=None, initializer=None, initargs=()):
+    global __pool, __max_workers, __queue_limit, __task_costs
+
+    if __pool:
+        return
+
+    if max_workers < 1 or queue_limit < max_workers:
+        raise Exception("Размер очереди пула должен быть не меньше числа процессов.")
+
+    # spawn не копирует потоки и сокеты бота в дочерние процессы
+    __pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=initializer, initargs=initargs)
+    __max_workers, __queue_limit = max_workers, queue_limit
+    __task_costs = dict(task_costs or {})
+
+
+def prestart():
+    """Запускает все процессы пула сразу, а не по мере поступления первых задач"""
+    # Пока ни один процесс не свободен, каждая отправленная задача поднимает новый
+    for _ in range(__max_workers):
+        __pool.submit(int)
+
+
+def shutdown():
+    global __pool, __running, __virtual_time
+    if __pool:
+        __pool.shutdown(wait=True, cancel_futures=True)
+        __pool = None
+    # Очередь к пулу начинается заново при следующем global_init
+    __running, __virtual_time = 0, 0.0
+    __waiting.clear()
+    __last_finish.clear()
+
+
+def _timed_call(func, args):
+    # Выполняется в дочернем процессе; time.time() сопоставимо между процессами
+    started = time.time()
+    result = func(*args)
+    return started, time.time(), result
+
+
+async def _acquire_slot(func):
+    global __running, __virtual_time
+    if __running < __max_workers and not __waiting:
+        __running += 1
+        return
+
+    user = current_user.get()
+    start = max(__virtual_time, __last_finish.get(user, 0.0))
+    finish = __last_finish[user] = start + __task_costs.get(func.__name__, 1)
+    future = asyncio.get_running_loop().create_future()
+    entry = (finish, next(__sequence), start, future)
+    heapq.heappush(__waiting, entry)
+    try:
+        await future
+    except asyncio.CancelledError:
+        if future.cancelled():
+            # _release_slot мог уже снять отменённую запись с кучи и пропустить её
+            try:
+                __waiting.remove(entry)
+                heapq.heapify(__waiting)
+            except ValueError:
+                pass
+        else:
+            # Место уже передано этой задаче — возвращаем его следующей
+            _release_slot()
+        raise
+
+
+def _release_slot():
+    global __running, __virtual_time
+    # Освободившееся место сразу передаётся следующей по очереди задаче
+    while __waiting:
+        _, _, start, future = heapq.heappop(__waiting)
+        if future.done():
+            continue  # Ожидание отменено, но задача ещё не успела убрать свою запись
+        __virtual_time = start
+        future.set_result(None)
+        return
+    __running -= 1
+    if not __running:
+        __last_finish.clear()
+        __virtual_time = 0.0
+
+
+async def run(func, *args):
+    """Выполняет func(*args) в пуле процессов, не блокируя цикл событий.
+
+    Если в пуле уже queue_limit незавершённых задач, бросает PoolSaturatedError.
+    Места в пуле распределяются между пользователями (current_user) с учётом стоимости задач.
+    """
+    global __in_flight
+    if __pool is None:
+        raise Exception("Пул процессов не инициализирован.")
+
+    task_stats = __stats.setdefault(func.__name__, TaskStats())
+    if __in_flight >= __queue_limit:
+        task_stats.rejected += 1
+        raise PoolSaturatedError(func.__name__)
+
+    __in_flight += 1
+    submitted = time.time()
+    try:
+        await _acquire_slot(func)
+        try:
+            loop = asyncio.get_running_loop()
+            started, finished, result = await loop.run_in_executor(__pool, _timed_call, func, args)
+        finally:
+            _release_slot()
+    except Exception:
+        task_stats.errors += 1
+        raise
+    finally:
+        __in_flight -= 1
+
+    wait, run_time = started - submitted, finished - started
+    task_stats.record(wait, run_time)
+    logger.info("Задача %s: ожидание %.3f с, выполнение %.3f с, в работе %d/%d",
+                func.__name__, wait, run_time, __in_flight, __queue_limit)
+    return result
+
+
+def stats():
+    """Метрики пула: общая загрузка и время ожидания/выполнения по типам задач"""
+    return {
+        'in_flight': __in_flight,
+        'running': __running,
+        'waiting': len(__waiting),
+        'queue_limit': __queue_limit,
+        'tasks': {name: task_stats.as_dict() for name, task_stats in __stats.items()},
+    }
@@ -0,0 +1,18 @@
+import pytest
+from sqlalchemy import delete
+
+from data import db_session
+
+
+@pytest.fixture(scope='session')
+def database(tmp_path_factory):
+    # global_init срабатывает один раз на процесс, поэтому БД общая для всех тестов
+    db_session.global_init(str(tmp_path_factory.mktemp('db') / 'test.db'))
+
+
+@pytest.fixture
+def db(database):
+    yield
+    with db_session.session_scope() as db_sess:
+        for table in reversed(db_session.SqlAlchemyBase.metadata.sorted_tables):
+            db_sess.execute(delete(table))
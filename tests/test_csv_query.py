@@ -0,0 +1,120 @@
+import io
+
+import pandas as pd
+import pyarrow.csv as pa_csv
+import pytest
+
+from services import csv_query
+from services.csv_query import QueryEngine, QueryError, parse
+
+CSV = b"""date,city,amount,price
+2024-01-10,Moscow,5,1.5
+2024-01-25,Kazan,50,10
+2024-02-03,Perm,7,
+,Omsk,30,3
+"""
+
+
+@pytest.fixture
+def engine():
+    # Как в csv_sessions: CSV читает pyarrow, столбец даты становится date32
+    return QueryEngine(pa_csv.read_csv(io.BytesIO(CSV)).to_pandas())
+
+
+def run(engine, text):
+    return engine.run(parse(text))
+
+
+def test_parse_full_query():
+    query = parse('where price > 10 and city = "Нижний Новгород" group by city sum amount '
+                  'sort by amount desc limit 5 csv')
+    assert query.conditions == (('price', '>', '10'), ('city', '=', 'Нижний Новгород'))
+    assert (query.group_by, query.aggregation, query.aggregate_column) == ('city', 'sum', 'amount')
+    assert (query.sort_by, query.descending, query.limit, query.as_csv) == ('amount', True, 5, True)
+
+
+@pytest.mark.parametrize('text', ['where price', 'where price ~ 1', 'limit ten', 'group by city median price',
+                                  'group by city sum', 'select *', 'where city = "unclosed'])
+def test_parse_errors(text):
+    with pytest.raises(QueryError):
+        parse(text)
+
+
+def test_numeric_filter(engine):
+    assert list(run(engine, 'where amount >= 7')['city']) == ['Kazan', 'Perm', 'Omsk']
+
+
+def test_numeric_filter_rejects_text(engine):
+    with pytest.raises(QueryError):
+        run(engine, 'where amount > many')
+
+
+def test_string_filter(engine):
+    assert list(run(engine, 'where city = Perm')['amount']) == [7]
+    assert list(run(engine, 'where city > N')['city']) == ['Perm', 'Omsk']
+    assert list(run(engine, 'where city contains AZ')['city']) == ['Kazan']
+
+
+def test_date_filter(engine):
+    assert list(run(engine, 'where date > 2024-01-20')['city']) == ['Kazan', 'Perm']
+    assert list(run(engine, 'where date = 2024-01-10')['city']) == ['Moscow']
+
+
+def test_date_filter_rejects_text(engine):
+    with pytest.raises(QueryError):
+        run(engine, 'where date > yesterday')
+
+
+def test_incomparable_column_raises_query_error():
+    engine = QueryEngine(pd.DataFrame({'mixed': [1, 'a', 2.5]}))
+    with pytest.raises(QueryError):
+        run(engine, 'where mixed > 1')
+
+
+def test_unknown_column(engine):
+    with pytest.raises(QueryError):
+        run(engine, 'where missing = 1')
+
+
+def test_sort_and_limit(engine):
+    assert list(run(engine, 'sort by amount desc limit 2')['amount']) == [50, 30]
+    # Пропуски при сортировке идут в конец
+    assert list(run(engine, 'sort by price')['city']) == ['Moscow', 'Omsk', 'Kazan', 'Perm']
+
+
+def test_group_by(engine):
+    result = run(engine, 'where amount > 5 group by city count sort by city')
+    assert list(result['city']) == ['Kazan', 'Omsk', 'Perm']
+    assert list(result['count']) == [1, 1, 1]
+    assert run(engine, 'group by city sum amount')['amount'].sum() == 92
+
+
+def test_results_are_cached(engine):
+    first = run(engine, 'where amount > 5')
+    assert run(engine, 'where amount > 5 csv') is first
+    assert engine.nbytes >= first.memory_usage(deep=True).sum()
+
+
+def test_result_cache_is_bounded_by_bytes():
+    frame = pd.DataFrame({'value': range(1000)})
+    engine = QueryEngine(frame, max_cache_bytes=frame.memory_usage(deep=True).sum())
+    run(engine, 'where value >= 0')
+    run(engine, 'where value < 500')
+    # Полная копия и половина не помещаются в бюджет — самый старый результат вытеснен
+    assert len(engine.results) == 1 and engine.nbytes <= engine.max_cache_bytes
+
+
+def test_render_table_truncates():
+    frame = pd.DataFrame({'value': range(200)})
+    text = csv_query.render_table(frame, limit=10)
+    assert text.startswith('<pre>') and 'Показано 10 из 200' in text
+
+
+def test_render_table_does_not_split_html_entities():
+    frame = pd.DataFrame({'value': ['&<' * 50]})
+    for max_chars in range(105, 125):
+        text = csv_query.render_table(frame, max_chars=max_chars)
+        body = text[len('<pre>'):text.index('</pre>')]
+        assert len(body) <= max_chars
+        assert body.replace('&amp;', '').replace('&lt;', '').count('&') == 0
+        assert not body.endswith(('&', '&a', '&am', '&amp', '&l', '&lt'))
@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+from services import csv_query, csv_sessions
+
+
+@pytest.fixture(scope='module', autouse=True)
+def sessions(tmp_path_factory):
+    csv_sessions.global_init(str(tmp_path_factory.mktemp('csv')), 600, 86400, 10 ** 9)
+
+
+def write_csv(path, rows):
+    path.write_text('value,name\n' + ''.join(f'{i},row{i}\n' for i in range(rows)))
+    return str(path)
+
+
+def test_query_results_count_towards_session_memory(tmp_path):
+    async def scenario():
+        await csv_sessions.ingest(1, write_csv(tmp_path / 'a.csv', 1000))
+        session = await csv_sessions.get(1)
+        loaded = session.nbytes
+        result = await csv_sessions.run_query(session, csv_query.parse('where value >= 0'))
+        assert session.nbytes >= loaded + result.memory_usage(deep=True).sum()
+        assert csv_sessions.stats()['memory_bytes'] == session.nbytes
+        csv_sessions.drop(1)
+
+    asyncio.run(scenario())
+
+
+def test_empty_csv_is_rejected(tmp_path):
+    path = tmp_path / 'empty.csv'
+    path.write_text('')
+    with pytest.raises(csv_sessions.EmptyCsvError):
+        asyncio.run(csv_sessions.ingest(2, str(path)))
+
+
+def test_files_of_previous_run_are_removed_at_startup(tmp_path, monkeypatch):
+    (tmp_path / '1.parquet').write_bytes(b'old')
+    (tmp_path / '2.parquet.part').write_bytes(b'old')
+    (tmp_path / 'notes.txt').write_text('keep')
+    monkeypatch.setattr(csv_sessions, '__directory', None)
+    csv_sessions.global_init(str(tmp_path), 600, 86400, 10 ** 9)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['notes.txt']
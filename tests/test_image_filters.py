@@ -0,0 +1,50 @@
+import io
+
+import pytest
+from PIL import Image
+
+from services import decoded_images
+from services.image_filters import FILTERS, render_filter, render_previews
+
+
+@pytest.fixture(autouse=True)
+def cache():
+    decoded_images.global_init(10 * 1024 * 1024)
+
+
+def photo_bytes(color=(200, 100, 50)):
+    output = io.BytesIO()
+    Image.new('RGB', (64, 48), color).save(output, format='PNG')
+    return output.getvalue()
+
+
+def test_previews_cover_every_filter():
+    previews = render_previews(photo_bytes(), max_side=16)
+    assert [name for name, _ in previews] == list(FILTERS)
+    assert all(Image.open(io.BytesIO(preview)).size == (16, 12) for _, preview in previews)
+
+
+def test_render_filter_reuses_pixels_decoded_for_preview(monkeypatch):
+    source = photo_bytes()
+    render_previews(source, 'photo-1')
+    expected = render_filter(source, 'Негатив', 'png')
+
+    def fail(*args, **kwargs):
+        raise AssertionError("файл не должен разбираться повторно")
+
+    monkeypatch.setattr(Image, 'open', fail)
+    assert render_filter(source, 'Негатив', 'png', 'photo-1') == expected
+
+
+def test_negative_filter_inverts_colors():
+    output = render_filter(photo_bytes(), 'Негатив', 'png')
+    assert Image.open(io.BytesIO(output)).getpixel((0, 0)) == (55, 155, 205)
+
+
+def test_decoded_cache_evicts_least_recently_used():
+    decoded_images.global_init(2 * 64 * 48 * 3)
+    for key in ('a', 'b', 'c'):
+        decoded_images.put(key, Image.new('RGB', (64, 48)))
+    assert decoded_images.get('a') is None
+    assert decoded_images.get('c') is not None
+    assert decoded_images.stats()['bytes'] <= 2 * 64 * 48 * 3
@@ -0,0 +1,136 @@
+import time
+
+import pytest
+from sqlalchemy import update
+
+from data import db_session
+from data.jobs import QueuedJob
+from services import job_queue
+
+
+@pytest.fixture
+def queue(db):
+    return job_queue.SqliteJobQueue(max_attempts=2, max_running_per_user=1)
+
+
+def expire_lease(job_id):
+    with db_session.session_scope() as db_sess:
+        db_sess.execute(update(QueuedJob).where(QueuedJob.id == job_id).values(locked_until=time.time() - 1))
+
+
+def make_available(job_id):
+    with db_session.session_scope() as db_sess:
+        db_sess.execute(update(QueuedJob).where(QueuedJob.id == job_id).values(available_at=time.time() - 1))
+
+
+def test_claim_returns_payload_and_counts_attempt(queue):
+    job_id = queue.enqueue('merge', 1, {'chat_id': 10, 'paths': ['a.pdf']})
+    job = queue.claim('w1', 60)
+    assert job == job_queue.Job(job_id, 'merge', 1, {'chat_id': 10, 'paths': ['a.pdf']}, 1, 2)
+    assert queue.claim('w2', 60) is None
+    assert queue.complete(job_id, 'w1')
+    assert queue.stats() == {'done': 1}
+
+
+def test_one_running_job_per_user_and_others_go_first(queue):
+    first = queue.enqueue('merge', 1, {})
+    queue.enqueue('merge', 1, {})
+    other = queue.enqueue('merge', 2, {})
+    assert queue.claim('w1', 60).id == first
+    # Вторая задача пользователя 1 ждёт, пока выполняется первая
+    assert queue.claim('w2', 60).id == other
+    assert queue.claim('w3', 60) is None
+
+
+def test_failed_job_is_retried_after_delay_then_fails(queue):
+    job_id = queue.enqueue('extract', 1, {})
+    job = queue.claim('w1', 60)
+    assert queue.fail(job_id, 'w1', job.attempts, job.max_attempts, 'boom') == 'queued'
+    assert queue.claim('w1', 60) is None
+    make_available(job_id)
+    job = queue.claim('w1', 60)
+    assert job.attempts == 2
+    assert queue.fail(job_id, 'w1', job.attempts, job.max_attempts, 'boom') == 'failed'
+    assert queue.stats() == {'failed': 1}
+
+
+def test_expired_lease_moves_job_to_another_worker(queue):
+    job_id = queue.enqueue('merge', 1, {})
+    queue.claim('w1', 60)
+    expire_lease(job_id)
+    assert queue.claim('w2', 60).id == job_id
+    # Прежний владелец больше не может ни продлить, ни завершить задачу
+    assert not queue.extend(job_id, 'w1', 60)
+    assert not queue.complete(job_id, 'w1')
+    assert queue.fail(job_id, 'w1', 1, 2, 'late') is None
+    assert queue.complete(job_id, 'w2')
+
+
+def test_retry_sees_saved_progress(queue):
+    job_id = queue.enqueue('extract', 1, {'pdfs': ['a', 'b']})
+    job = queue.claim('w1', 60)
+    assert queue.save_payload(job_id, 'w1', {**job.payload, 'done': 1})
+    assert not queue.save_payload(job_id, 'w2', {'pdfs': []})
+    queue.fail(job_id, 'w1', job.attempts, job.max_attempts, 'boom')
+    make_available(job_id)
+    assert queue.claim('w2', 60).payload == {'pdfs': ['a', 'b'], 'done': 1}
+
+
+def test_expired_lease_without_attempts_left_fails(queue):
+    job_id = queue.enqueue('merge', 1, {})
+    queue.claim('w1', 60)
+    expire_lease(job_id)
+    queue.claim('w2', 60)
+    expire_lease(job_id)
+    assert queue.claim('w3', 60) is None
+    assert queue.stats() == {'failed': 1}
+
+
+@pytest.fixture
+def redis_queue():
+    fakeredis = pytest.importorskip('fakeredis')
+    return job_queue.RedisJobQueue(fakeredis.FakeRedis(decode_responses=True), max_attempts=2,
+                                   max_running_per_user=1)
+
+
+def test_redis_claim_respects_running_limit_per_user(redis_queue):
+    first = redis_queue.enqueue('merge', 1, {'chat_id': 10})
+    redis_queue.enqueue('merge', 1, {})
+    other = redis_queue.enqueue('merge', 2, {})
+    assert redis_queue.claim('w1', 60) == job_queue.Job(first, 'merge', 1, {'chat_id': 10}, 1, 2)
+    assert redis_queue.claim('w2', 60).id == other
+    assert redis_queue.claim('w3', 60) is None
+    assert redis_queue.complete(first, 'w1')
+    assert redis_queue.claim('w3', 60).user_id == 1
+
+
+def test_redis_failed_job_is_retried_then_fails(redis_queue):
+    job_id = redis_queue.enqueue('extract', 1, {})
+    job = redis_queue.claim('w1', 60)
+    assert redis_queue.fail(job_id, 'w1', job.attempts, job.max_attempts, 'boom') == 'queued'
+    assert redis_queue.claim('w1', 60) is None
+    redis_queue.client.zadd('jobs:delayed', {job_id: 0})
+    job = redis_queue.claim('w1', 60)
+    assert job.attempts == 2
+    assert redis_queue.fail(job_id, 'w1', job.attempts, job.max_attempts, 'boom') == 'failed'
+    assert redis_queue.client.hget(f'jobs:job:{job_id}', 'status') == 'failed'
+
+
+def test_redis_expired_lease_moves_job_to_another_worker(redis_queue):
+    job_id = redis_queue.enqueue('merge', 1, {})
+    redis_queue.claim('w1', -1)
+    assert redis_queue.claim('w2', 60).id == job_id
+    assert not redis_queue.extend(job_id, 'w1', 60)
+    assert not redis_queue.complete(job_id, 'w1')
+    assert redis_queue.fail(job_id, 'w1', 1, 2, 'late') is None
+    assert redis_queue.extend(job_id, 'w2', 60)
+    assert redis_queue.complete(job_id, 'w2')
+    assert redis_queue.stats() == {'users': 0, 'running': 0, 'delayed': 0}
+
+
+def test_redis_retry_sees_saved_progress(redis_queue):
+    job_id = redis_queue.enqueue('extract', 1, {'pdfs': ['a', 'b']})
+    redis_queue.claim('w1', -1)
+    assert not redis_queue.save_payload(job_id, 'w2', {'pdfs': []})
+    assert redis_queue.save_payload(job_id, 'w1', {'pdfs': ['a', 'b'], 'done': 1})
+    assert redis_queue.claim('w2', 60).payload == {'pdfs': ['a', 'b'], 'done': 1}
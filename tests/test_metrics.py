@@ -0,0 +1,49 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from telegram.request import RequestData
+
+from services import metrics
+
+
+@pytest.fixture
+def request_object(monkeypatch):
+    async def fake_do_request(self, url, method, request_data=None, *args, **kwargs):
+        return 200, b'{"ok":true,"result":true}'
+
+    monkeypatch.setattr(metrics.HTTPXRequest, 'do_request', fake_do_request)
+    # Сеть не нужна: подменяется только отправка запроса в базовом классе
+    return metrics.MeteredRequest()
+
+
+def test_bytes_are_labelled_with_current_handler(request_object):
+    async def handler(update, context):
+        await request_object.do_request('https://api.telegram.org/bot123:abc/sendMessage', 'POST',
+                                        RequestData())
+        await request_object.do_request('https://api.telegram.org/file/bot123:abc/photos/a.jpg', 'GET')
+
+    asyncio.run(metrics.instrument(handler, name='metered_test')(SimpleNamespace(update_id=1), None))
+    text = metrics.render()
+    assert 'bot_api_requests_total{handler="metered_test",method="sendMessage"} 1' in text
+    assert 'bot_api_bytes_in_total{handler="metered_test",method="file"} 25' in text
+    assert 'bot123' not in text
+    assert 'bot_handler_latency_seconds_count{handler="metered_test"} 1' in text
+
+
+def test_handler_errors_are_counted():
+    async def failing(update, context):
+        raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(metrics.instrument(failing, name='failing_test')(SimpleNamespace(), None))
+    assert 'bot_handler_errors_total{handler="failing_test"} 1' in metrics.render()
+    assert metrics.current_handler.get() is None
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram((1, 2))
+    for value in (0.5, 1.5, 5):
+        histogram.observe(value)
+    assert histogram.render('h') == ['h_bucket{le="1"} 1', 'h_bucket{le="2"} 2', 'h_bucket{le="+Inf"} 3',
+                                     'h_sum 7.0', 'h_count 3']
@@ -0,0 +1,69 @@
+import asyncio
+import copy
+import os
+import pickle
+
+import fitz
+import pytest
+
+from services import workers
+from services.pdf_merge import MergeSession
+
+
+@pytest.fixture(autouse=True)
+def pool():
+    workers.global_init(2, 10)
+    yield
+    workers.shutdown()
+
+
+def make_pdf(path, pages):
+    with fitz.open() as document:
+        for _ in range(pages):
+            document.new_page()
+        document.save(path)
+
+
+def add_pdf(session, pages):
+    path = session.next_path()
+    make_pdf(path, pages)
+    session.add(path)
+
+
+def test_deepcopy_between_uploads_keeps_merged_pages(tmp_path):
+    async def scenario():
+        session = MergeSession(str(tmp_path))
+        for pages in (2, 3, 4):
+            add_pdf(session, pages)
+            await session._task
+            # Так PTB снимает копию chat_data перед сохранением
+            copy.deepcopy(session)
+        assert await session.finish() == 9
+        session.close()
+
+    asyncio.run(scenario())
+
+
+def test_restored_session_rebuilds_work_document(tmp_path):
+    async def scenario():
+        session = MergeSession(str(tmp_path))
+        for pages in (2, 3):
+            add_pdf(session, pages)
+        await session._task
+        restored = pickle.loads(pickle.dumps(session))
+        add_pdf(restored, 4)
+        assert await restored.finish() == 9
+        restored.close()
+
+    asyncio.run(scenario())
+
+
+
+def test_add_without_merge_only_stores_paths(tmp_path):
+    session = MergeSession(str(tmp_path))
+    path = session.next_path()
+    make_pdf(path, 2)
+    session.add(path, merge=False)
+    assert session._task is None and not os.path.exists(session.work_path)
+    assert session.detach() == (session.directory, [path])
+    session.close()
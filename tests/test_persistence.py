@@ -0,0 +1,85 @@
+import asyncio
+import os
+
+import pytest
+
+from services.persistence import BLOB_MIN_SIZE, SqlitePersistence
+
+
+@pytest.fixture
+def spool_dir(db, tmp_path):
+    return str(tmp_path / 'spool')
+
+
+def test_round_trip_keeps_large_bytes_in_spool(spool_dir):
+    photo = os.urandom(BLOB_MIN_SIZE * 4)
+    user_data = {'state': 'image_filter_waiting', 'photos_to_filter': [(bytearray(photo), 'jpg', 'u1')]}
+
+    async def scenario():
+        persistence = SqlitePersistence(spool_dir, write_delay=60)
+        await persistence.update_user_data(1, user_data)
+        await persistence.update_chat_data(5, {'note': b'small'})
+        await persistence.flush()
+        restored = SqlitePersistence(spool_dir)
+        return await restored.get_user_data(), await restored.get_chat_data()
+
+    users, chats = asyncio.run(scenario())
+    assert users == {1: user_data}
+    assert type(users[1]['photos_to_filter'][0][0]) is bytearray
+    assert chats == {5: {'note': b'small'}}
+    assert len(os.listdir(spool_dir)) == 1
+
+
+def test_latest_data_is_written_and_dropped_data_removed(spool_dir):
+    user_data = {'state': 'pdf_merge'}
+
+    async def scenario():
+        persistence = SqlitePersistence(spool_dir, write_delay=60)
+        await persistence.update_user_data(1, user_data)
+        # Сериализуется то, что в словаре на момент записи, а не на момент пометки
+        user_data['blob'] = os.urandom(BLOB_MIN_SIZE)
+        await persistence.update_user_data(2, {'state': None})
+        await persistence.flush()
+        await persistence.drop_user_data(2)
+        await persistence.flush()
+        return await SqlitePersistence(spool_dir).get_user_data()
+
+    assert asyncio.run(scenario()) == {1: user_data}
+
+
+def test_unreferenced_blobs_are_removed(spool_dir):
+    async def scenario():
+        persistence = SqlitePersistence(spool_dir, write_delay=60)
+        await persistence.update_user_data(1, {'file': os.urandom(BLOB_MIN_SIZE)})
+        await persistence.flush()
+        assert len(os.listdir(spool_dir)) == 1
+        await persistence.update_user_data(1, {'file': None})
+        await persistence.flush()
+
+    asyncio.run(scenario())
+    assert os.listdir(spool_dir) == []
+
+
+class ChangedDuringPickling:
+    calls = 0
+
+    def __reduce__(self):
+        ChangedDuringPickling.calls += 1
+        if ChangedDuringPickling.calls == 1:
+            raise RuntimeError('dictionary changed size during iteration')
+        return ChangedDuringPickling, ()
+
+    def __eq__(self, other):
+        return isinstance(other, ChangedDuringPickling)
+
+
+def test_data_changed_during_write_is_written_next_time(spool_dir):
+    async def scenario():
+        persistence = SqlitePersistence(spool_dir, write_delay=60)
+        await persistence.update_user_data(1, {'value': ChangedDuringPickling()})
+        await persistence.flush()
+        assert await SqlitePersistence(spool_dir).get_user_data() == {}
+        await persistence.flush()
+        return await SqlitePersistence(spool_dir).get_user_data()
+
+    assert asyncio.run(scenario()) == {1: {'value': ChangedDuringPickling()}}
@@ -0,0 +1,65 @@
+import pytest
+
+from services import rate_limit
+
+
+@pytest.fixture(autouse=True)
+def limits():
+    rate_limit.configure({'merge': (2, 60)}, max_buckets=2)
+
+
+def test_unlimited_operation_is_always_allowed():
+    assert all(rate_limit.acquire(1, 'other', now=0).allowed for _ in range(100))
+
+
+def test_bucket_empties_and_reports_retry_after():
+    assert rate_limit.acquire(1, 'merge', now=0).allowed
+    assert rate_limit.acquire(1, 'merge', now=0).allowed
+    decision = rate_limit.acquire(1, 'merge', now=0)
+    assert not decision.allowed and decision.first
+    # Жетон появляется раз в 30 секунд
+    assert decision.retry_after == 30
+    again = rate_limit.acquire(1, 'merge', now=10)
+    assert not again.allowed and not again.first and again.retry_after == 20
+
+
+def test_bucket_refills_over_time():
+    for _ in range(2):
+        rate_limit.acquire(1, 'merge', now=0)
+    assert not rate_limit.acquire(1, 'merge', now=0).allowed
+    assert rate_limit.acquire(1, 'merge', now=30).allowed
+    assert not rate_limit.acquire(1, 'merge', now=30).allowed
+    assert rate_limit.acquire(1, 'merge', now=30).first is False
+    assert rate_limit.acquire(1, 'merge', now=60).allowed
+    # Новая серия отказов снова сообщается пользователю
+    assert rate_limit.acquire(1, 'merge', now=60).first is True
+
+
+def test_users_have_separate_buckets():
+    for _ in range(2):
+        rate_limit.acquire(1, 'merge', now=0)
+    assert not rate_limit.acquire(1, 'merge', now=0).allowed
+    assert rate_limit.acquire(2, 'merge', now=0).allowed
+
+
+def test_full_buckets_are_pruned_at_capacity():
+    rate_limit.acquire(1, 'merge', now=0)
+    rate_limit.acquire(2, 'merge', now=0)
+    assert rate_limit.stats()['buckets'] == 2
+    # К этому моменту оба ведра снова полные и забываются
+    rate_limit.acquire(3, 'merge', now=100)
+    assert rate_limit.stats()['buckets'] == 1
+
+
+
+def test_throttled_buckets_are_evicted_oldest_first_at_capacity():
+    for _ in range(3):
+        rate_limit.acquire(1, 'merge', now=0)
+    for _ in range(3):
+        rate_limit.acquire(2, 'merge', now=1)
+    # Оба ведра пусты и полными не стали, но число вёдер не должно превысить max_buckets
+    assert rate_limit.acquire(3, 'merge', now=2).allowed
+    assert rate_limit.stats()['buckets'] == 2
+    # Забыто ведро пользователя 1, дольше всех не обращавшегося, а пользователь 2 по-прежнему ограничен
+    assert not rate_limit.acquire(2, 'merge', now=2).allowed
+    assert rate_limit.acquire(1, 'merge', now=2).allowed
@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+from services import result_cache
+
+
+@pytest.fixture(autouse=True)
+def cache(db):
+    result_cache.global_init(3)
+
+
+def test_key_depends_on_source_operation_and_params():
+    source = result_cache.source_id('abc')
+    assert source == 'tg:abc'
+    assert result_cache.source_id(data=b'x').startswith('sha256:')
+    assert result_cache.make_key(source, 'convert', 'png') != result_cache.make_key(source, 'convert', 'jpg')
+    assert result_cache.make_key(source, 'convert', 'png') == result_cache.make_key(source, 'convert', 'png')
+
+
+def test_put_then_get_counts_hits_and_misses():
+    async def scenario():
+        assert await result_cache.get('k', 'convert') is None
+        await result_cache.put('k', file_id='f1')
+        assert await result_cache.get('k', 'convert') == {'file_id': 'f1'}
+        await result_cache.put('k', file_id='f2')
+        assert await result_cache.get('k', 'convert') == {'file_id': 'f2'}
+
+    asyncio.run(scenario())
+    counters = result_cache.stats()['operations']['convert']
+    assert counters['hits'] >= 2 and counters['misses'] >= 1
+
+
+def test_least_recently_used_entries_are_evicted():
+    async def scenario():
+        for key in ('a', 'b', 'c'):
+            await result_cache.put(key, file_id=key)
+        # Обращение к «a» делает самой старой запись «b»
+        await result_cache.get('a', 'filter')
+        await result_cache.put('d', file_id='d')
+        return [await result_cache.get(key, 'filter') is not None for key in ('a', 'b', 'c', 'd')]
+
+    assert asyncio.run(scenario()) == [True, False, True, True]
+    assert result_cache.stats()['entries'] == 3
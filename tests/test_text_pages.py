@@ -0,0 +1,65 @@
+import json
+import os
+import time
+
+import pytest
+
+from services import text_pages
+
+
+@pytest.fixture(scope='module', autouse=True)
+def spool(tmp_path_factory):
+    text_pages.global_init(str(tmp_path_factory.mktemp('text_pages')), 60)
+
+
+def write(tmp_path, content: bytes, name='input'):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_detect_encoding(tmp_path):
+    assert text_pages.detect_encoding(write(tmp_path, 'привет'.encode('utf-8'))) == 'utf-8'
+    assert text_pages.detect_encoding(write(tmp_path, 'привет'.encode('cp1251'))) == 'cp1251'
+    assert text_pages.detect_encoding(write(tmp_path, 'привет'.encode('utf-8-sig'))) == 'utf-8-sig'
+
+
+def test_pages_split_on_lines_and_cover_whole_file(tmp_path):
+    lines = ''.join(f'строка {i}\n' for i in range(100))
+    path = write(tmp_path, lines.encode('utf-8'))
+    offsets = text_pages.build_page_index(path, page_size=100)
+    document = text_pages.TextDocument(path, offsets)
+    pages = [document.read_page(number) for number in range(document.page_count)]
+    assert ''.join(pages) == lines
+    assert all(len(page) <= 100 and page.endswith('\n') for page in pages)
+
+
+def test_long_line_is_cut_by_characters(tmp_path):
+    path = write(tmp_path, ('я' * 250).encode('utf-8'))
+    document = text_pages.TextDocument(path, text_pages.build_page_index(path, page_size=100))
+    assert [len(document.read_page(number)) for number in range(document.page_count)] == [100, 100, 50]
+
+
+def test_open_text_transcodes_to_utf8(tmp_path):
+    document = text_pages.open_text(write(tmp_path, 'Привет, мир\n'.encode('cp1251')))
+    assert document.read_page(0) == 'Привет, мир\n'
+    document.close()
+    assert not os.path.exists(document.path)
+
+
+def test_open_json_is_pretty_printed(tmp_path):
+    document = text_pages.open_json(write(tmp_path, json.dumps({'ключ': [1, 2]}, ensure_ascii=False).encode()))
+    assert json.loads(document.read_page(0)) == {'ключ': [1, 2]}
+    assert '    ' in document.read_page(0)
+    document.close()
+
+
+def test_sweep_removes_documents_not_read_within_ttl(tmp_path):
+    stale = text_pages.open_text(write(tmp_path, b'old\n'))
+    fresh = text_pages.open_text(write(tmp_path, b'new\n'))
+    os.utime(stale.path, (time.time() - 120, time.time() - 120))
+    assert text_pages.sweep() == 1
+    with pytest.raises(FileNotFoundError):
+        stale.read_page(0)
+    assert fresh.read_page(0) == 'new\n'
+    fresh.close()
@@ -0,0 +1,83 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import worker
+from data import db_session
+from data.jobs import QueuedJob
+from services import converters, job_queue, result_cache
+
+
+class FakeBot:
+    def __init__(self, fail_messages=False):
+        self.documents = []
+        self.messages = []
+        self.fail_messages = fail_messages
+
+    async def send_document(self, chat_id, document, **kwargs):
+        self.documents.append(document)
+        return SimpleNamespace(document=SimpleNamespace(file_id=f'file-{len(self.documents)}'))
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.fail_messages:
+            raise ConnectionError("сеть недоступна")
+        self.messages.append(text)
+
+
+@pytest.fixture
+def queue(db, monkeypatch):
+    queue = job_queue.SqliteJobQueue(max_attempts=2, max_running_per_user=1)
+    monkeypatch.setattr(job_queue, '__queue', queue)
+
+    async def no_cache(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(result_cache, 'get', no_cache)
+    monkeypatch.setattr(result_cache, 'put', no_cache)
+    return queue
+
+
+def convert_job(queue, tmp_path, count):
+    photos = []
+    for i in range(count):
+        path = tmp_path / f'{i}.png'
+        path.write_bytes(b'photo')
+        photos.append({'path': str(path), 'format': 'png', 'file_unique_id': f'photo-{i}'})
+    queue.enqueue('convert', 1, {'chat_id': 10, 'photos': photos, 'format': 'jpeg'})
+    return queue.claim('w1', 60)
+
+
+def stored_job(job_id):
+    with db_session.session_scope() as db_sess:
+        job = db_sess.get(QueuedJob, job_id)
+        return job.status, json.loads(job.payload)
+
+
+def test_failed_conversion_is_retried_from_first_unsent_photo(queue, tmp_path, monkeypatch):
+    async def convert(photo_bytes, source_format, target_format):
+        if len(bot.documents) == 1:
+            raise ValueError("битое изображение")
+        return b'converted'
+
+    monkeypatch.setattr(converters, 'convert', convert)
+    bot = FakeBot()
+    job = convert_job(queue, tmp_path, 2)
+    asyncio.run(worker.execute(bot, job, 'w1', 60))
+    status, payload = stored_job(job.id)
+    assert status == 'queued' and payload['done'] == 1
+    # Входные файлы остаются для повтора
+    assert (tmp_path / '1.png').exists()
+
+
+def test_failure_notification_error_does_not_stop_worker(queue, tmp_path, monkeypatch):
+    async def convert(photo_bytes, source_format, target_format):
+        raise ValueError("битое изображение")
+
+    monkeypatch.setattr(converters, 'convert', convert)
+    job = convert_job(queue, tmp_path, 1)
+    job = job._replace(attempts=job.max_attempts)
+    asyncio.run(worker.execute(FakeBot(fail_messages=True), job, 'w1', 60))
+    assert stored_job(job.id)[0] == 'failed'
+    assert not (tmp_path / '0.png').exists()
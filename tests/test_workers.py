@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+from services import workers
+
+
+def heavy():
+    pass
+
+
+def light():
+    pass
+
+
+@pytest.fixture(autouse=True)
+def pool():
+    workers.global_init(2, 10, {'heavy': 4, 'light': 1})
+    yield
+    workers.shutdown()
+
+
+async def acquire(user, func, order):
+    workers.current_user.set(user)
+    await workers._acquire_slot(func)
+    order.append((user, func.__name__))
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_slots_are_granted_up_to_pool_size():
+    async def scenario():
+        order = []
+        tasks = [asyncio.create_task(acquire(user, light, order)) for user in ('a', 'b', 'c')]
+        await settle()
+        assert len(order) == 2 and workers.stats()['waiting'] == 1
+        workers._release_slot()
+        await settle()
+        assert len(order) == 3 and workers.stats()['running'] == 2
+        for _ in range(2):
+            workers._release_slot()
+        await asyncio.gather(*tasks)
+        assert workers.stats()['running'] == 0
+
+    asyncio.run(scenario())
+
+
+def test_light_task_of_other_user_overtakes_heavy_backlog():
+    async def scenario():
+        order = []
+        blockers = [asyncio.create_task(acquire('x', light, [])) for _ in range(2)]
+        await settle()
+        tasks = [asyncio.create_task(acquire('a', heavy, order)) for _ in range(3)]
+        await settle()
+        tasks.append(asyncio.create_task(acquire('b', light, order)))
+        await settle()
+        for _ in range(4):
+            workers._release_slot()
+            await settle()
+        # Лёгкая задача b заканчивается по метке раньше первой тяжёлой задачи a
+        assert order == [('b', 'light'), ('a', 'heavy'), ('a', 'heavy'), ('a', 'heavy')]
+        for _ in range(2):
+            workers._release_slot()
+        await asyncio.gather(*blockers, *tasks)
+        assert workers.stats()['running'] == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_leak_slot():
+    async def scenario():
+        order = []
+        for _ in range(2):
+            await acquire('x', light, [])
+        first = asyncio.create_task(acquire('a', light, order))
+        second = asyncio.create_task(acquire('b', light, order))
+        await settle()
+        # Отмена и освобождение места в одной итерации цикла: запись первого ещё в куче
+        first.cancel()
+        workers._release_slot()
+        await settle()
+        assert first.cancelled()
+        assert order == [('b', 'light')]
+        assert workers.stats()['waiting'] == 0 and workers.stats()['running'] == 2
+        workers._release_slot()
+        workers._release_slot()
+        assert workers.stats()['running'] == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancel_after_slot_was_granted_hands_it_on():
+    async def scenario():
+        order = []
+        for _ in range(2):
+            await acquire('x', light, [])
+        first = asyncio.create_task(acquire('a', light, order))
+        second = asyncio.create_task(acquire('b', light, order))
+        await settle()
+        workers._release_slot()  # место отдано первому, но он ещё не проснулся
+        first.cancel()
+        await settle()
+        assert first.cancelled() and order == [('b', 'light')]
+        workers._release_slot()
+        workers._release_slot()
+        await second
+        assert workers.stats()['running'] == 0
+
+    asyncio.run(scenario())
+
+
+def test_run_executes_in_pool():
+    async def scenario():
+        assert await workers.run(pow, 2, 10) == 1024
+        assert workers.stats()['tasks']['pow']['count'] == 1
+        assert workers.stats()['running'] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,199 @@
+"""Процесс-исполнитель тяжёлых задач из очереди (объединение PDF, извлечение изображений, фильтры, конвертация).
+
+Бот с JOB_QUEUE = 'sqlite' или 'redis' только ставит задачи, а результат отправляют эти процессы.
+Запуск из корня репозитория (процессов может быть несколько):
+    python worker.py --concurrency 2
+"""
+import argparse
+import asyncio
+import logging
+import os
+import shutil
+import signal
+import socket
+
+from telegram import Bot
+
+from config import (BOT_TOKEN, BOT_API_URL, CONVERTAPI_SECRET, CONVERTAPI_STUB, WORKER_POOL_SIZE, WORKER_QUEUE_LIMIT,
+                    LOG_BATCH_SIZE, LOG_FLUSH_INTERVAL, RESULT_CACHE_MAX_ENTRIES, JOB_QUEUE,
+                    JOB_QUEUE_REDIS_URL, JOB_SPOOL_DIR, JOB_VISIBILITY_TIMEOUT, JOB_MAX_ATTEMPTS,
+                    JOB_MAX_RUNNING_PER_USER, JOB_WORKER_CONCURRENCY, JOB_POLL_INTERVAL, POOL_TASK_COSTS, DB_ASYNC,
+                    WARMUP, DECODED_IMAGE_CACHE_MB)
+from data import db_session
+from handlers.format_converter import convert_photos
+from handlers.image_filter import MAX_FILTERED_PHOTOS, apply_filter
+from handlers.pdf_images import send_extracted
+from handlers.pdf_merger import send_merged
+from handlers.spool import job_paths, load_pdfs, load_photos
+from services import converters, job_queue, log_writer, result_cache, warmup, workers
+from services.pdf_tools import merge_pdf_files
+
+logger = logging.getLogger(__name__)
+
+PURGE_INTERVAL = 3600
+PURGE_OLDER_THAN = 86400
+
+
+def progress_saver(job, worker_id, done):
+    """Колбэк on_progress, который запоминает в задаче, сколько входных файлов уже отправлено.
+
+    Повтор задачи (после ошибки, перегрузки или падения worker) не отправляет эти файлы заново.
+    """
+    async def save_progress(sent):
+        job.payload['done'] = done + sent
+        await job_queue.save_payload(job, worker_id)
+
+    return save_progress
+
+
+async def run_merge(bot, job, worker_id):
+    payload = job.payload
+    output_path = os.path.join(payload['directory'], 'merged_document.pdf')
+    page_count = await workers.run(merge_pdf_files, payload['paths'], output_path)
+    await send_merged(bot, payload['chat_id'], output_path, page_count)
+
+
+async def run_extract(bot, job, worker_id):
+    payload = job.payload
+    done = payload.get('done', 0)
+    pdf_files = await asyncio.to_thread(load_pdfs, payload['pdfs'][done:])
+    if await send_extracted(bot, payload['chat_id'], pdf_files, payload['as_zip'],
+                            progress_saver(job, worker_id, done)):
+        raise workers.PoolSaturatedError()
+
+
+async def run_filter(bot, job, worker_id):
+    payload = job.payload
+    done = payload.get('done', 0)
+    photos = await asyncio.to_thread(load_photos, payload['photos'][done:])
+    # Ошибка пробрасывается в execute, чтобы задача была повторена, а не засчитана как выполненная
+    await apply_filter(bot, payload['chat_id'], payload['applying_user'], photos, payload['filter'],
+                       progress_saver(job, worker_id, done), raise_errors=True, limit=MAX_FILTERED_PHOTOS - done)
+
+
+async def run_convert(bot, job, worker_id):
+    payload = job.payload
+    done = payload.get('done', 0)
+    photos = await asyncio.to_thread(load_photos, payload['photos'][done:])
+    await convert_photos(bot, payload['chat_id'], photos, payload['format'], progress_saver(job, worker_id, done),
+                         raise_errors=True)
+
+
+JOB_RUNNERS = {
+    'merge': run_merge,
+    'extract': run_extract,
+    'filter': run_filter,
+    'convert': run_convert,
+}
+
+
+def cleanup(job):
+    """Удаляет входные файлы задачи, когда она больше не будет выполняться"""
+    for path in job_paths(job.payload):
+        if os.path.exists(path):
+            os.remove(path)
+    if job.payload.get('directory'):
+        shutil.rmtree(job.payload['directory'], ignore_errors=True)
+
+
+async def keep_alive(job, worker_id, visibility_timeout):
+    # Продлеваем владение, пока задача выполняется, иначе её отдадут другому worker
+    while True:
+        await asyncio.sleep(visibility_timeout / 3)
+        if not await job_queue.extend(job, worker_id, visibility_timeout):
+            logger.warning("Задача %s больше не принадлежит %s", job.id, worker_id)
+            return
+
+
+async def execute(bot, job, worker_id, visibility_timeout):
+    workers.current_user.set(job.user_id)
+    heartbeat = asyncio.create_task(keep_alive(job, worker_id, visibility_timeout))
+    try:
+        await JOB_RUNNERS[job.kind](bot, job, worker_id)
+    except Exception as e:
+        logger.exception("Задача %s (%s) завершилась ошибкой", job.id, job.kind)
+        status = await job_queue.fail(job, worker_id, f'{type(e).__name__}: {e}')
+        if status == 'failed':
+            cleanup(job)
+            try:
+                await bot.send_message(chat_id=job.payload['chat_id'],
+                                       text=f"Не удалось выполнить задачу №{job.id}. Попробуйте ещё раз позже. 😢")
+            except Exception:
+                # Сеть недоступна или пользователь заблокировал бота — цикл worker продолжает работу
+                logger.exception("Не удалось сообщить об ошибке задачи %s", job.id)
+        elif status is None:
+            logger.warning("Задача %s уже принадлежит другому worker, её файлы не удаляются", job.id)
+    else:
+        # Если срок владения истёк и задачу забрал другой worker, её входные файлы ему ещё нужны
+        if await job_queue.complete(job, worker_id):
+            cleanup(job)
+        else:
+            logger.warning("Задача %s уже принадлежит другому worker, её файлы не удаляются", job.id)
+    finally:
+        heartbeat.cancel()
+
+
+async def work(bot, worker_id, stop_event, visibility_timeout, poll_interval):
+    while not stop_event.is_set():
+        job = await job_queue.claim(worker_id, visibility_timeout)
+        if job is None:
+            try:
+                await asyncio.wait_for(stop_event.wait(), poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        await execute(bot, job, worker_id, visibility_timeout)
+
+
+async def purge_old_jobs(stop_event):
+    while not stop_event.is_set():
+        await job_queue.purge(PURGE_OLDER_THAN)
+        try:
+            await asyncio.wait_for(stop_event.wait(), PURGE_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run(concurrency):
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    base_url = dict(base_url=f'{BOT_API_URL}/bot', base_file_url=f'{BOT_API_URL}/file/bot') if BOT_API_URL else {}
+    worker_name = f'{socket.gethostname()}:{os.getpid()}'
+    async with Bot(BOT_TOKEN, **base_url) as bot:
+        await log_writer.start(LOG_BATCH_SIZE, LOG_FLUSH_INTERVAL)
+        if WARMUP:
+            # CSV в worker.py не обрабатывается: достаточно поднять процессы пула
+            warmup.start(modules=())
+        try:
+            # Начатые задачи после сигнала остановки доделываются, новые не берутся
+            await asyncio.gather(purge_old_jobs(stop_event), *(
+                work(bot, f'{worker_name}:{slot}', stop_event, JOB_VISIBILITY_TIMEOUT, JOB_POLL_INTERVAL)
+                for slot in range(concurrency)))
+        finally:
+            await warmup.stop()
+            await log_writer.stop()
+            workers.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=JOB_WORKER_CONCURRENCY,
+                        help="сколько задач выполнять одновременно")
+    args = parser.parse_args()
+
+    if not JOB_QUEUE:
+        raise SystemExit("Очередь задач выключена: укажите JOB_QUEUE в config.py.")
+    db_session.global_init("db/file_bot.db", use_async=DB_ASYNC)
+    workers.global_init(WORKER_POOL_SIZE, max(WORKER_QUEUE_LIMIT, args.concurrency), POOL_TASK_COSTS,
+                        initializer=warmup.pool_initializer, initargs=(WARMUP, DECODED_IMAGE_CACHE_MB * 1024 * 1024))
+    converters.global_init(CONVERTAPI_SECRET, use_stub=CONVERTAPI_STUB)
+    result_cache.global_init(RESULT_CACHE_MAX_ENTRIES)
+    job_queue.global_init(job_queue.create_queue(JOB_QUEUE, JOB_MAX_ATTEMPTS, JOB_MAX_RUNNING_PER_USER,
+                                                 JOB_QUEUE_REDIS_URL), JOB_SPOOL_DIR)
+    asyncio.run(run(args.concurrency))